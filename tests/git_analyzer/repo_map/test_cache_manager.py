@@ -0,0 +1,200 @@
+import pytest
+import pytest_asyncio
+
+from zap.git_analyzer.repo_map.cache_manager import CacheManager, QUERY_CHUNK_SIZE
+
+
+@pytest_asyncio.fixture
+async def cache_manager(tmp_path):
+    manager = CacheManager(str(tmp_path / ".zap_cache"))
+    yield manager
+    await manager.close()
+
+
+def _tags(path, name):
+    return [{"path": path, "start_line": 1, "end_line": 2, "name": name, "kind": "def", "start_byte": 0, "end_byte": 9}]
+
+
+def _entry(path, tags, mtime=1.0, blob_id=None):
+    return path, mtime, 10, blob_id or f"blob-{path}", tags
+
+
+@pytest.mark.asyncio
+async def test_set_and_get_cache(cache_manager):
+    await cache_manager.set_cache("a.py", 1.5, 10, "blob-a", _tags("a.py", "Alpha"))
+    entry = await cache_manager.get_cache("a.py")
+    assert entry == {"mtime": 1.5, "size": 10, "blob_id": "blob-a", "tags": _tags("a.py", "Alpha")}
+    assert await cache_manager.get_cache("missing.py") is None
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused_and_uses_wal(cache_manager):
+    db = await cache_manager._get_db()
+    await cache_manager.get_cache("a.py")
+    assert await cache_manager._get_db() is db
+
+    cursor = await db.execute("PRAGMA journal_mode")
+    assert (await cursor.fetchone())[0] == "wal"
+    cursor = await db.execute("PRAGMA busy_timeout")
+    assert (await cursor.fetchone())[0] > 0
+
+
+@pytest.mark.asyncio
+async def test_set_many_and_get_many_span_chunks(cache_manager):
+    count = QUERY_CHUNK_SIZE * 2 + 7
+    entries = [_entry(f"f{i}.py", _tags(f"f{i}.py", f"name{i}"), mtime=float(i)) for i in range(count)]
+    await cache_manager.set_many(entries)
+
+    result = await cache_manager.get_many([f"f{i}.py" for i in range(count)] + ["missing.py"])
+    assert len(result) == count
+    assert result["f42.py"] == {"mtime": 42.0, "size": 10, "blob_id": "blob-f42.py", "tags": _tags("f42.py", "name42")}
+    assert "missing.py" not in result
+
+
+@pytest.mark.asyncio
+async def test_get_many_ignores_other_versions(cache_manager, mocker):
+    mocker.patch("zap.git_analyzer.repo_map.cache_manager.CACHE_VERSION", 0)
+    await cache_manager.set_many([_entry("old.py", [])])
+    mocker.stopall()
+
+    assert await cache_manager.get_many(["old.py"]) == {}
+    assert await cache_manager.get_cache("old.py") is None
+
+
+@pytest.mark.asyncio
+async def test_close_and_reopen(cache_manager):
+    await cache_manager.set_many([_entry("a.py", _tags("a.py", "Alpha"))])
+    await cache_manager.close()
+    assert cache_manager._db is None
+    assert (await cache_manager.get_many(["a.py"]))["a.py"]["mtime"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_query_symbol_and_clear(cache_manager):
+    await cache_manager.set_many([
+        _entry("a.py", _tags("a.py", "Alpha")),
+        _entry("b.py", _tags("b.py", "AlphaBeta")),
+    ])
+    assert await cache_manager.query_symbol("Alpha") == [
+        {"path": "a.py", "start_line": 1, "end_line": 2, "name": "Alpha", "kind": "def"}
+    ]
+
+    await cache_manager.clear_cache()
+    assert await cache_manager.query_symbol("Alpha") == []
+
+
+@pytest.mark.asyncio
+async def test_query_symbol_prefix_and_kind(cache_manager):
+    await cache_manager.set_many([
+        _entry("a.py", _tags("a.py", "Alpha") + [
+            {"path": "a.py", "start_line": 5, "end_line": 5, "name": "AlphaBeta", "kind": "ref", "body": ""}
+        ]),
+        _entry("b.py", _tags("b.py", "AlphaBeta") + _tags("b.py", "Alpine")),
+    ])
+
+    prefixed = await cache_manager.query_symbol("Alph", prefix=True)
+    assert [(tag["path"], tag["name"]) for tag in prefixed] == [
+        ("a.py", "Alpha"), ("a.py", "AlphaBeta"), ("b.py", "AlphaBeta")
+    ]
+    refs = await cache_manager.query_symbol("AlphaBeta", kind="ref")
+    assert [(tag["path"], tag["start_line"]) for tag in refs] == [("a.py", 5)]
+    defs = await cache_manager.query_symbol("Alp", kind="def", prefix=True)
+    assert {tag["name"] for tag in defs} == {"Alpha", "AlphaBeta", "Alpine"}
+
+
+@pytest.mark.asyncio
+async def test_symbols_are_replaced_when_file_is_recached(cache_manager):
+    await cache_manager.set_many([_entry("a.py", _tags("a.py", "Alpha"))])
+    await cache_manager.set_cache("a.py", 2.0, 10, "blob-gamma", _tags("a.py", "Gamma"))
+
+    assert await cache_manager.query_symbol("Alpha") == []
+    assert len(await cache_manager.query_symbol("Gamma")) == 1
+
+
+@pytest.mark.asyncio
+async def test_tags_are_shared_by_blob_id(cache_manager):
+    await cache_manager.set_many([_entry("a.py", _tags("a.py", "Alpha"), blob_id="same")])
+    blobs = await cache_manager.get_blobs(["same", "unknown"])
+    assert set(blobs) == {"same"}
+    assert cache_manager.tags_with_path("renamed.py", blobs["same"]) == _tags("renamed.py", "Alpha")
+
+
+@pytest.mark.asyncio
+async def test_legacy_file_cache_table_is_rebuilt(tmp_path):
+    import sqlite3
+    cache_dir = tmp_path / ".zap_cache"
+    cache_dir.mkdir()
+    with sqlite3.connect(cache_dir / "file_cache.db") as db:
+        db.execute("CREATE TABLE file_cache (file_path TEXT PRIMARY KEY, mtime REAL, tags TEXT, version INTEGER)")
+        db.execute("INSERT INTO file_cache VALUES ('a.py', 1.0, '[]', 2)")
+    manager = CacheManager(str(cache_dir))
+    try:
+        await manager.set_many([_entry("a.py", _tags("a.py", "Alpha"))])
+        assert (await manager.get_cache("a.py"))["blob_id"] == "blob-a.py"
+    finally:
+        await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_symbol_lookups_use_indexes(cache_manager):
+    db = await cache_manager._get_db()
+    for query, params in [
+        ("SELECT * FROM symbols WHERE name = ?", ("Alpha",)),
+        ("SELECT * FROM symbols WHERE name >= ? AND name < ? AND kind = ?", ("Al", "Am", "def")),
+        ("DELETE FROM symbols WHERE file_path = ?", ("a.py",)),
+    ]:
+        cursor = await db.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        plan = " ".join(row[-1] for row in await cursor.fetchall())
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, plan
+
+
+@pytest.mark.asyncio
+async def test_tag_bodies_are_not_cached(cache_manager):
+    tags = [{**_tags("a.py", "Alpha")[0], "body": "def Alpha(): pass"}]
+    await cache_manager.set_many([_entry("a.py", tags)])
+    assert (await cache_manager.get_cache("a.py"))["tags"] == _tags("a.py", "Alpha")
+
+
+@pytest.mark.asyncio
+async def test_garbage_collection_drops_untracked_and_stale_rows(cache_manager, mocker):
+    mocker.patch("zap.git_analyzer.repo_map.cache_manager.CACHE_VERSION", 0)
+    await cache_manager.set_many([_entry("old.py", _tags("old.py", "Old"))])
+    mocker.stopall()
+    await cache_manager.set_many([_entry(path, _tags(path, "Name")) for path in ("a.py", "b.py", "gone.py")])
+    await cache_manager.set_skipped([("gone.min.js", 1.0, 10, "minified")])
+    await cache_manager.set_outlines([("blob-a.py", [(1, 2)]), ("blob-unknown", None)])
+    await cache_manager.get_many(["a.py", "missing.py"])
+
+    deleted = await cache_manager.maybe_collect_garbage(["a.py", "b.py"], interval_hours=24)
+    assert deleted["file_cache"] == 2 and deleted["skipped_files"] == 1 and deleted["outline_cache"] == 1
+    assert set(await cache_manager.get_many(["a.py", "b.py", "gone.py", "old.py"])) == {"a.py", "b.py"}
+    assert await cache_manager.query_symbol("Old") == [] and len(await cache_manager.query_symbol("Name")) == 2
+    assert await cache_manager.get_outlines(["blob-a.py"]) == {"blob-a.py": [(1, 2)]}
+    # A second pass within the interval is skipped.
+    assert await cache_manager.maybe_collect_garbage(["a.py"], interval_hours=24) is None
+
+    stats = await cache_manager.stats()
+    assert stats["rows"]["file_cache"] == 2 and stats["rows"]["skipped_files"] == 0
+    assert stats["lookups"] == 0 and stats["hit_rate"] == 0.0
+    cache_manager.count_lookups(4, 1)
+    assert (await cache_manager.stats())["hit_rate"] == 0.25
+    assert stats["bytes"] > 0 and stats["last_gc"] is not None
+
+
+@pytest.mark.asyncio
+async def test_eviction_drops_unreferenced_then_least_recently_used_blobs(cache_manager):
+    big = [{**_tags("x.py", "Name")[0], "signature": "s" * 4000}]
+    await cache_manager.set_many([_entry(f"f{i}.py", big, blob_id=f"blob{i}") for i in range(40)])
+    # Re-pointing f0.py leaves blob0 unreferenced; f1.py is looked up, so blob1 was used last.
+    await cache_manager.set_many([_entry("f0.py", big, blob_id="blob-new")])
+    await cache_manager.get_many(["f1.py"])
+    size_before = (await cache_manager.stats())["bytes"]
+    paths = [f"f{i}.py" for i in range(40)]
+
+    await cache_manager.collect_garbage(paths, max_bytes=size_before // 2)
+
+    stats = await cache_manager.stats()
+    assert stats["bytes"] < size_before * 0.7
+    blobs = await cache_manager.get_blobs(["blob0", "blob1", "blob-new"])
+    assert "blob0" not in blobs and "blob1" in blobs and "blob-new" in blobs
+    assert 10 < stats["rows"]["blob_cache"] < 40
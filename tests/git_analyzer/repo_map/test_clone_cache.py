@@ -0,0 +1,91 @@
+import os
+import subprocess
+
+import pytest
+
+from zap.git_analyzer.repo_map.clone_cache import CloneCache, is_remote_url
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.email=test@example.com", "-c", "user.name=Test", *args], cwd=cwd,
+                   check=True, capture_output=True)
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """A working repository and the bare repository it pushes to, as a file:// URL."""
+    work = tmp_path / "work"
+    work.mkdir()
+    (work / "a.py").write_text("class Alpha:\n    pass\n")
+    (work / "b.py").write_text("def beta():\n    return Alpha()\n")
+    _git(work, "init", "-q", "-b", "main")
+    _git(work, "add", ".")
+    _git(work, "commit", "-qm", "initial")
+    _git(tmp_path, "clone", "-q", "--bare", str(work), "remote.git")
+    _git(work, "remote", "add", "origin", str(tmp_path / "remote.git"))
+    return work, f"file://{tmp_path / 'remote.git'}"
+
+
+@pytest.mark.asyncio
+async def test_clone_is_reused_and_fetched(tmp_path, remote, mocker):
+    work, url = remote
+    clones = str(tmp_path / "clones")
+    assert is_remote_url(url) and not is_remote_url(str(work))
+
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig("unused", repo_url=url, clone_cache_dir=clones))
+    try:
+        worktree = analyzer.config.root_path
+        await analyzer.analyze_files(["a.py", "b.py"])
+    finally:
+        await analyzer.close()
+    entry = CloneCache(clones).entry(url)
+    assert worktree == str(entry / "repo") and os.path.isdir(worktree)
+    # The tag cache lives next to the clone, not in its worktree.
+    assert not os.path.exists(os.path.join(worktree, ".zap_cache"))
+    assert (entry / ".zap_cache").is_dir()
+
+    (work / "b.py").write_text("def gamma():\n    pass\n")
+    (work / "c.py").write_text("def delta():\n    pass\n")
+    _git(work, "add", ".")
+    _git(work, "commit", "-qm", "second")
+    _git(work, "push", "-q", "origin", "main")
+
+    clone = mocker.spy(CloneCache, "_clone")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig("unused", repo_url=url, clone_cache_dir=clones))
+    try:
+        assert analyzer.config.root_path == worktree
+        assert clone.call_count == 0
+        extract_tags = mocker.spy(analyzer.tag_extractor, "extract_tags")
+        file_infos = await analyzer.analyze_files(["a.py", "b.py", "c.py"])
+        # Only the fetched changes are parsed; a.py is answered from the cache kept across clones.
+        assert extract_tags.call_count == 2
+        assert {tag.name for tag in file_infos["b.py"].tags} == {"gamma"}
+        assert {tag.name for tag in file_infos["c.py"].tags} == {"delta"}
+    finally:
+        await analyzer.close()
+
+
+def test_broken_clone_is_replaced(tmp_path, remote):
+    _, url = remote
+    # The cache lives inside another repository, which a broken clone must not resolve to.
+    outer = tmp_path / "outer"
+    outer.mkdir()
+    (outer / "notes.txt").write_text("committed\n")
+    _git(outer, "init", "-q")
+    _git(outer, "add", ".")
+    _git(outer, "commit", "-qm", "initial")
+    (outer / "notes.txt").write_text("uncommitted\n")
+    cache = CloneCache(str(outer / "clones"))
+    worktree = cache.entry(url) / "repo"
+    worktree.mkdir(parents=True)
+    (worktree / "leftover").write_text("partial")
+
+    assert cache.checkout(url) == str(worktree)
+    assert not (worktree / "leftover").exists()
+    assert (outer / "notes.txt").read_text() == "uncommitted\n"
+    assert (worktree / "a.py").read_text() == "class Alpha:\n    pass\n"
+    # Without a reachable remote the clone is used as it is.
+    (tmp_path / "remote.git").rename(tmp_path / "moved.git")
+    assert cache.checkout(url) == str(worktree)
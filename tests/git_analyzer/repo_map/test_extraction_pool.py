@@ -0,0 +1,55 @@
+import pytest
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.extraction_pool import TagExtractionPool
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+
+SOURCES = {
+    "pkg/a.py": "class Alpha:\n    def run(self):\n        return helper()\n",
+    "pkg/b.py": "def helper():\n    return Alpha()\n",
+    "c.cs": "class Gamma { void Run() { var x = new Alpha(); } }\n",
+    "notes.unknown": "nothing to see\n",
+}
+
+
+@pytest.mark.asyncio
+async def test_pool_matches_in_process_extraction(tmp_path):
+    files = [(str(tmp_path / path), content) for path, content in SOURCES.items()]
+    extractor = TagExtractor(str(tmp_path))
+    pool = TagExtractionPool(str(tmp_path), max_workers=2, batch_size=1)
+    try:
+        results = await pool.extract_many(files)
+    finally:
+        pool.close()
+
+    assert set(results) == {fname for fname, _ in files}
+    for fname, content in files:
+        assert results[fname] == extractor.extract_tags(fname, content)
+    assert results[str(tmp_path / "pkg/a.py")][0].path == "pkg/a.py"
+
+
+@pytest.mark.asyncio
+async def test_pool_empty_input_does_not_start_workers(tmp_path):
+    pool = TagExtractionPool(str(tmp_path))
+    assert await pool.extract_many([]) == {}
+    assert pool._executor is None
+
+
+@pytest.mark.asyncio
+async def test_analyzer_with_workers_matches_in_process(tmp_path):
+    for path, content in SOURCES.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(content)
+
+    in_process = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), cache_dir=str(tmp_path / "cache1")))
+    pooled = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), cache_dir=str(tmp_path / "cache2"),
+                                             extraction_workers=2, extraction_batch_size=2))
+    try:
+        expected = await in_process.analyze_files(list(SOURCES))
+        actual = await pooled.analyze_files(list(SOURCES))
+    finally:
+        await in_process.close()
+        await pooled.close()
+
+    assert actual == expected
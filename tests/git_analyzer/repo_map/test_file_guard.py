@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.file_guard import FileGuard
+from zap.git_analyzer.repo_map.reindex import ReindexQueue
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+
+
+def test_ignore_patterns_follow_gitignore_rules(tmp_path):
+    (tmp_path / ".zapignore").write_text("# generated\nvendor/\n*.min.js\n!keep.min.js\n/build\ndocs/**/*.py\n")
+    guard = FileGuard(CodeAnalyzerConfig(str(tmp_path)))
+
+    assert guard.is_ignored("vendor/lib.py")
+    assert guard.is_ignored("src/vendor/deep/lib.py")
+    assert not guard.is_ignored("vendor")
+    assert guard.is_ignored("static/app.min.js")
+    assert not guard.is_ignored("static/keep.min.js")
+    assert guard.is_ignored("build/out.py")
+    assert not guard.is_ignored("src/build/out.py")
+    assert guard.is_ignored("docs/a/b/conf.py") and guard.is_ignored("docs/conf.py")
+    assert not guard.is_ignored("src/app.py")
+
+
+def test_check_and_sniff_reasons(tmp_path):
+    guard = FileGuard(CodeAnalyzerConfig(str(tmp_path), max_file_size=100, max_line_length=50))
+    assert guard.check("data.json", 10) == "unsupported language"
+    assert guard.check("app.py", 101) == "too large"
+    assert guard.check("app.py", 100) is None
+
+    (tmp_path / "blob.py").write_bytes(b"x = 1\n\0\0")
+    (tmp_path / "bundle.js").write_text("var a=1;" * 10)
+    (tmp_path / "app.py").write_text("def f():\n    return 1\n")
+    assert guard.sniff(str(tmp_path / "blob.py")) == "binary"
+    assert guard.sniff(str(tmp_path / "bundle.js")) == "minified"
+    assert guard.sniff(str(tmp_path / "app.py")) is None
+
+
+@pytest.mark.asyncio
+async def test_analyze_files_records_skips_until_files_change(tmp_path, mocker):
+    (tmp_path / ".zapignore").write_text("vendor/\n")
+    os.makedirs(tmp_path / "vendor")
+    (tmp_path / "vendor" / "lib.py").write_text("def lib():\n    pass\n")
+    (tmp_path / "app.py").write_text("def app():\n    return lib()\n")
+    (tmp_path / "blob.py").write_bytes(b"\0" * 16)
+    (tmp_path / "bundle.js").write_text("function a(){return 1};" * 100)
+    (tmp_path / "big.py").write_text("x = 1\n" * 1000)
+    (tmp_path / "data.json").write_text("{}")
+    paths = ["vendor/lib.py", "app.py", "blob.py", "bundle.js", "big.py", "data.json"]
+    config = CodeAnalyzerConfig(str(tmp_path), max_file_size=4096)
+
+    analyzer = CodeAnalyzer(config)
+    try:
+        file_infos = await analyzer.analyze_files(paths)
+        assert list(file_infos) == ["app.py"]
+        assert analyzer.skipped == {
+            "vendor/lib.py": "ignored",
+            "blob.py": "binary",
+            "bundle.js": "minified",
+            "big.py": "too large",
+            "data.json": "unsupported language",
+        }
+    finally:
+        await analyzer.close()
+
+    analyzer = CodeAnalyzer(config)
+    try:
+        sniff = mocker.spy(analyzer.file_guard, "sniff")
+        read_file = mocker.spy(analyzer, "_read_file")
+        assert list(await analyzer.analyze_files(paths)) == ["app.py"]
+        assert analyzer.skipped["blob.py"] == "binary"
+        assert sniff.call_count == 0 and read_file.call_count == 1
+
+        (tmp_path / "blob.py").write_text("def blob():\n    pass\n")
+        file_infos = await analyzer.analyze_files(paths)
+        assert sorted(file_infos) == ["app.py", "blob.py"]
+        assert "blob.py" not in analyzer.skipped
+        assert [call.args[0] for call in sniff.call_args_list] == [str(tmp_path / "blob.py")]
+        assert "blob.py" not in await analyzer.cache_manager.get_skipped(["blob.py"])
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_files_that_become_skipped_leave_the_graph(tmp_path):
+    (tmp_path / "a.py").write_text("class Alpha:\n    pass\n")
+    (tmp_path / "b.py").write_text("def beta():\n    return Alpha()\n")
+    (tmp_path / "c.py").write_text("def gamma():\n    return Alpha()\n")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), max_line_length=50))
+    try:
+        file_infos = await analyzer.analyze_files(["a.py", "b.py", "c.py"])
+        repo_map = RepoMap(await analyzer.build_graph(file_infos), file_infos, tag_store=lambda: analyzer.tag_store)
+        queue = ReindexQueue(analyzer, repo_map)
+        queue.start()
+
+        # A changed ignore file is picked up and drops the files it now excludes.
+        (tmp_path / ".zapignore").write_text("b.py\n")
+        queue.push([".zapignore"])
+        await queue.join()
+        assert analyzer.skipped["b.py"] == "ignored"
+        assert "b.py" not in analyzer.graph and "b.py" not in repo_map.graph
+        assert analyzer.symbol_index.get("beta") is None
+        assert len(analyzer.tag_store.select(path="b.py")) == 0
+
+        # An edit that makes a file minified drops it as well.
+        (tmp_path / "c.py").write_text("def gamma(): return Alpha()  # " + "x" * 60 + "\n")
+        queue.push(["c.py"])
+        await queue.join()
+        assert analyzer.skipped["c.py"] == "minified"
+        assert set(analyzer.graph) == set(repo_map.graph) == {"a.py"}
+        assert repo_map.referencers.get("Alpha", set()) == set()
+        await queue.stop()
+    finally:
+        await analyzer.close()
+
+
+def test_ignore_rules_are_reloaded_when_the_file_changes(tmp_path):
+    guard = FileGuard(CodeAnalyzerConfig(str(tmp_path)))
+    assert not guard.is_ignored("gen.py") and guard.refresh() is False
+    (tmp_path / ".zapignore").write_text("gen.py\n")
+    assert guard.refresh() is True and guard.is_ignored("gen.py")
+    assert guard.refresh() is False
+    (tmp_path / ".zapignore").unlink()
+    assert guard.refresh() is True and not guard.is_ignored("gen.py")
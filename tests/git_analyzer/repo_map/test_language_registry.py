@@ -0,0 +1,32 @@
+from zap.git_analyzer.repo_map.language_registry import LanguageRegistry, get_registry
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+
+
+def test_instances_are_reused():
+    registry = LanguageRegistry()
+    assert registry.get_language("python") is registry.get_language("python")
+    assert registry.get_parser("python") is registry.get_parser("python")
+    assert registry.get_tags_query("python") is registry.get_tags_query("python")
+    assert registry.get_parser("python") is not registry.get_parser("javascript")
+
+
+def test_query_file_is_read_and_compiled_once(tmp_path, mocker):
+    registry = LanguageRegistry()
+    query = mocker.spy(registry.get_language("python"), "query")
+    extractor = TagExtractor(str(tmp_path), registry=registry)
+
+    for i in range(5):
+        extractor.extract_tags(str(tmp_path / f"f{i}.py"), f"def f{i}():\n    pass\n")
+
+    assert query.call_count == 1
+
+
+def test_missing_query_file_is_cached_as_none(tmp_path):
+    registry = LanguageRegistry(queries_dir=tmp_path)
+    assert registry.get_tags_query("python") is None
+    assert "python" in registry._queries
+
+
+def test_default_registry_is_shared():
+    assert get_registry() is get_registry()
+    assert TagExtractor("/repo").registry is get_registry()
@@ -0,0 +1,102 @@
+import pytest
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.outline import OutlineExtractor
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+
+PYTHON_SOURCE = '''import os
+
+
+# Builds things.
+@decorator
+@other(
+    1)
+class Builder(Base):
+    """
+    Builds things.
+
+    More detail.
+    """
+    size = 1
+
+    def build(self,
+              target):
+        """Build the target."""
+        return os.path.join(target)
+
+
+def helper():
+    return 1
+'''
+
+TYPESCRIPT_SOURCE = '''/** Renders a widget. */
+export function render(widget: Widget): string {
+  return widget.name;
+}
+
+class Widget {
+  name: string;
+
+  describe(): string {
+    return this.name;
+  }
+}
+'''
+
+
+def _outline_lines(source, fname):
+    outline = OutlineExtractor(TagExtractor("/")).outline(fname, source.encode())
+    lines = source.splitlines()
+    return [lines[line - 1] for start, end in outline for line in range(start, end + 1)]
+
+
+def test_python_outline_keeps_signatures_decorators_and_docstring_first_lines():
+    assert _outline_lines(PYTHON_SOURCE, "builder.py") == [
+        "# Builds things.",
+        "@decorator",
+        "@other(",
+        "    1)",
+        "class Builder(Base):",
+        '    """',
+        "    Builds things.",
+        "    def build(self,",
+        "              target):",
+        '        """Build the target."""',
+        "def helper():",
+    ]
+
+
+def test_typescript_outline_keeps_signature_lines_and_leading_comments():
+    assert _outline_lines(TYPESCRIPT_SOURCE, "widget.ts") == [
+        "/** Renders a widget. */",
+        "export function render(widget: Widget): string {",
+        "class Widget {",
+        "  describe(): string {",
+    ]
+
+
+def test_outline_of_unsupported_file_is_none():
+    assert OutlineExtractor(TagExtractor("/")).outline("notes.txt", b"hello") is None
+
+
+@pytest.mark.asyncio
+async def test_outlines_are_cached_by_blob_id(tmp_path, mocker):
+    (tmp_path / "a.py").write_text(PYTHON_SOURCE)
+    (tmp_path / "copy.py").write_text(PYTHON_SOURCE)
+    (tmp_path / "notes.txt").write_text("hello")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        outline = mocker.spy(analyzer.outline_extractor, "outline")
+        first = await analyzer.get_outline("a.py")
+        assert first[0] == (4, 10)
+        assert await analyzer.get_outline("copy.py") == first
+        assert await analyzer.get_outline("notes.txt") is None
+        assert await analyzer.get_outline("notes.txt") is None
+        assert outline.call_count == 2
+
+        (tmp_path / "a.py").write_text("def changed():\n    pass\n")
+        assert await analyzer.get_outline("a.py") == [(1, 1)]
+        assert outline.call_count == 3
+    finally:
+        await analyzer.close()
@@ -0,0 +1,213 @@
+import gc
+import os
+import time
+import tracemalloc
+
+import pytest
+from tree_sitter_languages import get_language, get_parser
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.constants import filename_to_lang
+from zap.git_analyzer.repo_map.incremental import IncrementalTagger
+from zap.git_analyzer.repo_map.language_registry import QUERIES_DIR, LanguageRegistry
+from zap.git_analyzer.repo_map.models import FileInfo, Tag
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+from zap.git_analyzer.repo_map.tag_store import TagStore
+
+PYTHON_TEMPLATE = '''
+import gc
+import os
+
+
+class Service{i}:
+    """Service number {i}."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def fetch_{i}(self, key):
+        value = self.client.get(key)
+        return helper_{j}(value)
+
+    def store_{i}(self, key, value):
+        return self.client.set(key, Service{j}(value))
+
+
+def helper_{i}(value):
+    return [os.path.join(str(v), "x") for v in value]
+'''
+
+TYPESCRIPT_TEMPLATE = '''
+import {{ Client }} from "./client";
+
+export interface Options{i} {{
+    key: string;
+}}
+
+export class Service{i} {{
+    constructor(private client: Client) {{}}
+
+    fetch{i}(options: Options{i}): string {{
+        return helper{j}(this.client.get(options.key));
+    }}
+}}
+
+export function helper{i}(value: string): string {{
+    return value + "{i}";
+}}
+'''
+
+
+def write_python_repo(root, num_files):
+    paths = []
+    for i in range(num_files):
+        path = f"pkg_{i % 20}/module_{i}.py"
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), "w") as f:
+            f.write(PYTHON_TEMPLATE.format(i=i, j=(i * 7) % num_files) * 5)
+        paths.append(path)
+    return paths
+
+
+async def _cold_index(root, paths, cache_name, **config):
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(root), cache_dir=str(root / cache_name), **config))
+    try:
+        start = time.perf_counter()
+        file_infos = await analyzer.analyze_files(paths)
+        return time.perf_counter() - start, file_infos
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_parallel_extraction_scaling(tmp_path):
+    paths = write_python_repo(tmp_path, 2000)
+    workers = os.cpu_count() or 1
+
+    serial_time, serial_infos = await _cold_index(tmp_path, paths, "serial")
+    pooled_time, pooled_infos = await _cold_index(tmp_path, paths, "pooled", extraction_workers=workers)
+
+    print(f"Cold index of {len(paths)} files: in-process {serial_time:.2f}s, "
+          f"{workers} workers {pooled_time:.2f}s, speedup {serial_time / pooled_time:.1f}x")
+    assert pooled_infos == serial_infos
+    if workers >= 4:
+        assert pooled_time < serial_time
+
+
+def _extract_uncached(root, fname, content):
+    """Tag extraction as it was before the language registry: everything rebuilt per file."""
+    lang = filename_to_lang(fname)
+    language = get_language(lang)
+    parser = get_parser(lang)
+    query_scm = (QUERIES_DIR / f"tree-sitter-{lang}-tags.scm").read_text()
+    tree = parser.parse(bytes(content, "utf-8"))
+    return language.query(query_scm).captures(tree.root_node)
+
+
+@pytest.mark.slow
+def test_language_registry_extraction_cost(tmp_path):
+    files = []
+    for i in range(1500):
+        files.append((str(tmp_path / f"module_{i}.py"), PYTHON_TEMPLATE.format(i=i, j=(i * 7) % 1500)))
+        files.append((str(tmp_path / f"module_{i}.ts"), TYPESCRIPT_TEMPLATE.format(i=i, j=(i * 7) % 1500)))
+
+    start = time.perf_counter()
+    for fname, content in files:
+        _extract_uncached(str(tmp_path), fname, content)
+    before = (time.perf_counter() - start) / len(files)
+
+    extractor = TagExtractor(str(tmp_path), registry=LanguageRegistry())
+    start = time.perf_counter()
+    for fname, content in files:
+        extractor.extract_tags(fname, content)
+    after = (time.perf_counter() - start) / len(files)
+
+    print(f"Per-file extraction over {len(files)} Python/TypeScript files: "
+          f"{before * 1000:.2f} ms before, {after * 1000:.2f} ms with the registry")
+    assert after < before
+
+
+async def _retained_memory(root, paths, cache_name, **config):
+    """Heap still held by the analyzed file infos after a warm (cached) index."""
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(root), cache_dir=str(root / cache_name), **config))
+    try:
+        await analyzer.analyze_files(paths)
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        file_infos = await analyzer.analyze_files(paths)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        return retained, file_infos
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_compact_mode_memory(tmp_path):
+    paths = write_python_repo(tmp_path, 5000)
+
+    full_bytes, full_infos = await _retained_memory(tmp_path, paths, "full")
+    compact_bytes, compact_infos = await _retained_memory(tmp_path, paths, "compact", compact=True)
+
+    print(f"Retained memory for {len(paths)} files: full {full_bytes / 2**20:.1f} MiB, "
+          f"compact {compact_bytes / 2**20:.1f} MiB ({full_bytes / compact_bytes:.1f}x smaller)")
+    assert compact_bytes < full_bytes
+    assert [tag.name for tag in compact_infos[paths[0]].tags] == [tag.name for tag in full_infos[paths[0]].tags]
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_tag_store_memory(tmp_path):
+    paths = write_python_repo(tmp_path, 3000)
+    _, file_infos = await _cold_index(tmp_path, paths, "store", compact=True)
+    # Tags from a fresh parse hold their own copies of every identifier.
+    tags = {path: [Tag(**tag.to_dict()) for tag in info.tags] for path, info in file_infos.items()}
+    del file_infos
+    gc.collect()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    objects = {path: [Tag(**tag.to_dict()) for tag in path_tags] for path, path_tags in tags.items()}
+    object_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    del objects
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = TagStore.from_file_infos({path: FileInfo(path, 0.0, "", path_tags) for path, path_tags in tags.items()})
+    store_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    print(f"{len(store)} tags: Tag objects {object_bytes / 2**20:.1f} MiB, "
+          f"tag store {store_bytes / 2**20:.1f} MiB")
+    assert store_bytes < object_bytes
+
+
+@pytest.mark.slow
+def test_incremental_reparse_cost(tmp_path):
+    fname = str(tmp_path / "big.py")
+    content = "".join(PYTHON_TEMPLATE.format(i=i, j=(i * 7) % 2000) for i in range(2000))
+    extractor = TagExtractor(str(tmp_path), registry=LanguageRegistry())
+    tagger = IncrementalTagger(extractor)
+    tagger.update(fname, content)
+
+    # Each edit changes one call on top of the previous edits, like consecutive tool edits would.
+    edits = []
+    for i in range(0, 2000, 100):
+        content = content.replace(f"return helper_{i}(value)", f"return helper_{i}(value, {i})", 1)
+        edits.append(content)
+    start = time.perf_counter()
+    for edited in edits:
+        extractor.extract_tags(fname, edited)
+    full = (time.perf_counter() - start) / len(edits)
+    start = time.perf_counter()
+    for edited in edits:
+        tagger.update(fname, edited)
+    incremental = (time.perf_counter() - start) / len(edits)
+
+    print(f"Re-tagging a {len(content) // 1024} KiB file after a one-line edit: full {full * 1000:.1f} ms, "
+          f"incremental {incremental * 1000:.1f} ms")
+    assert incremental < full
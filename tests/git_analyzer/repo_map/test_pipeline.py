@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.pipeline import FINISHED, IndexPipeline
+
+
+@pytest.mark.asyncio
+async def test_pipeline_applies_backpressure_and_reports_progress():
+    in_flight = 0
+    peak = 0
+    consumed = []
+    events = []
+
+    async def produce(batch):
+        nonlocal in_flight, peak
+        passed = [item for item in batch if item % 10]
+        in_flight += len(passed)
+        peak = max(peak, in_flight)
+        return passed
+
+    async def consume(batch):
+        nonlocal in_flight
+        # A slow last stage must hold back the first one.
+        await asyncio.sleep(0.001)
+        in_flight -= len(batch)
+        consumed.extend(batch)
+        return []
+
+    pipeline = IndexPipeline(queue_size=4, on_progress=events.append)
+    pipeline.add_stage("produce", produce, workers=2).add_stage("consume", consume, batch_size=3)
+    await pipeline.run(range(100), 100)
+
+    assert sorted(consumed) == [item for item in range(100) if item % 10]
+    # Items wait in at most one queue, in a running handler, or on a put into a full queue.
+    assert peak <= 4 + 2 + 3
+    finished = [event for event in events if event.stage == FINISHED]
+    assert finished[-1].done == 100 and finished[-1].total == 100
+    assert [event.done for event in events if event.stage == "consume"][-1] == 90
+
+
+@pytest.mark.asyncio
+async def test_analyze_files_reports_every_stage(tmp_path):
+    paths = []
+    for i in range(20):
+        (tmp_path / f"mod{i}.py").write_text(f"def f{i}():\n    return {i}\n")
+        paths.append(f"mod{i}.py")
+    paths.append("missing.py")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), pipeline_queue_size=2, persist_batch_size=3))
+    events = []
+
+    file_infos = await analyzer.analyze_files(paths, on_progress=events.append)
+
+    assert list(file_infos) == paths[:-1]
+    last = {event.stage: event.done for event in events}
+    assert last == {"stat": 21, "lookup": 20, "read": 20, "parse": 20, "persist": 20, FINISHED: 21}
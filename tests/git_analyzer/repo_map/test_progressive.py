@@ -0,0 +1,45 @@
+import pytest
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.progressive import ProgressiveIndexer, mentioned_files, prioritize
+
+
+def test_prioritize_orders_first_then_most_changed_then_by_path():
+    paths = ["a.py", "b.py", "c.py", "d.py", "e.py"]
+    order = prioritize(paths, first=["e.py", "untracked.py", "e.py"], change_count={"b.py": 3, "d.py": 7, "e.py": 9})
+    assert order == ["e.py", "d.py", "b.py", "a.py", "c.py"]
+
+
+def test_mentioned_files_finds_tracked_paths_in_messages():
+    texts = ["Please fix `zap/app.py`, then zap/app.py.bak", None, "see docs/missing.md and README.md."]
+    assert mentioned_files(texts, ["zap/app.py", "README.md", "setup.py"]) == {"zap/app.py", "README.md"}
+
+
+@pytest.mark.asyncio
+async def test_start_serves_a_partial_map_until_the_background_is_done(tmp_path):
+    paths = []
+    for i in range(30):
+        (tmp_path / f"mod{i}.py").write_text(f"from base import helper\n\ndef f{i}():\n    return helper({i})\n")
+        paths.append(f"mod{i}.py")
+    (tmp_path / "base.py").write_text("def helper(x):\n    return x\n")
+    paths.append("base.py")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    indexer = ProgressiveIndexer(analyzer, foreground_files=2, batch_size=4)
+
+    repo_map = await indexer.start(paths, first=["mod7.py"], change_count={"base.py": 5, "mod3.py": 2})
+
+    assert set(repo_map.file_infos) == {"mod7.py", "base.py", "mod3.py"}
+    assert repo_map.partial and repo_map.pending_files == 28
+    ranked = repo_map.get_ranked_tags_map(["mod7.py"], set(), max_files=10)
+    assert {tag.path for tag in ranked} <= set(repo_map.file_infos)
+
+    await indexer.join()
+    assert not repo_map.partial and len(indexer) == 0
+    assert set(repo_map.file_infos) == set(paths)
+    # The graph is the same as the one of a full start.
+    full = await CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path))).build_graph(repo_map.file_infos)
+    assert {path: node.references for path, node in repo_map.graph.items()} == \
+        {path: node.references for path, node in full.items()}
+    ranked = repo_map.get_ranked_tags_map(["mod7.py"], set(), max_files=40)
+    assert {tag.path for tag in ranked} == set(paths)
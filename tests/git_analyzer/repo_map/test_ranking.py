@@ -0,0 +1,161 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from zap.git_analyzer.repo_map.ranking import ApproximatePageRank, PageRankEngine, RankingCache
+
+NODES = ["a.py", "b.py", "c.py", "d.py", "isolated.py"]
+EDGES = [
+    ("a.py", "b.py", "Beta"),
+    ("a.py", "c.py", "Gamma"),
+    ("b.py", "c.py", "Gamma"),
+    ("c.py", "a.py", "Alpha"),
+    ("d.py", "c.py", "_private"),
+    ("d.py", "d.py", "Delta"),
+]
+
+
+def _networkx_reference(engine, personalization, mentioned_idents):
+    teleport = engine.teleport_vector(personalization)
+    weights = engine.edge_weights(mentioned_idents)
+    G = nx.DiGraph()
+    G.add_nodes_from(engine.nodes)
+    for src, dst, weight in zip(engine.src, engine.dst, weights):
+        u, v = engine.nodes[src], engine.nodes[dst]
+        previous = G.get_edge_data(u, v, {"weight": 0.0})["weight"]
+        G.add_edge(u, v, weight=previous + weight)
+    p = dict(zip(engine.nodes, teleport))
+    return nx.pagerank(G, alpha=engine.alpha, personalization=p, dangling=p, tol=1e-12, max_iter=1000)
+
+
+@pytest.mark.parametrize("mentioned_idents", [set(), {"Gamma"}, {"_private", "Alpha"}])
+def test_rank_matches_networkx(mentioned_idents):
+    engine = PageRankEngine(NODES, EDGES, tol=1e-12)
+    personalization = {"a.py": 0.5, "d.py": 0.5}
+
+    ranks = engine.rank_dict(personalization, mentioned_idents)
+    expected = _networkx_reference(engine, personalization, mentioned_idents)
+
+    for node in NODES:
+        assert ranks[node] == pytest.approx(expected[node], abs=1e-9)
+    assert sum(ranks.values()) == pytest.approx(1.0)
+
+
+def test_self_references_are_not_edges():
+    engine = PageRankEngine(NODES, EDGES)
+    assert len(engine.src) == 5
+    assert "Delta" not in engine.ident_index
+
+
+def test_isolated_file_keeps_nonzero_rank_from_smoothing():
+    engine = PageRankEngine(NODES, EDGES)
+    ranks = engine.rank_dict({"a.py": 1.0}, set())
+    assert 0 < ranks["isolated.py"] < 0.2
+    assert ranks["c.py"] > ranks["isolated.py"]
+
+
+def test_mentioned_and_private_identifier_weights():
+    engine = PageRankEngine(NODES, EDGES)
+    weights = dict(zip(engine.edge_idents.tolist(), engine.edge_weights({"Gamma"}).tolist()))
+    assert weights[engine.ident_index["Gamma"]] == 10.0
+    assert weights[engine.ident_index["_private"]] == pytest.approx(0.1)
+    assert weights[engine.ident_index["Beta"]] == 1.0
+
+
+def test_unknown_focus_falls_back_to_uniform_teleport():
+    engine = PageRankEngine(NODES, EDGES)
+    teleport = engine.teleport_vector({"not_in_graph.py": 1.0})
+    assert np.allclose(teleport, 1 / len(NODES))
+
+
+def test_empty_graph():
+    engine = PageRankEngine([], [])
+    assert engine.rank_dict({"a.py": 1.0}, set()) == {}
+
+
+def test_ranking_cache_evicts_least_recently_used():
+    cache = RankingCache(max_size=2)
+    keys = [RankingCache.make_key([f"{i}.py"], [], 0) for i in range(3)]
+    cache.put_vector(keys[0], np.array([0.0]))
+    cache.put_vector(keys[1], np.array([1.0]))
+    assert cache.get_vector(keys[0]) is not None
+    cache.put_vector(keys[2], np.array([2.0]))
+
+    assert cache.get_vector(keys[1]) is None
+    assert cache.get_vector(keys[0]) is not None
+    assert cache.get_vector(keys[2]) is not None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_ranking_cache_nearest_vector_matches_version_and_overlap():
+    cache = RankingCache()
+    cache.put_vector(RankingCache.make_key(["a.py", "b.py"], [], 0), np.array([1.0]))
+    cache.put_vector(RankingCache.make_key(["c.py"], [], 0), np.array([2.0]))
+    cache.put_vector(RankingCache.make_key(["a.py", "b.py", "c.py"], [], 1), np.array([3.0]))
+
+    assert cache.nearest_vector(RankingCache.make_key(["a.py"], [], 0))[0] == 1.0
+    assert cache.nearest_vector(RankingCache.make_key(["c.py", "d.py"], [], 0))[0] == 2.0
+    assert cache.nearest_vector(RankingCache.make_key(["a.py"], [], 2)) is None
+
+
+def test_warm_start_converges_to_same_ranking():
+    engine = PageRankEngine(NODES, EDGES, tol=1e-12)
+    cold = engine.rank({"a.py": 1.0}, set())
+    warm = engine.rank({"a.py": 0.5, "b.py": 0.5}, set(), start=cold)
+    assert np.allclose(warm, engine.rank({"a.py": 0.5, "b.py": 0.5}, set()), atol=1e-9)
+
+
+def _random_graph(num_nodes=200, num_edges=1200, seed=7):
+    rng = np.random.default_rng(seed)
+    nodes = [f"f{i}.py" for i in range(num_nodes)]
+    edges = []
+    for _ in range(num_edges):
+        src, dst = rng.integers(0, num_nodes, size=2)
+        ident = f"_s{rng.integers(0, 50)}" if rng.random() < 0.1 else f"s{rng.integers(0, 300)}"
+        edges.append((nodes[src], nodes[dst], ident))
+    return nodes, edges
+
+
+@pytest.mark.parametrize("epsilon, max_error", [(1e-3, 5e-2), (1e-5, 1e-3), (1e-7, 1e-5)])
+def test_approximate_rank_matches_exact(epsilon, max_error):
+    nodes, edges = _random_graph()
+    engine = PageRankEngine(nodes, edges, tol=1e-12)
+    approximate = ApproximatePageRank(engine, epsilon=epsilon)
+    personalization = {node: 1.0 for node in nodes[:20]}
+
+    for mentioned in (set(), {"s1", "s2", "_s3"}):
+        exact = engine.rank(personalization, mentioned)
+        approx = approximate.rank(personalization, mentioned)
+        assert approx.sum() == pytest.approx(1.0)
+        assert np.abs(exact - approx).sum() < max_error
+
+    exact_top = set(np.argsort(-exact)[:10])
+    approx_top = set(np.argsort(-approx)[:10])
+    assert len(exact_top & approx_top) >= 8
+
+
+def test_approximate_rank_reuses_push_vectors():
+    nodes, edges = _random_graph(num_nodes=50, num_edges=200)
+    approximate = ApproximatePageRank(PageRankEngine(nodes, edges), max_ident_sets=2)
+    approximate.precompute()
+    assert len(approximate._push_vectors[frozenset()]) == 50
+
+    approximate.rank({"f1.py": 1.0, "f2.py": 1.0}, set())
+    assert len(approximate._push_vectors[frozenset()]) == 50
+    idents = list(approximate.engine.ident_index)
+    approximate.rank({"f1.py": 1.0}, {idents[0]})
+    assert sum(map(len, approximate._push_vectors.values())) == 51
+
+    # Each new set of mentioned identifiers evicts the least recently used one with its vectors.
+    approximate.rank({"f1.py": 1.0}, set())
+    approximate.rank({"f1.py": 1.0}, {idents[1]})
+    assert len(approximate._matrices) == len(approximate._push_vectors) == len(approximate._uniform) == 2
+    assert frozenset() in approximate._matrices
+
+
+def test_approximate_rank_unknown_focus_and_empty_graph():
+    engine = PageRankEngine(NODES, EDGES, tol=1e-12)
+    approximate = ApproximatePageRank(engine)
+    ranks = approximate.rank({"missing.py": 1.0}, set())
+    assert np.allclose(ranks, engine.rank({"missing.py": 1.0}, set()), atol=1e-9)
+    assert ApproximatePageRank(PageRankEngine([], [])).rank({"a.py": 1.0}, set()).size == 0
@@ -1,11 +1,15 @@
 import unittest
 import tempfile
 import os
+import subprocess
 
+import pygit2
 import pytest
 
+from zap.git_analyzer.repo_map.blob_resolver import BlobIdResolver
 from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
 from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.models import FileInfo, Tag
 
 
 class TestRepoAnalyzer(unittest.TestCase):
@@ -69,5 +73,253 @@ class TestRepoAnalyzer(unittest.TestCase):
         self.assertEqual(len(graph['sample.cs'].definitions), 5)
 
 
+def _file_info(path, defs, refs):
+    tags = [Tag(path, 1, 1, name, "def") for name in defs] + [Tag(path, 2, 2, name, "ref") for name in refs]
+    return FileInfo(path, 0.0, "", tags)
+
+
+@pytest.mark.asyncio
+async def test_build_graph_uses_symbol_index(tmp_path):
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    file_infos = {
+        "a.py": _file_info("a.py", ["Alpha", "shared"], ["Beta"]),
+        "b.py": _file_info("b.py", ["Beta", "shared"], ["Alpha", "shared"]),
+        "c.py": _file_info("c.py", [], ["shared", "missing"]),
+        "d.py": _file_info("d.py", ["Lonely"], []),
+    }
+
+    graph = await analyzer.build_graph(file_infos)
+
+    assert analyzer.symbol_index == {
+        "Alpha": {"a.py"},
+        "Beta": {"b.py"},
+        "shared": {"a.py", "b.py"},
+        "Lonely": {"d.py"},
+    }
+    assert graph["a.py"].references == {"Beta", "b.py", "c.py"}
+    assert graph["b.py"].references == {"Alpha", "shared", "a.py", "c.py"}
+    assert graph["c.py"].references == {"shared", "missing", "a.py", "b.py"}
+    assert graph["d.py"].references == set()
+    assert graph["d.py"].definitions == {"Lonely"}
+
+
+@pytest.mark.asyncio
+async def test_analyze_files_batches_cache_access(tmp_path, mocker):
+    (tmp_path / "a.py").write_text("class Alpha:\n    pass\n")
+    (tmp_path / "b.py").write_text("def beta():\n    return Alpha()\n")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        set_many = mocker.spy(analyzer.cache_manager, "set_many")
+        extract_tags = mocker.spy(analyzer.tag_extractor, "extract_tags")
+
+        file_infos = await analyzer.analyze_files(["a.py", "b.py", "missing.py"])
+        assert set(file_infos) == {"a.py", "b.py"}
+        assert set_many.call_count == 1
+        assert [entry[0] for entry in set_many.call_args.args[0]] == ["a.py", "b.py"]
+        assert extract_tags.call_count == 2
+
+        cached_infos = await analyzer.analyze_files(["a.py", "b.py"])
+        assert extract_tags.call_count == 2
+        assert set_many.call_args.args[0] == []
+        assert cached_infos["b.py"].tags == file_infos["b.py"].tags
+    finally:
+        await analyzer.close()
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.email=test@example.com", "-c", "user.name=Test", *args], cwd=cwd,
+                   check=True, capture_output=True)
+
+
+@pytest.mark.asyncio
+async def test_tag_cache_is_keyed_by_blob_id(tmp_path, mocker):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("class Alpha:\n    pass\n")
+    (repo / "b.py").write_text("def beta():\n    return Alpha()\n")
+    _git(repo, "init", "-q")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-qm", "initial")
+    cache_dir = str(tmp_path / "shared_cache")
+
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(repo), cache_dir=cache_dir))
+    try:
+        await analyzer.analyze_files(["a.py", "b.py"])
+    finally:
+        await analyzer.close()
+
+    # A fresh clone has new mtimes but the same blobs, so nothing is re-parsed.
+    _git(tmp_path, "clone", "-q", str(repo), "clone")
+    clone = tmp_path / "clone"
+    os.utime(clone / "a.py", (1, 1))
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(clone), cache_dir=cache_dir))
+    try:
+        extract_tags = mocker.spy(analyzer.tag_extractor, "extract_tags")
+        hashfile = mocker.spy(pygit2, "hashfile")
+        file_infos = await analyzer.analyze_files(["a.py", "b.py"])
+        assert extract_tags.call_count == 0
+        assert hashfile.call_count == 0
+        assert {tag.name for tag in file_infos["a.py"].tags} == {"Alpha"}
+        assert all(tag.path == "b.py" for tag in file_infos["b.py"].tags)
+
+        # Only the dirty file is hashed and re-parsed.
+        (clone / "b.py").write_text("def gamma():\n    pass\n")
+        file_infos = await analyzer.analyze_files(["a.py", "b.py"])
+        assert extract_tags.call_count == 1
+        assert hashfile.call_count == 1
+        assert {tag.name for tag in file_infos["b.py"].tags} == {"gamma"}
+
+        # Unchanged stat skips blob resolution entirely.
+        await analyzer.analyze_files(["a.py", "b.py"])
+        assert extract_tags.call_count == 1
+        assert hashfile.call_count == 1
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_compact_mode_reads_bodies_from_disk(tmp_path, mocker):
+    source = "# caf\u00e9\nclass Alpha:\n    pass\n"
+    (tmp_path / "a.py").write_text(source, encoding="utf-8")
+    full = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), cache_dir=".full_cache"))
+    compact = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), compact=True))
+    try:
+        full_info = (await full.analyze_files(["a.py"]))["a.py"]
+        alpha = next(tag for tag in full_info.tags if tag.name == "Alpha")
+        assert alpha.body == "class Alpha:\n    pass"
+
+        read_file = mocker.spy(compact, "_read_file")
+        for expected_reads in (1, 1):
+            compact_info = (await compact.analyze_files(["a.py"]))["a.py"]
+            # Only the first pass parses the file; cache hits in compact mode never open it.
+            assert read_file.call_count == expected_reads
+            assert compact_info.content == ""
+            assert compact_info.content_hash == full_info.content_hash
+            compact_alpha = next(tag for tag in compact_info.tags if tag.name == "Alpha")
+            assert compact_alpha.body == ""
+            assert compact.read_body(compact_alpha, compact_info) == alpha.body
+
+        (tmp_path / "a.py").write_text("class Beta:\n    pass\n")
+        assert compact.read_body(compact_alpha, compact_info) == ""
+    finally:
+        await full.close()
+        await compact.close()
+
+
+@pytest.mark.asyncio
+async def test_query_symbol_uses_tag_store_once_graph_is_built(tmp_path, mocker):
+    (tmp_path / "a.py").write_text("class Alpha:\n    pass\n")
+    (tmp_path / "b.py").write_text("def beta():\n    return Alpha()\n")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        file_infos = await analyzer.analyze_files(["a.py", "b.py"])
+        from_cache = await analyzer.query_symbol("Alpha")
+        assert [(tag.path, tag.kind) for tag in from_cache] == [("a.py", "def"), ("b.py", "ref")]
+
+        await analyzer.build_graph(file_infos)
+        cache_query = mocker.spy(analyzer.cache_manager, "query_symbol")
+        assert await analyzer.query_symbol("Alpha") == from_cache
+        assert [tag.name for tag in await analyzer.query_symbol("be", kind="def", prefix=True)] == ["beta"]
+        assert cache_query.call_count == 0
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_update_file_patches_indexes_like_a_full_rebuild(tmp_path, mocker):
+    from zap.git_analyzer.repo_map.repo_map import RepoMap
+
+    (tmp_path / "a.py").write_text("class Alpha:\n    pass\n\n\ndef unused():\n    pass\n")
+    (tmp_path / "b.py").write_text("def beta():\n    return Alpha()\n")
+    (tmp_path / "c.py").write_text("def gamma():\n    return beta()\n")
+    paths = ["a.py", "b.py", "c.py"]
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        file_infos = await analyzer.analyze_files(paths)
+        graph = await analyzer.build_graph(file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: analyzer.tag_store)
+        parse = mocker.spy(analyzer.tag_extractor, "parse")
+
+        # b.py stops using Alpha and starts using gamma; the second edit reuses the first tree.
+        (tmp_path / "b.py").write_text("def beta():\n    return gamma()\n")
+        repo_map.update_file(await analyzer.update_file("b.py"), analyzer.graph["b.py"])
+        (tmp_path / "b.py").write_text("\n\ndef beta():\n    return gamma()\n\n\ndef delta():\n    pass\n")
+        file_info = await analyzer.update_file("b.py")
+        repo_map.update_file(file_info, analyzer.graph["b.py"])
+        assert parse.call_args_list[1].args[2] is not None
+        # Once the graph is built, tags are only kept in the store.
+        assert file_info.tags == []
+        assert {(tag.name, tag.start_line) for tag in analyzer.tag_store.select(path="b.py")} == {
+            ("beta", 3), ("gamma", 4), ("delta", 7)
+        }
+
+        full = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), cache_dir=".full_cache"))
+        try:
+            full_infos = await full.analyze_files(paths)
+            full_graph = await full.build_graph(full_infos)
+        finally:
+            await full.close()
+        assert analyzer.graph == full_graph
+        assert analyzer.symbol_index == full.symbol_index
+        assert analyzer.reference_index == full.reference_index
+        assert await analyzer.query_symbol("gamma") == await full.query_symbol("gamma")
+        assert (await analyzer.cache_manager.get_cache("b.py"))["blob_id"] == full_infos["b.py"].content_hash
+
+        full_map = RepoMap(full_graph, full_infos, tag_store=lambda: full.tag_store)
+        assert sorted(repo_map.ident_edges) == sorted(full_map.ident_edges)
+        assert repo_map.idents == full_map.idents
+        assert sorted(repo_map.nx_graph.edges(data="ident")) == sorted(full_map.nx_graph.edges(data="ident"))
+        repo_map.calculate_pagerank(["a.py"], set())
+        full_map.calculate_pagerank(["a.py"], set())
+        assert repo_map.ranks == pytest.approx(full_map.ranks)
+    finally:
+        await analyzer.close()
+
+
 if __name__ == '__main__':
     unittest.main()
+
+
+@pytest.mark.asyncio
+async def test_hit_rate_counts_each_file_once(tmp_path):
+    (tmp_path / "a.py").write_text("def alpha():\n    pass\n")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        await analyzer.analyze_files(["a.py"])
+        (tmp_path / "a.py").write_text("def beta():\n    pass\n")
+        os.utime(tmp_path / "a.py", (1, 1))
+        await analyzer.analyze_files(["a.py"])
+        # The path's entry points at the other blob, so its tags come from the blob table: one hit.
+        (tmp_path / "a.py").write_text("def alpha():\n    pass\n")
+        os.utime(tmp_path / "a.py", (2, 2))
+        await analyzer.analyze_files(["a.py"])
+        assert (analyzer.cache_manager.lookups, analyzer.cache_manager.hits) == (3, 1)
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_small_runs_check_the_status_of_their_files_only(tmp_path, mocker):
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.py").write_text(f"def {name}():\n    pass\n")
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-qm", "initial")
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        dirty_paths = mocker.spy(BlobIdResolver, "_dirty_paths")
+        await analyzer.analyze_files(["a.py", "b.py"])
+        (tmp_path / "a.py").write_text("def alpha():\n    pass\n")
+        file_infos = await analyzer.analyze_files(["a.py", "b.py"])
+        assert {tag.name for tag in file_infos["a.py"].tags} == {"alpha"}
+        assert file_infos["b.py"].content_hash == str(pygit2.Repository(str(tmp_path)).index["b.py"].id)
+        assert dirty_paths.call_count == 0
+
+        # Larger runs take one status of the whole work tree.
+        mocker.patch("zap.git_analyzer.repo_map.blob_resolver.STATUS_FILE_LIMIT", 1)
+        (tmp_path / "b.py").write_text("def beta():\n    pass\n")
+        file_infos = await analyzer.analyze_files(["a.py", "b.py"])
+        assert {tag.name for tag in file_infos["b.py"].tags} == {"beta"}
+        assert dirty_paths.call_count == 1
+    finally:
+        await analyzer.close()
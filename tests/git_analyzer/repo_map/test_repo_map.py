@@ -7,6 +7,7 @@ import pytest
 from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
 from zap.git_analyzer.repo_map.repo_map import RepoMap
 from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.models import FileInfo, GraphNode, Tag
 import networkx as nx
 
 
@@ -76,7 +77,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_pagerank_calculation(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         repo_map.calculate_pagerank(['sample.py', 'sample.cs', 'another_sample.py'], set())
 
         ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
@@ -95,7 +96,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_get_ranked_tags_map(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         ranked_tags = repo_map.get_ranked_tags_map(['sample.py'], set(), max_files=2, max_tags_per_file=2)
         self.assertGreater(len(ranked_tags), 0)
 
@@ -113,7 +114,7 @@ class TestRepoMap(unittest.TestCase):
         file_infos = await self.repo_analyzer.analyze_files(
             ['sample.py', 'sample.cs', 'another_sample.py', 'isolated.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         repo_map.calculate_pagerank(['sample.py', 'sample.cs', 'another_sample.py', 'isolated.py'], set())
 
         ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
@@ -154,7 +155,7 @@ class TestRepoMap(unittest.TestCase):
 
         file_infos = await self.repo_analyzer.analyze_files(['circular1.py', 'circular2.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         repo_map.calculate_pagerank(['circular1.py', 'circular2.py'], set())
 
         ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
@@ -172,7 +173,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_pagerank_with_different_weights(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
 
         # Debug: Print initial file_infos and graph
         print("File Infos:")
@@ -201,7 +202,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_pagerank_with_no_focus_files(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         with self.assertRaises(ValueError):
             repo_map.calculate_pagerank([], set())
 
@@ -209,7 +210,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_frequently_mentioned_identifiers(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         repo_map.calculate_pagerank(['sample.py', 'sample.cs'], {'SampleClass', 'method_one'})
 
         ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
@@ -228,7 +229,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_sparsely_mentioned_identifiers(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         repo_map.calculate_pagerank(['sample.py', 'sample.cs'], {'sample_function'})
 
         ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
@@ -246,7 +247,7 @@ class TestRepoMap(unittest.TestCase):
     async def test_identifiers_mentioned_across_multiple_files(self):
         file_infos = await self.repo_analyzer.analyze_files(['sample.py', 'sample.cs', 'another_sample.py'])
         graph = await self.repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.repo_analyzer.tag_store)
         repo_map.calculate_pagerank(['sample.py', 'sample.cs'], {'SampleClass', 'CompositeClass'})
 
         ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
@@ -262,5 +263,111 @@ class TestRepoMap(unittest.TestCase):
         self.assertGreater(ranks['another_sample.py'], 0)
 
 
+def test_ident_index_builds_edges_in_one_pass():
+    graph = {
+        "a.py": GraphNode("a.py", {"Beta", "b.py"}, {"Alpha", "helper"}),
+        "b.py": GraphNode("b.py", {"Alpha", "helper", "a.py"}, {"Beta", "helper"}),
+        "c.py": GraphNode("c.py", {"helper", "missing"}, set()),
+    }
+    repo_map = RepoMap(graph, {})
+
+    assert repo_map.definers["helper"] == {"a.py", "b.py"}
+    assert repo_map.referencers["helper"] == {"b.py", "c.py"}
+    assert repo_map.idents == {"Alpha", "Beta", "helper"}
+    assert sorted(repo_map.nx_graph.edges(data="ident")) == sorted([
+        ("a.py", "b.py", "Beta"),
+        ("b.py", "a.py", "Alpha"),
+        ("b.py", "a.py", "helper"),
+        ("b.py", "b.py", "helper"),
+        ("c.py", "a.py", "helper"),
+        ("c.py", "b.py", "helper"),
+    ])
+
+    repo_map.calculate_pagerank(["c.py"], set())
+    ranks = nx.get_node_attributes(repo_map.nx_graph, 'pagerank')
+    assert set(ranks) == {"a.py", "b.py", "c.py"}
+    assert abs(sum(ranks.values()) - 1.0) < 1e-6
+
+
+def test_ranked_tags_map_is_cached_until_graph_changes(mocker):
+    graph = {
+        "a.py": GraphNode("a.py", {"Beta"}, {"Alpha"}),
+        "b.py": GraphNode("b.py", {"Alpha"}, {"Beta"}),
+    }
+    repo_map = RepoMap(graph, {}, warm_start=True)
+    rank = mocker.spy(repo_map.ranker, "rank")
+
+    first = repo_map.get_ranked_tags_map(["a.py"], {"Beta"}, max_files=2)
+    second = repo_map.get_ranked_tags_map(["a.py"], {"Beta"}, max_files=2)
+    assert first == second
+    assert rank.call_count == 1
+    assert repo_map.ranking_cache.hits == 2
+
+    repo_map.get_ranked_tags_map(["a.py", "b.py"], {"Beta"}, max_files=2)
+    assert rank.call_count == 2
+    assert rank.call_args.kwargs["start"] is not None
+
+    repo_map.update_graph(graph, {})
+    assert repo_map.version == 1
+    assert len(repo_map.ranking_cache) == 0
+    repo_map.get_ranked_tags_map(["a.py"], {"Beta"}, max_files=2)
+    assert repo_map.ranks["a.py"] > repo_map.ranks["b.py"]
+
+
+def test_symbol_names_follow_graph_updates():
+    def info(path, *names):
+        return FileInfo(path, 1.0, "", [Tag(path=path, start_line=1, end_line=1, name=name, kind="def")
+                                        for name in names])
+
+    repo_map = RepoMap({"a.py": GraphNode("a.py", set(), {"Alpha"})}, {"a.py": info("a.py", "Alpha")})
+    names = repo_map.symbol_names()
+    assert names == {"alpha"} and repo_map.symbol_names() is names
+
+    # Files indexed in the background and edits show up once the graph changes.
+    graph = {"a.py": GraphNode("a.py", set(), {"Alpha"}), "b.py": GraphNode("b.py", set(), {"Beta"})}
+    repo_map.update_graph(graph, {"a.py": info("a.py", "Alpha"), "b.py": info("b.py", "Beta")})
+    assert repo_map.symbol_names() == {"alpha", "beta"}
+    repo_map.update_files({"a.py": info("a.py", "Gamma")}, {"a.py": GraphNode("a.py", set(), {"Gamma"})})
+    assert repo_map.symbol_names() == {"gamma", "beta"}
+
+
+def test_remove_file_keeps_edges_between_remaining_files():
+    def graph():
+        return {
+            "a.py": GraphNode("a.py", set(), {"helper"}),
+            "b.py": GraphNode("b.py", {"Alpha"}, {"helper"}),
+            "c.py": GraphNode("c.py", {"helper"}, {"Alpha"}),
+        }
+
+    repo_map = RepoMap(graph(), {})
+    repo_map.remove_file("a.py")
+    rebuilt = graph()
+    del rebuilt["a.py"]
+    expected = RepoMap(rebuilt, {})
+
+    assert sorted(repo_map.ident_edges) == sorted(expected.ident_edges)
+    assert sorted(repo_map.nx_graph.edges(data="ident")) == sorted(expected.nx_graph.edges(data="ident")) == [
+        ("b.py", "c.py", "Alpha"),
+        ("c.py", "b.py", "helper"),
+    ]
+
+
+def test_approximate_mode_ranks_like_exact_mode():
+    graph = {
+        "a.py": GraphNode("a.py", {"Beta", "Gamma"}, {"Alpha"}),
+        "b.py": GraphNode("b.py", {"Gamma"}, {"Beta"}),
+        "c.py": GraphNode("c.py", {"Alpha"}, {"Gamma"}),
+        "d.py": GraphNode("d.py", set(), {"Delta"}),
+    }
+    exact = RepoMap(graph, {})
+    approximate = RepoMap(graph, {}, approximate=True, push_epsilon=1e-8)
+
+    exact.calculate_pagerank(["a.py"], {"Gamma"})
+    approximate.calculate_pagerank(["a.py"], {"Gamma"})
+
+    for file in graph:
+        assert abs(exact.ranks[file] - approximate.ranks[file]) < 1e-5
+
+
 if __name__ == '__main__':
     unittest.main()
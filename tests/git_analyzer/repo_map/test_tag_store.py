@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from zap.git_analyzer.repo_map.models import FileInfo, Tag
+from zap.git_analyzer.repo_map.tag_store import TagRef, TagStore, TagView
+
+
+def _tag(path, name, kind, line):
+    return Tag(path=path, start_line=line, end_line=line + 1, name=name, kind=kind, start_byte=line * 10,
+               end_byte=line * 10 + 5)
+
+
+@pytest.fixture
+def store():
+    file_infos = {
+        "b.py": FileInfo("b.py", 1.0, "", [_tag("b.py", "Beta", "def", 3), _tag("b.py", "Alpha", "ref", 1)]),
+        "a.py": FileInfo("a.py", 1.0, "", [_tag("a.py", "Alpha", "def", 1), _tag("a.py", "AlphaBeta", "ref", 7)]),
+        "c.py": FileInfo("c.py", 1.0, "", []),
+    }
+    return TagStore.from_file_infos(file_infos)
+
+
+def test_names_and_paths_are_interned(store):
+    assert len(store) == 4
+    assert store.names == ["Beta", "Alpha", "AlphaBeta"]
+    assert store.paths == ["b.py", "a.py"]
+    assert store.columns()["kind"].dtype == np.uint8
+    assert store.columns()["name"].tolist() == [0, 1, 1, 2]
+
+
+def test_refs_read_like_tags(store):
+    ref = store.select(path="a.py")[0]
+    assert isinstance(ref, TagRef)
+    assert ref == _tag("a.py", "Alpha", "def", 1)
+    assert ref.to_tag() == _tag("a.py", "Alpha", "def", 1)
+    assert ref.to_dict()["start_byte"] == 10
+    assert not hasattr(ref, "__dict__")
+
+
+def test_select_filters(store):
+    def keys(view):
+        return [(tag.path, tag.name, tag.kind) for tag in view]
+
+    assert keys(store.select(name="Alpha")) == [("a.py", "Alpha", "def"), ("b.py", "Alpha", "ref")]
+    assert keys(store.select(name="Alpha", kind="ref")) == [("b.py", "Alpha", "ref")]
+    assert keys(store.select(name="Alp", prefix=True)) == [
+        ("a.py", "Alpha", "def"), ("a.py", "AlphaBeta", "ref"), ("b.py", "Alpha", "ref")
+    ]
+    assert keys(store.select(path="b.py", kind="def")) == [("b.py", "Beta", "def")]
+    assert keys(store.select(path="b.py", name="Alpha")) == [("b.py", "Alpha", "ref")]
+    assert len(store.select(name="Missing")) == 0
+    assert len(store.select(kind="unknown")) == 0
+    assert len(store.select(path="c.py")) == 0
+
+
+def test_views_slice_and_concat(store):
+    view = TagView.concat(store, [store.view(store.file_rows("a.py")), store.view(store.file_rows("b.py")[:1])])
+    assert [tag.name for tag in view] == ["Alpha", "AlphaBeta", "Beta"]
+    assert view[1:].paths() == ["a.py", "b.py"]
+    assert view == view.to_tags()
+    assert view.to_dicts()[2]["name"] == "Beta"
+    with pytest.raises(ValueError):
+        view.rows[0] = 1
+
+
+def test_store_rejects_duplicate_files(store):
+    with pytest.raises(ValueError):
+        store.add_file("a.py", [_tag("a.py", "Gamma", "def", 9)])
+
+
+def test_from_dicts_groups_rows_by_path():
+    store = TagStore.from_dicts([
+        {"path": "a.py", "start_line": 1, "end_line": 2, "name": "Alpha", "kind": "def"},
+        {"path": "b.py", "start_line": 1, "end_line": 2, "name": "Alpha", "kind": "ref"},
+        {"path": "a.py", "start_line": 5, "end_line": 6, "name": "Gamma", "kind": "def"},
+    ])
+    assert [tag.name for tag in store.view(store.file_rows("a.py"))] == ["Alpha", "Gamma"]
+    assert store.select(name="Gamma")[0].start_byte == -1
+
+
+def test_replace_file_keeps_old_views(store):
+    before = store.select(name="Alpha")
+    store.replace_file("a.py", [_tag("a.py", "Gamma", "def", 2)])
+    assert len(store) == 3
+    assert [tag.path for tag in store.select(name="Alpha")] == ["b.py"]
+    assert [tag.name for tag in store.select(path="a.py")] == ["Gamma"]
+    assert [tag.name for tag in store.select(name="Gam", prefix=True)] == ["Gamma"]
+    assert len(store.select()) == 3
+    assert [tag.path for tag in before] == ["a.py", "b.py"]
+
+    store.remove_file("a.py")
+    assert len(store.select(path="a.py")) == 0
+    store.add_file("a.py", [_tag("a.py", "Alpha", "def", 1)])
+    assert [tag.path for tag in store.select(name="Alpha")] == ["a.py", "b.py"]
+
+
+def test_compaction_drops_dead_rows_and_keeps_old_views(store):
+    before = store.select(name="Alpha")
+    for line in range(3):
+        store.replace_file("a.py", [_tag("a.py", f"Gamma{line}", "def", line)])
+    assert store.needs_compaction is False  # below COMPACT_MIN_ROWS
+    compacted = store.compacted()
+    assert len(compacted.name_col) == len(compacted) == len(store) == 3
+    assert "Gamma0" not in compacted.names and "AlphaBeta" not in compacted.names
+    assert compacted.select().to_tags() == store.select().to_tags()
+    assert [tag.name for tag in compacted.select(name="Gam", prefix=True)] == ["Gamma2"]
+    assert compacted.select(path="b.py").to_tags() == store.select(path="b.py").to_tags()
+    compacted.replace_file("b.py", [])
+    assert [tag.name for tag in compacted.select()] == ["Gamma2"]
+    assert [tag.path for tag in before] == ["a.py", "b.py"]
+
+    store.COMPACT_MIN_ROWS = 1
+    assert store.needs_compaction is True
+    assert len(TagStore().compacted()) == 0
+
+
+def test_prefix_select_bisects_sorted_names():
+    store = TagStore.from_dicts([
+        {"path": "a.py", "start_line": line, "end_line": line, "name": name, "kind": "def"}
+        for line, name in enumerate(["ab", "a", "abc", "b", "ab\U0010ffff", "aC", "\U0010ffffz"])
+    ])
+    assert sorted(tag.name for tag in store.select(name="ab", prefix=True)) == ["ab", "abc", "ab\U0010ffff"]
+    assert [tag.name for tag in store.select(name="\U0010ffff", prefix=True)] == ["\U0010ffffz"]
+    assert len(store.select(name="", prefix=True)) == 7
+    assert len(store.select(name="c", prefix=True)) == 0
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import pytest
+
+from zap.git_analyzer.repo_map.d3js_visualizer import app as visualizer
+from zap.git_analyzer.repo_map.d3js_visualizer.lod import (GroupedGraph, collapse_edges, community_groups,
+                                                           directory_groups, stream_json)
+from zap.git_analyzer.repo_map.d3js_visualizer.service import RepoMapServices
+
+
+@pytest.fixture
+def client(temp_git_repo, monkeypatch):
+    files = {
+        "a.py": "from b import beta\n\ndef alpha():\n    return beta()\n",
+        "b.py": "def beta():\n    return 1\n",
+        "c.py": "def gamma():\n    return 2\n",
+    }
+    for path, content in files.items():
+        with open(os.path.join(temp_git_repo.path, path), "w") as f:
+            f.write(content)
+    os.system("git add . && git commit -qm initial")
+    services = RepoMapServices()
+    monkeypatch.setattr(visualizer, "services", services)
+    yield visualizer.app.test_client()
+    services.close()
+
+
+def test_graph_is_served_warm_with_etags(client, temp_git_repo, mocker):
+    assert client.get("/graph?focus_file=a.py").status_code == 400
+
+    response = client.get(f"/analyze?repo_path={temp_git_repo.path}")
+    assert response.json == {"focus_files": ["a.py", "b.py", "c.py"]}
+    service = visualizer.services.current
+    analyze_files = mocker.spy(service.code_analyzer, "analyze_files")
+
+    response = client.get("/graph?focus_file=a.py")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    graph = response.json
+    assert {node["id"] for node in graph["nodes"]} == {"a.py", "b.py", "c.py"}
+    assert {(link["source"], link["target"]) for link in graph["links"]} == {("a.py", "b.py")}
+
+    # Revalidation and other focus sets are answered from the warm map.
+    assert client.get("/graph?focus_file=a.py", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/focus_files", headers={"If-None-Match": etag}).status_code == 304
+    ranked = client.get("/graph?focus_file=c.py").json
+    assert max(ranked["nodes"], key=lambda node: node["pagerank"])["id"] == "c.py"
+    assert client.get("/graph?focus_file=a.py").data == response.data
+    assert client.get("/graph").status_code == 200
+    assert analyze_files.call_count == 0
+
+    with open(os.path.join(temp_git_repo.path, "c.py"), "w") as f:
+        f.write("from b import beta\n\ndef gamma():\n    return beta()\n")
+    deadline = time.monotonic() + 5
+    while client.get("/graph?focus_file=a.py", headers={"If-None-Match": etag}).status_code == 304:
+        assert time.monotonic() < deadline, "edit was not picked up"
+        time.sleep(0.05)
+    response = client.get("/graph?focus_file=a.py")
+    assert response.headers["ETag"] != etag
+    assert ("c.py", "b.py") in {(link["source"], link["target"]) for link in json.loads(response.data)["links"]}
+
+
+def test_level_of_detail_groups_ranks_and_streams():
+    ident_edges = [("a/x.py", "b/y.py", "f"), ("a/x.py", "b/y.py", "g"), ("a/z.py", "b/y.py", "f"),
+                   ("c/w.py", "a/x.py", "h"), ("a/x.py", "a/x.py", "self"), ("top.py", "c/w.py", "k")]
+    file_edges = collapse_edges(ident_edges)
+    assert file_edges[("a/x.py", "b/y.py")] == 2 and ("a/x.py", "a/x.py") not in file_edges
+    paths = ["a/x.py", "a/z.py", "b/y.py", "c/w.py", "top.py"]
+    groups = directory_groups(paths, 1)
+    assert groups["a/x.py"] == "a/" and groups["top.py"] == "top.py"
+
+    grouped = GroupedGraph.build(groups, file_edges)
+    assert grouped.edges == {("a/", "b/"): 3, ("c/", "a/"): 1, ("top.py", "c/"): 1}
+    ranks = {"a/x.py": 0.1, "a/z.py": 0.1, "b/y.py": 0.5, "c/w.py": 0.2, "top.py": 0.1}
+    nodes, links = grouped.level_of_detail(ranks, top_k=1, neighbors=1)
+    # b/ ranks first and a/ is its heaviest neighbor; c/ and top.py are left out.
+    assert [(node["id"], node["files"], node["top"]) for node in nodes] == [("b/", 1, True), ("a/", 2, False)]
+    assert links == [{"source": "a/", "target": "b/", "weight": 3}]
+
+    nodes, links = grouped.level_of_detail(ranks, top_k=3, neighbors=2, max_links=1)
+    assert len(nodes) == 4 and links == [{"source": "a/", "target": "b/", "weight": 3}]
+
+    communities = community_groups(paths, file_edges)
+    assert set(communities) == set(paths)
+
+    meta = {"version": 3}
+    many = [{"id": str(i)} for i in range(1201)]
+    assert json.loads("".join(stream_json(meta, many, []))) == {"version": 3, "nodes": many, "links": []}
+    assert json.loads("".join(stream_json({}, [], links))) == {"nodes": [], "links": links}
+
+
+def test_level_of_detail_endpoint(client, temp_git_repo):
+    client.get(f"/analyze?repo_path={temp_git_repo.path}")
+    response = client.get("/graph/lod?focus_file=a.py&level=1&top_k=1&neighbors=5")
+    assert response.status_code == 200 and response.is_streamed
+    graph = json.loads(response.data)
+    assert graph["files"] == 3 and graph["group"] == "directory"
+    assert {node["id"] for node in graph["nodes"]} == {"a.py", "b.py"}
+    assert graph["links"] == [{"source": "a.py", "target": "b.py", "weight": 1}]
+    etag = response.headers["ETag"]
+    assert client.get("/graph/lod?focus_file=a.py", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/graph/lod?group=community").status_code == 200
+    assert client.get("/graph/lod?group=size").status_code == 400
+    assert client.get("/graph/lod?top_k=many").status_code == 400
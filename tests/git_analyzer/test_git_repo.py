@@ -106,3 +106,30 @@ async def test_get_file_change_count(temp_git_repo):
     assert file_change_count["file_0.txt"] == 2
     assert file_change_count["file_1.txt"] == 1
     assert file_change_count["file_2.txt"] == 1
+
+
+@pytest.mark.asyncio
+async def test_check_head_and_changed_paths_on_branch_switch(temp_git_repo):
+    for name in ("keep.txt", "edit.txt", "drop.txt"):
+        with open(name, "w") as f:
+            f.write(name)
+    await asyncio.to_thread(os.system, "git add . && git commit -qm base")
+    assert await temp_git_repo.check_head() == (None, temp_git_repo.get_head_id())
+    assert await temp_git_repo.check_head() is None
+    base = temp_git_repo.get_head_id()
+
+    await asyncio.to_thread(os.system, "git checkout -qb feature")
+    with open("edit.txt", "a") as f:
+        f.write(" changed")
+    with open("new.txt", "w") as f:
+        f.write("new")
+    os.remove("drop.txt")
+    await asyncio.to_thread(os.system, "git add -A && git commit -qm feature")
+    # A branch switch back to the base commit moves HEAD to it.
+    await temp_git_repo.check_head()
+    await asyncio.to_thread(os.system, "git checkout -q -")
+    old_head, new_head = await temp_git_repo.check_head()
+    assert new_head == base
+
+    assert await temp_git_repo.get_changed_paths(old_head, new_head) == {"edit.txt", "new.txt", "drop.txt"}
+    assert await temp_git_repo.get_changed_paths(base, base) == set()
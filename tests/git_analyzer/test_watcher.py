@@ -0,0 +1,146 @@
+import asyncio
+import os
+
+import pytest
+
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.reindex import ReindexQueue
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+from zap.git_analyzer.watcher import InotifyWatcher, RepoWatcher
+
+
+@pytest.fixture
+def tracked_repo(temp_git_repo):
+    os.makedirs(os.path.join(temp_git_repo.path, "pkg"))
+    files = {
+        "pkg/a.py": "class Alpha:\n    pass\n",
+        "pkg/b.py": "def beta():\n    pass\n",
+        "setup.py": "def setup():\n    pass\n",
+    }
+    for path, content in files.items():
+        with open(os.path.join(temp_git_repo.path, path), "w") as f:
+            f.write(content)
+    os.system("git add . && git commit -qm initial")
+    return temp_git_repo
+
+
+def _write(repo, path, content):
+    with open(os.path.join(repo.root, path), "w") as f:
+        f.write(content)
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_inotify", [True, False])
+async def test_watcher_reports_debounced_tracked_changes(tracked_repo, use_inotify):
+    if use_inotify and not InotifyWatcher.available():
+        pytest.skip("inotify is not available")
+    await tracked_repo.refresh()
+    batches = []
+    watcher = RepoWatcher(tracked_repo, batches.append, debounce=0.1, poll_interval=0.05, use_inotify=use_inotify)
+    await watcher.start()
+    try:
+        assert (watcher.inotify is not None) == use_inotify
+        for i in range(3):
+            _write(tracked_repo, "pkg/a.py", f"class Alpha{i}:\n    pass\n")
+        _write(tracked_repo, "setup.py", "def setup():\n    return 1\n")
+        _write(tracked_repo, "pkg/untracked.py", "x = 1\n")
+        await _wait_for(lambda: batches)
+        await asyncio.sleep(0.3)
+        assert set().union(*batches) == {"pkg/a.py", "setup.py"}
+        if use_inotify:
+            assert len(batches) == 1
+    finally:
+        await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_inotify_overflow_recovers_with_a_stat_scan(tracked_repo):
+    if not InotifyWatcher.available():
+        pytest.skip("inotify is not available")
+    await tracked_repo.refresh()
+    batches = []
+    watcher = RepoWatcher(tracked_repo, batches.append, debounce=0.05)
+    await watcher.start()
+    try:
+        watcher.inotify.stop()
+        _write(tracked_repo, "pkg/b.py", "def beta():\n    return 2\n")
+        watcher._on_change(None)
+        await _wait_for(lambda: batches)
+        assert batches == [{"pkg/b.py"}]
+    finally:
+        await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_reindex_queue_patches_analyzer_and_repo_map(tracked_repo, mocker):
+    paths = sorted(await tracked_repo.get_tracked_files())
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(tracked_repo.root))
+    try:
+        file_infos = await analyzer.analyze_files(paths)
+        repo_map = RepoMap(await analyzer.build_graph(file_infos), file_infos, tag_store=lambda: analyzer.tag_store)
+        queue = ReindexQueue(analyzer, repo_map)
+        update_file = mocker.spy(analyzer, "update_file")
+        queue.start()
+
+        _write(tracked_repo, "pkg/b.py", "def beta():\n    return Alpha()\n")
+        queue.push(["pkg/b.py", "pkg/b.py"])
+        await queue.join()
+        assert update_file.call_count == 1
+        assert repo_map.referencers["Alpha"] == {"pkg/b.py"}
+        assert analyzer.graph["pkg/a.py"].references == {"pkg/b.py"}
+
+        os.remove(os.path.join(tracked_repo.root, "pkg/a.py"))
+        queue.push(["pkg/a.py"])
+        await queue.join()
+        assert "pkg/a.py" not in repo_map.graph and "pkg/a.py" not in repo_map.nx_graph
+        assert "Alpha" not in repo_map.idents
+        assert analyzer.graph["pkg/b.py"].references == {"Alpha"}
+        assert queue.processed == 2
+        await queue.stop()
+    finally:
+        await analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_branch_switch_reindexes_the_tree_diff_in_one_batch(tracked_repo, mocker):
+    os.system("git checkout -qb feature")
+    _write(tracked_repo, "pkg/b.py", "def beta():\n    return Alpha()\n")
+    _write(tracked_repo, "pkg/c.py", "def gamma():\n    return beta()\n")
+    os.system("git add -A && git commit -qm feature && git checkout -q -")
+    tracked_repo.last_head = tracked_repo.get_head_id()
+    await tracked_repo.refresh()
+
+    paths = sorted(await tracked_repo.get_tracked_files())
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(tracked_repo.root))
+    try:
+        file_infos = await analyzer.analyze_files(paths)
+        repo_map = RepoMap(await analyzer.build_graph(file_infos), file_infos, tag_store=lambda: analyzer.tag_store)
+        queue = ReindexQueue(analyzer, repo_map)
+        update_files = mocker.spy(analyzer, "update_files")
+        refresh_ranker = mocker.spy(repo_map, "_refresh_ranker")
+        queue.start()
+        watcher = RepoWatcher(tracked_repo, queue.push, debounce=0.1, on_branch_switch=queue.push_batch)
+        await watcher.start()
+        try:
+            os.system("git checkout -q feature")
+            await _wait_for(lambda: update_files.call_count)
+            await queue.join()
+        finally:
+            await watcher.stop()
+            await queue.stop()
+
+        assert set(update_files.call_args.args[0]) == {"pkg/b.py", "pkg/c.py"}
+        assert refresh_ranker.call_count == 1
+        assert "pkg/c.py" in tracked_repo.file_trie
+        assert analyzer.graph["pkg/a.py"].references == {"pkg/b.py"}
+        assert repo_map.referencers["beta"] == {"pkg/c.py"}
+    finally:
+        await analyzer.close()
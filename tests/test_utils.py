@@ -1,7 +1,11 @@
+import time
+
 import aiofiles
 import pytest
 
-from zap.utils import get_files_content
+import zap.utils
+from zap.git_analyzer.repo_map.models import Tag
+from zap.utils import RepoMapRenderer, get_files_content, get_files_content_from_tags, iter_files_content_from_tags
 
 
 @pytest.mark.asyncio
@@ -26,3 +30,107 @@ async def test_get_files_content_with_prefix(tmp_path):
 
     content = await get_files_content(d, ["testfile.txt"], prefix_lines=True)
     assert "|001|" in content
+
+
+@pytest.mark.asyncio
+async def test_files_content_from_tags_streams_lazily(tmp_path, mocker):
+    tags = [tag for i in range(30) for tag in _write_module(tmp_path, f"m{i}.py", 3)]
+    read_lines = mocker.spy(zap.utils, "_read_lines")
+
+    snippets = iter_files_content_from_tags(str(tmp_path), tags, exclude_files={"m1.py"}, max_concurrency=4)
+    first = await anext(snippets)
+    await snippets.aclose()
+    assert "filename: m0.py" in first
+    assert read_lines.call_count <= 1 + 4
+
+    content = await get_files_content_from_tags(str(tmp_path), tags, limit=len(first) * 3)
+    assert content.count("```py") == 3
+    # Three snippets fit and the fourth ends the stream, with at most 8 reads ahead of it.
+    assert read_lines.call_count <= 5 + 4 + 8
+
+
+def _write_module(root, name, functions):
+    body = "".join(f"def f{i}():\n    return {i}\n\n\n" for i in range(functions))
+    (root / name).write_text(f"import os\n\n\n{body}")
+    return [Tag(name, 4 + 4 * i, 5 + 4 * i, f"f{i}", "def") for i in range(functions)]
+
+
+@pytest.mark.asyncio
+async def test_renderer_matches_unlimited_rendering_when_everything_fits(tmp_path):
+    tags = _write_module(tmp_path, "a.py", 3) + _write_module(tmp_path, "b.py", 2)
+    renderer = RepoMapRenderer(str(tmp_path))
+
+    rendered = await renderer.render(tags, token_budget=10_000, exclude_files={"b.py"})
+    assert rendered == await get_files_content_from_tags(str(tmp_path), tags, exclude_files={"b.py"}, limit=10**9)
+
+
+@pytest.mark.asyncio
+async def test_renderer_fits_budget_and_stops_reading(tmp_path, mocker):
+    tags = (_write_module(tmp_path, "a.py", 5) + _write_module(tmp_path, "b.py", 20)
+            + _write_module(tmp_path, "c.py", 5))
+    counted = []
+    renderer = RepoMapRenderer(str(tmp_path), count_tokens=lambda text: counted.append(text) or len(text.split()))
+    read_lines = mocker.spy(renderer, "_read_lines")
+
+    full_a = await renderer.render(tags[:5], token_budget=10_000)
+    budget = len(full_a.split()) + 40
+    rendered = await renderer.render(tags, token_budget=budget)
+
+    # a.py fits whole, b.py is cut to its best-ranked functions and c.py is never read.
+    assert rendered.startswith(full_a + "\n")
+    assert "filename: b.py" in rendered and "def f0():" in rendered.split("filename: b.py")[1]
+    assert "def f19():" not in rendered and "c.py" not in rendered
+    assert [call.args[0] for call in read_lines.call_args_list] == ["a.py", "a.py", "b.py"]
+    assert len(rendered.split()) <= budget
+
+    # The second render only tokenizes snippets it has not seen before.
+    counted.clear()
+    assert await renderer.render(tags, token_budget=budget) == rendered
+    assert counted == []
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_files_content_from_tags_benchmark(tmp_path, mocker):
+    tags = [tag for i in range(10_000) for tag in _write_module(tmp_path, f"m{i}.py", 5)]
+    read_lines = mocker.spy(zap.utils, "_read_lines")
+
+    start = time.perf_counter()
+    content = await get_files_content_from_tags(str(tmp_path), tags, limit=20000)
+    limited = time.perf_counter() - start
+    files_read = read_lines.call_count
+    start = time.perf_counter()
+    await get_files_content_from_tags(str(tmp_path), tags, limit=10**9)
+    unlimited = time.perf_counter() - start
+
+    print(f"Snippets from {len(tags)} tags in 10000 files: limit=20000 {limited * 1000:.1f} ms reading "
+          f"{files_read} files, unlimited {unlimited * 1000:.1f} ms")
+    assert files_read <= content.count("```py") + 1 + 8
+
+
+@pytest.mark.asyncio
+async def test_outlines_replace_tag_ranges(tmp_path):
+    from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+    from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+
+    body = "".join(f"    x{i} = {i}\n" for i in range(20))
+    tags = []
+    for i in range(10):
+        source = f"import os\n\n\ndef f{i}(a):\n    \"\"\"Doc {i}.\"\"\"\n{body}    return a\n"
+        (tmp_path / f"m{i}.py").write_text(source)
+        tags.append(Tag(f"m{i}.py", 4, 26, f"f{i}", "def"))
+    analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        content = await get_files_content_from_tags(str(tmp_path), tags[:1], limit=10**6,
+                                                    outline=analyzer.get_outline)
+        assert content == (
+            '```py\n# filename: m0.py\nimport os\n...\ndef f0(a):\n    """Doc 0."""\n...\n    return a\n\n```'
+        )
+
+        renderer = RepoMapRenderer(str(tmp_path))
+        budget = 400
+        raw = await renderer.render(tags, budget)
+        outlined = await renderer.render(tags, budget, outline=analyzer.get_outline)
+        assert outlined.count("filename:") > 2 * raw.count("filename:")
+    finally:
+        await analyzer.close()
@@ -0,0 +1,58 @@
+import pytest
+
+from zap.app_state import AppState
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+from zap.tools.basic_tools import EditFileTool, ReplaceBlockTool, SearchTagTool, WriteFileTool
+
+
+class _Repo:
+    def __init__(self, root):
+        self.root = root
+
+
+@pytest.mark.asyncio
+async def test_edit_tools_refresh_the_repo_map(tmp_path):
+    (tmp_path / "a.py").write_text("class Alpha:\n    pass\n")
+    (tmp_path / "b.py").write_text("def beta():\n    pass\n")
+    state = AppState()
+    state.git_repo = _Repo(str(tmp_path))
+    state.code_analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path)))
+    try:
+        file_infos = await state.code_analyzer.analyze_files(["a.py", "b.py"])
+        state.repo_map = RepoMap(await state.code_analyzer.build_graph(file_infos), file_infos,
+                                 tag_store=lambda: state.code_analyzer.tag_store)
+        assert "Alpha" not in state.repo_map.idents
+
+        await ReplaceBlockTool(state).execute("b.py", "pass", "return Alpha()")
+        assert "Alpha" in state.repo_map.idents
+        await EditFileTool(state).execute("b.py", 2, 2, "    return None")
+        assert "Alpha" not in state.repo_map.idents
+        await WriteFileTool(state).execute("c.py", "def gamma():\n    return Alpha()\n")
+        assert state.repo_map.referencers["Alpha"] == {"c.py"}
+        assert [tag.path for tag in await state.code_analyzer.query_symbol("gamma")] == ["c.py"]
+    finally:
+        await state.code_analyzer.close()
+
+
+@pytest.mark.asyncio
+async def test_search_symbol_returns_bodies(tmp_path):
+    (tmp_path / "a.py").write_text("class Alpha:\n    pass\n\n\ndef beta():\n    return Alpha()\n")
+    state = AppState()
+    state.git_repo = _Repo(str(tmp_path))
+    state.code_analyzer = CodeAnalyzer(CodeAnalyzerConfig(str(tmp_path), compact=True))
+    try:
+        file_infos = await state.code_analyzer.analyze_files(["a.py"])
+        state.repo_map = RepoMap(await state.code_analyzer.build_graph(file_infos), file_infos,
+                                 tag_store=lambda: state.code_analyzer.tag_store)
+
+        result = await SearchTagTool(state).execute("beta", kind="def")
+        assert result["count"] == 1
+        assert result["tags"][0]["body"] == "def beta():\n    return Alpha()"
+        result = await SearchTagTool(state).execute("Al", match="prefix")
+        assert {tag["kind"]: tag["body"] for tag in result["tags"]} == {
+            "def": "class Alpha:\n    pass", "ref": "Alpha()"
+        }
+    finally:
+        await state.code_analyzer.close()
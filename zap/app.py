@@ -27,10 +27,13 @@ from zap.contexts.context_manager import ContextManager
 from zap.git_analyzer import GitAnalyzer
 from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
 from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
-from zap.git_analyzer.repo_map.repo_map import RepoMap
+from zap.git_analyzer.repo_map.progressive import ProgressiveIndexer, mentioned_files
+from zap.git_analyzer.repo_map.reindex import ReindexQueue
+from zap.git_analyzer.watcher import RepoWatcher
 from zap.templating import ZapTemplateEngine
 from zap.tools.basic_tools import register_tools
 from zap.tools.tool_manager import ToolManager
+from zap.utils import RepoMapRenderer
 
 
 class ZapApp:
@@ -44,6 +47,10 @@ class ZapApp:
         self.git_analyzer: Optional[GitAnalyzer] = None
         self.commands: Optional[Commands] = None
         self.chat_agent: Optional[ChatAgent] = None
+        self.indexer: Optional[ProgressiveIndexer] = None
+        self.reindex_queue: Optional[ReindexQueue] = None
+        self.watcher: Optional[RepoWatcher] = None
+        self.cache_gc_task: Optional[asyncio.Task] = None
 
     async def initialize(self, args):
         self.config = load_config(args)
@@ -60,15 +67,6 @@ class ZapApp:
         self.state.git_repo = self.git_analyzer.git_repo
         self.state.config = self.config
 
-        # repo map
-        code_analyzer = CodeAnalyzerConfig(
-            root_path=self.state.git_repo.root,
-        )
-        self.code_analyzer = CodeAnalyzer(code_analyzer)
-        file_infos = await self.code_analyzer.analyze_files(await self.git_analyzer.git_repo.get_tracked_files())
-        graph = await self.code_analyzer.build_graph(file_infos)
-        self.repo_map = RepoMap(graph, file_infos)
-
         # Initialize ContextManager and ChatAgent
         self.template_engine = ZapTemplateEngine(
             root_path=self.state.git_repo.root, templates_dir=self.config.templates_dir
@@ -88,6 +86,11 @@ class ZapApp:
             self.state.tokenizer = tiktoken.encoding_for_model(
                 default_agent.config.model
             )
+        tokenizer = self.state.tokenizer
+        self.state.repo_map_renderer = RepoMapRenderer(
+            self.state.git_repo.root,
+            count_tokens=(lambda text: len(tokenizer.encode(text))) if tokenizer else None,
+        )
         self.context_manager = ContextManager(self.agent_manager, self.config.agent)
         if self.config.auto_archive_contexts:
             archive_name = f"AutoArchive-{time.strftime('%Y-%m-%d-%H-%M-%S')}"
@@ -101,6 +104,40 @@ class ZapApp:
                 )
             else:
                 self.ui.print("No contexts loaded. Starting a 'default' context")
+
+        # repo map, built once contexts are loaded so the files they mention are indexed first
+        code_analyzer = CodeAnalyzerConfig(
+            root_path=self.state.git_repo.root,
+        )
+        self.code_analyzer = CodeAnalyzer(code_analyzer)
+        tracked_files = await self.git_analyzer.git_repo.get_tracked_files()
+        # Files in context and with uncommitted changes are indexed first, then the most changed ones.
+        first = self.state.get_files().union(*repo_info.git_status.values())
+        first.update(mentioned_files(
+            (message.content for message in self.context_manager.get_current_context().messages), tracked_files
+        ))
+        self.indexer = ProgressiveIndexer(
+            self.code_analyzer,
+            foreground_files=self.config.index_foreground_files if self.config.progressive_indexing
+            else len(tracked_files),
+        )
+        with self.ui.stage_progress() as update:
+            self.repo_map = await self.indexer.start(
+                tracked_files, first, repo_info.file_change_count,
+                on_progress=lambda event: update(event.stage, event.done, event.total),
+            )
+        self.state.code_analyzer = self.code_analyzer
+        self.state.repo_map = self.repo_map
+        self.reindex_queue = ReindexQueue(self.code_analyzer, self.repo_map)
+        if self.config.watch_files:
+            self.watcher = RepoWatcher(
+                self.state.git_repo,
+                self.reindex_queue.push,
+                debounce=self.config.watch_debounce,
+                poll_interval=self.config.watch_poll_interval,
+                on_branch_switch=self.reindex_queue.push_batch,
+            )
+
         self.ccm = ContextCommandManager(
             self.context_manager, self.ui, self.agent_manager
         )
@@ -112,10 +149,41 @@ class ZapApp:
             state=self.state,
             ui=self.ui,
             filename_to_path=self.git_analyzer.git_repo.filename_to_paths,
-            symbol_filter={x.name.lower() for t in file_infos.items() for x in t[1].tags}
+            symbol_names=self.repo_map.symbol_names,
         )
 
     async def run(self):
+        await self._start_background_indexing()
+        try:
+            await self._run_loop()
+        finally:
+            await self._stop_background_indexing()
+            # Flushes cache usage and stops the cache connection's worker thread.
+            await self.code_analyzer.close()
+
+    async def _start_background_indexing(self):
+        self.reindex_queue.start()
+        if self.watcher:
+            await self.watcher.start()
+        self.cache_gc_task = asyncio.create_task(self._collect_cache_garbage())
+
+    async def _collect_cache_garbage(self):
+        # Vacuuming holds the cache, so it waits for background indexing to finish.
+        await self.indexer.join()
+        try:
+            await self.code_analyzer.collect_garbage(await self.git_analyzer.git_repo.get_tracked_files())
+        except Exception as e:
+            self.ui.debug(f"Cache garbage collection failed: {str(e)}")
+
+    async def _stop_background_indexing(self):
+        if self.cache_gc_task:
+            self.cache_gc_task.cancel()
+        if self.watcher:
+            await self.watcher.stop()
+        await self.reindex_queue.stop()
+        await self.indexer.stop()
+
+    async def _run_loop(self):
         while True:
             try:
                 context = self.context_manager.get_current_context()
@@ -4,6 +4,8 @@ from zap.config import AppConfig
 from zap.git_analyzer.models.exploration_result import ExplorationResult
 from zap.git_analyzer.git_repo import GitRepo
 from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+from zap.utils import RepoMapRenderer
 
 
 class AppState:
@@ -14,6 +16,8 @@ class AppState:
         self.git_repo: Optional[GitRepo] = None
         self.config: Optional[AppConfig] = None
         self.code_analyzer: Optional[CodeAnalyzer] = None
+        self.repo_map: Optional[RepoMap] = None
+        self.repo_map_renderer: Optional[RepoMapRenderer] = None
 
     def add_file(self, file: str) -> None:
         self._files.add(file)
@@ -221,9 +221,27 @@ class UI(UIInterface):
             TextColumn("[progress.description]{task.description}"),
             BarColumn(),
             TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            console=self.console,
         )
         return progress
 
+    @contextmanager
+    def stage_progress(self):
+        """
+        Display one progress bar per stage of a multi-stage job.
+
+        :return: Callback taking a stage name, the number of items it completed and the total.
+        """
+        tasks = {}
+        with self.progress(0) as progress:
+
+            def update(stage: str, completed: int, total: int):
+                if stage not in tasks:
+                    tasks[stage] = progress.add_task(stage, total=total)
+                progress.update(tasks[stage], completed=completed, total=total)
+
+            yield update
+
     def data_view(self, data: Any, methods: bool = True, title: str | None = None):
         """
         Display a detailed view of the given data.
@@ -51,6 +51,10 @@ class UIInterface(ABC):
     def progress(self, total: int) -> Any:
         pass
 
+    @abstractmethod
+    def stage_progress(self):
+        pass
+
     @abstractmethod
     def data_view(self, data: Any, methods: bool = True, title: str | None = None):
         pass
@@ -1,6 +1,6 @@
 import dataclasses
 import re
-from typing import List, Set, Optional
+from typing import Callable, List, Set, Optional
 
 from prompt_toolkit import PromptSession
 from prompt_toolkit.completion import ThreadedCompleter
@@ -30,7 +30,7 @@ class AdvancedInput:
         state: AppState,
         ui: UIInterface,
         filename_to_path: dict,
-        symbol_filter: set):
+        symbol_names: Callable[[], Set[str]]):
         if state.config.command_history_file:
             self.history = FileHistory(state.config.command_history_file)
         else:
@@ -39,7 +39,8 @@ class AdvancedInput:
         self.kb = KeyBindings()
         self.registry = registry
         self.filename_to_path = filename_to_path
-        self.symbol_filter = symbol_filter
+        # Read on every input, so symbols indexed in the background or after edits are recognized.
+        self.symbol_names = symbol_names
 
         self.session = PromptSession(
             history=self.history,
@@ -84,12 +85,13 @@ class AdvancedInput:
         file_paths = set()
         symbols = set()
         words = re.findall(r'\b\w+\b', text)
+        symbol_names = self.symbol_names()
 
         for word in words:
             word_lower = word.lower()
             if word_lower in self.filename_to_path:
                 file_paths.update(self.filename_to_path[word_lower])
-            if word_lower in self.symbol_filter:
+            if word_lower in symbol_names:
                 symbols.add(word_lower)
 
         return file_paths, symbols
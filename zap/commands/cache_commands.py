@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from zap.app_state import AppState
+from zap.cliux import UIInterface
+
+
+class CacheCommands:
+    def __init__(self, state: AppState, ui: UIInterface):
+        self.state = state
+        self.ui = ui
+
+    async def cache(self, action: str = "stats"):
+        """Show cache statistics (stats) or collect cache garbage now (gc)."""
+        if self.state.code_analyzer is None:
+            self.ui.print("The code analyzer is not initialized.")
+            return
+        if action == "stats":
+            await self.stats()
+        elif action == "gc":
+            tracked_files = await self.state.git_repo.get_tracked_files()
+            deleted = await self.state.code_analyzer.collect_garbage(tracked_files, force=True)
+            self.ui.display_table("Rows deleted", [{"Table": table, "Rows": rows} for table, rows in deleted.items()])
+            await self.stats()
+        else:
+            self.ui.error(f"Unknown cache action: {action}. Use 'stats' or 'gc'.")
+
+    async def stats(self):
+        stats = await self.state.code_analyzer.cache_manager.stats()
+        last_gc = "never"
+        if stats["last_gc"] is not None:
+            last_gc = datetime.fromtimestamp(stats["last_gc"]).isoformat(timespec="seconds")
+        rows = [
+            {"Metric": "Hit rate", "Value": f"{stats['hit_rate']:.1%} ({stats['hits']}/{stats['lookups']})"},
+            {"Metric": "Size", "Value": f"{stats['bytes'] / (1024 * 1024):.1f} MiB"},
+            {"Metric": "Last garbage collection", "Value": last_gc},
+        ]
+        rows.extend({"Metric": f"Rows in {table}", "Value": str(count)} for table, count in stats["rows"].items())
+        self.ui.display_table("Cache", rows)
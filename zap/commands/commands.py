@@ -7,6 +7,7 @@ from zap.agent_manager import AgentManager
 from zap.app_state import AppState
 from zap.cliux import UIInterface
 from zap.commands.advanced_input import AdvancedInput
+from zap.commands.cache_commands import CacheCommands
 from zap.commands.command_registry import CommandRegistry
 from zap.commands.development_workflow import DevelopmentWorkflow
 from zap.commands.file_context_manager import FileContextManager
@@ -35,6 +36,7 @@ class Commands:
         self.git_manager = GitManager(state, ui)
         self.dev_workflow = DevelopmentWorkflow(config, ui)
         self.utilities = UtilityCommands(state, ui)
+        self.cache_commands = CacheCommands(state, ui)
 
         self._register_commands()
 
@@ -77,6 +79,9 @@ class Commands:
         self.registry.command(
             "shell", aliases=["!"], description="Execute a shell command"
         )(self.utilities.shell)
+        self.registry.command(
+            "cache", description="Show repo map cache stats, or collect garbage with 'gc'"
+        )(self.cache_commands.cache)
 
         # Context commands
         self.registry.command(
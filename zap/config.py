@@ -24,6 +24,17 @@ class AppConfig:
     auto_archive_contexts: bool = True
     auto_load_contexts: bool = True
     command_history_file: Optional[str] = None
+    # Re-index files edited outside of Zap while a session is running.
+    watch_files: bool = True
+    watch_debounce: float = 0.2
+    watch_poll_interval: float = 2.0
+    # Index files in context, in git status and the most changed ones first and the rest in the background.
+    progressive_indexing: bool = True
+    index_foreground_files: int = 200
+    # Token budget for the ranked repo map included in agent prompts.
+    repo_map_tokens: int = 4096
+    # Render repo map files as signature outlines instead of tag line ranges.
+    repo_map_outlines: bool = True
 
 
 def load_config(args) -> AppConfig:
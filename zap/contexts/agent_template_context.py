@@ -10,7 +10,7 @@ from zap.commands.advanced_input import UserInput
 from zap.config import AppConfig
 from zap.contexts.context import Context
 from zap.git_analyzer.repo_map.repo_map import RepoMap
-from zap.utils import get_files_content, get_shell, get_files_content_from_tags
+from zap.utils import get_files_content, get_shell, RepoMapRenderer
 
 
 async def build_agent_template_context(
@@ -34,8 +34,12 @@ async def build_agent_template_context(
         max_files=100,
         max_tags_per_file=1000,
     )
-    repo_map = await get_files_content_from_tags(state.git_repo.root, ranked_tags, prepend_line_numbers=False,
-                                                 exclude_files=list_of_files, limit=20000)
+    repo_map_partial = repo_map.partial
+    if state.repo_map_renderer is None:
+        state.repo_map_renderer = RepoMapRenderer(state.git_repo.root)
+    outline = state.code_analyzer.get_outline if config.repo_map_outlines and state.code_analyzer else None
+    repo_map = await state.repo_map_renderer.render(ranked_tags, config.repo_map_tokens, prepend_line_numbers=False,
+                                                    exclude_files=list_of_files, outline=outline)
 
     output = {
         "os": platform.system(),
@@ -48,6 +52,7 @@ async def build_agent_template_context(
         "root": state.git_repo.root,
         "repo_metadata": dataclasses.asdict(state.repo_metadata),
         "repo_map": repo_map,
+        "repo_map_partial": repo_map_partial,
     }
 
     for context_name, ctx in contexts.items():
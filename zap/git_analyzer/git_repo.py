@@ -1,6 +1,6 @@
 import asyncio
 import os
-from typing import Set, List, Dict
+from typing import Set, List, Dict, Optional, Tuple
 
 import aiofiles
 import pygit2
@@ -25,6 +25,7 @@ class GitRepo:
         self.suffix_trie = pygtrie.StringTrie(separator=SEPARATOR)
         self.filename_to_paths = {}
         self.allowlisted_paths = allowlisted_paths
+        self.last_head: Optional[str] = self.get_head_id()
 
     async def refresh(self):
         # TODO: make refresh less frequent for performance
@@ -120,6 +121,41 @@ class GitRepo:
 
         return await asyncio.to_thread(_get_file_change_count)
 
+    def get_head_id(self) -> Optional[str]:
+        """Commit id HEAD points at, or None for an unborn branch."""
+        try:
+            return str(self.repo.head.target)
+        except pygit2.GitError:
+            return None
+
+    async def check_head(self) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Return ``(old, new)`` commit ids if HEAD moved since the last check, otherwise None."""
+        head = await asyncio.to_thread(self.get_head_id)
+        if head == self.last_head:
+            return None
+        change = (self.last_head, head)
+        self.last_head = head
+        return change
+
+    async def get_changed_paths(self, old_id: Optional[str], new_id: Optional[str]) -> Set[str]:
+        """Paths added, modified, deleted or renamed between two commits, from a tree-to-tree diff."""
+        def _get_changed_paths():
+            old_tree = self.repo[old_id].peel(pygit2.Tree) if old_id else None
+            new_tree = self.repo[new_id].peel(pygit2.Tree) if new_id else None
+            if old_tree is None and new_tree is None:
+                return set()
+            if old_tree is None or new_tree is None:
+                diff = (old_tree or new_tree).diff_to_tree()
+            else:
+                diff = self.repo.diff(old_tree, new_tree)
+            paths = set()
+            for delta in diff.deltas:
+                paths.add(delta.old_file.path)
+                paths.add(delta.new_file.path)
+            return paths
+
+        return await asyncio.to_thread(_get_changed_paths)
+
     def close(self):
         self.repo.free()
 
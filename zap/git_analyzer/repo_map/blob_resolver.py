@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+from typing import Optional, Set
+
+import pygit2
+
+from zap.git_analyzer.logger import LOGGER
+
+# Runs of up to this many files check each file's status; larger ones take one status of the work tree.
+STATUS_FILE_LIMIT = 256
+
+
+class BlobIdResolver:
+    """
+    Resolves the git blob id of working tree files. Clean tracked files take the id recorded in
+    the git index; dirty, untracked or non-git files are hashed with git's blob hash. Small runs,
+    such as a watcher batch, ask for the status of their files only instead of the whole tree.
+    """
+
+    DIRTY_FLAGS = (
+        pygit2.GIT_STATUS_WT_NEW
+        | pygit2.GIT_STATUS_WT_MODIFIED
+        | pygit2.GIT_STATUS_WT_TYPECHANGE
+        | pygit2.GIT_STATUS_WT_RENAMED
+        | pygit2.GIT_STATUS_WT_DELETED
+    )
+
+    def __init__(self, root_path: str, expected_files: Optional[int] = None):
+        self.root_path = root_path
+        self.repo = self._open_repository(root_path)
+        self._dirty: Optional[Set[str]] = None
+        self._per_file = expected_files is not None and expected_files <= STATUS_FILE_LIMIT
+
+    @staticmethod
+    def _open_repository(root_path: str) -> Optional[pygit2.Repository]:
+        try:
+            repo = pygit2.Repository(root_path)
+        except pygit2.GitError:
+            return None
+        if repo.workdir is None or os.path.realpath(repo.workdir) != os.path.realpath(root_path):
+            # Index paths are relative to the work tree, so only use them when it is the analyzed root.
+            return None
+        return repo
+
+    def _dirty_paths(self) -> Set[str]:
+        if self._dirty is None:
+            self._dirty = {path for path, flags in self.repo.status().items() if flags & self.DIRTY_FLAGS}
+            LOGGER.info(f"Found {len(self._dirty)} dirty files in {self.root_path}")
+        return self._dirty
+
+    def _is_dirty(self, git_path: str) -> bool:
+        if not self._per_file:
+            return git_path in self._dirty_paths()
+        try:
+            return bool(self.repo.status_file(git_path) & self.DIRTY_FLAGS)
+        except (KeyError, pygit2.GitError):
+            return True
+
+    def blob_id(self, rel_path: str, abs_path: str) -> str:
+        if self.repo is not None:
+            git_path = Path(rel_path).as_posix()
+            if not self._is_dirty(git_path):
+                try:
+                    return str(self.repo.index[git_path].id)
+                except KeyError:
+                    pass
+        return str(pygit2.hashfile(str(abs_path)))
@@ -1,10 +1,18 @@
+import asyncio
 import aiosqlite
+import os
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Tuple
 import json
 import logging
 
-CACHE_VERSION = 1
+CACHE_VERSION = 4
+BUSY_TIMEOUT_MS = 5000
+# Tag fields that are never persisted: the path is per file and bodies are sliced from the file on demand.
+UNCACHED_TAG_FIELDS = ('path', 'body')
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups.
+QUERY_CHUNK_SIZE = 500
 LOGGER = logging.getLogger("git_analyzer")
 
 
@@ -13,69 +21,429 @@ class CacheManager:
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.db_path = self.cache_dir / "file_cache.db"
+        self._db: Optional[aiosqlite.Connection] = None
+        self._db_lock: Optional[asyncio.Lock] = None
+        # Files looked up and served from the cache since it was opened, counted by the caller through
+        # count_lookups, and when each blob was last used; usage is written with the next batch of
+        # cache writes rather than on every read.
+        self.lookups = 0
+        self.hits = 0
+        self._used_blobs: Dict[str, float] = {}
         LOGGER.info(f"CacheManager initialized at {self.db_path}")
 
-    async def _create_table(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS file_cache (
-                    file_path TEXT PRIMARY KEY,
-                    mtime REAL,
-                    tags TEXT,
-                    version INTEGER
-                )
-            ''')
-            await db.commit()
+    async def _get_db(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        if self._db_lock is None:
+            self._db_lock = asyncio.Lock()
+        async with self._db_lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.db_path)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+                await self._create_table(db)
+                self._db = db
+                LOGGER.info(f"Cache connection opened at {self.db_path}")
+        return self._db
+
+    async def _create_table(self, db: aiosqlite.Connection):
+        cursor = await db.execute("PRAGMA table_info(file_cache)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        if columns and "blob_id" not in columns:
+            # Caches written before tags were keyed by blob id are simply rebuilt.
+            await db.execute("DROP TABLE file_cache")
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS file_cache (
+                file_path TEXT PRIMARY KEY,
+                mtime REAL,
+                size INTEGER,
+                blob_id TEXT,
+                version INTEGER
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS blob_cache (
+                blob_id TEXT PRIMARY KEY,
+                tags TEXT,
+                version INTEGER,
+                last_used REAL DEFAULT 0
+            )
+        ''')
+        cursor = await db.execute("PRAGMA table_info(blob_cache)")
+        if "last_used" not in {row[1] for row in await cursor.fetchall()}:
+            await db.execute("ALTER TABLE blob_cache ADD COLUMN last_used REAL DEFAULT 0")
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS symbols (
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                start_line INTEGER,
+                end_line INTEGER
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS outline_cache (
+                blob_id TEXT PRIMARY KEY,
+                outline TEXT,
+                version INTEGER
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS skipped_files (
+                file_path TEXT PRIMARY KEY,
+                mtime REAL,
+                size INTEGER,
+                reason TEXT,
+                version INTEGER
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_file_cache_blob_id ON file_cache (blob_id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_symbols_name_kind ON symbols (name, kind)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_symbols_file_path ON symbols (file_path)")
+        await db.commit()
+
+    async def close(self):
+        if self._db is not None:
+            await self._write_usage(self._db)
+            await self._db.commit()
+            await self._db.close()
+            self._db = None
+            LOGGER.info(f"Cache connection closed at {self.db_path}")
+
+    @staticmethod
+    def tags_with_path(file_path: str, tags_json: str) -> list[dict[str, Any]]:
+        return [{'path': file_path, **tag} for tag in json.loads(tags_json)]
 
     async def get_cache(self, file_path: str) -> Optional[Dict[str, Any]]:
-        await self._create_table()
-        async with aiosqlite.connect(self.db_path) as db:
+        entry = (await self.get_many([file_path])).get(file_path)
+        LOGGER.info(f"Cache {'hit' if entry else 'miss'} for {file_path}")
+        return entry
+
+    async def get_many(self, file_paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch the cache entries of several files at once. Each entry holds the ``mtime``, ``size``
+        and ``blob_id`` recorded for the path and the ``tags`` of that blob, or ``None`` when the
+        blob has no tags cached. Missing or stale entries are omitted.
+        """
+        db = await self._get_db()
+        file_paths = list(file_paths)
+        entries = {}
+        for start in range(0, len(file_paths), QUERY_CHUNK_SIZE):
+            chunk = file_paths[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
             cursor = await db.execute(
-                "SELECT mtime, tags, version FROM file_cache WHERE file_path = ?",
-                (file_path,)
+                "SELECT f.file_path, f.mtime, f.size, f.blob_id, b.tags FROM file_cache f "
+                "LEFT JOIN blob_cache b ON b.blob_id = f.blob_id AND b.version = f.version "
+                f"WHERE f.version = ? AND f.file_path IN ({placeholders})",
+                (CACHE_VERSION, *chunk)
             )
-            result = await cursor.fetchone()
-        if result and result[2] == CACHE_VERSION:
-            LOGGER.info(f"Cache hit for {file_path}")
-            return {
-                'mtime': result[0],
-                'tags': json.loads(result[1])
-            }
-        LOGGER.info(f"Cache miss for {file_path}")
-        return None
-
-    async def set_cache(self, file_path: str, mtime: float, tags: list[dict[str, Any]]):
-        await self._create_table()
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "INSERT OR REPLACE INTO file_cache (file_path, mtime, tags, version) VALUES (?, ?, ?, ?)",
-                (file_path, mtime, json.dumps(tags), CACHE_VERSION)
+            for file_path, mtime, size, blob_id, tags in await cursor.fetchall():
+                entries[file_path] = {
+                    'mtime': mtime,
+                    'size': size,
+                    'blob_id': blob_id,
+                    'tags': self.tags_with_path(file_path, tags) if tags is not None else None
+                }
+        hits = [entry['blob_id'] for entry in entries.values() if entry['tags'] is not None]
+        self._record_usage(hits)
+        LOGGER.info(f"Cache lookup for {len(file_paths)} files returned {len(entries)} hits")
+        return entries
+
+    async def get_blobs(self, blob_ids: Iterable[str]) -> Dict[str, str]:
+        """Fetch the path-independent tags JSON of several blobs, keyed by blob id."""
+        db = await self._get_db()
+        blob_ids = list(blob_ids)
+        blobs = {}
+        for start in range(0, len(blob_ids), QUERY_CHUNK_SIZE):
+            chunk = blob_ids[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = await db.execute(
+                f"SELECT blob_id, tags FROM blob_cache WHERE version = ? AND blob_id IN ({placeholders})",
+                (CACHE_VERSION, *chunk)
+            )
+            blobs.update(await cursor.fetchall())
+        self._record_usage(blobs)
+        LOGGER.info(f"Blob lookup for {len(blob_ids)} blobs returned {len(blobs)} hits")
+        return blobs
+
+    async def get_skipped(self, file_paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch the ``mtime``, ``size`` and ``reason`` recorded for files that were skipped, keyed by path."""
+        db = await self._get_db()
+        file_paths = list(file_paths)
+        skipped = {}
+        for start in range(0, len(file_paths), QUERY_CHUNK_SIZE):
+            chunk = file_paths[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = await db.execute(
+                "SELECT file_path, mtime, size, reason FROM skipped_files "
+                f"WHERE version = ? AND file_path IN ({placeholders})",
+                (CACHE_VERSION, *chunk)
+            )
+            for file_path, mtime, size, reason in await cursor.fetchall():
+                skipped[file_path] = {'mtime': mtime, 'size': size, 'reason': reason}
+        return skipped
+
+    async def set_skipped(self, entries: Iterable[Tuple[str, float, int, str]], cleared: Iterable[str] = ()):
+        """Record ``(file_path, mtime, size, reason)`` for skipped files and forget the ``cleared`` paths."""
+        db = await self._get_db()
+        entries, cleared = list(entries), list(cleared)
+        if not entries and not cleared:
+            return
+        await db.executemany("DELETE FROM skipped_files WHERE file_path = ?", [(path,) for path in cleared])
+        await db.executemany(
+            "INSERT OR REPLACE INTO skipped_files (file_path, mtime, size, reason, version) VALUES (?, ?, ?, ?, ?)",
+            [(file_path, mtime, size, reason, CACHE_VERSION) for file_path, mtime, size, reason in entries]
+        )
+        await db.commit()
+        LOGGER.info(f"Recorded {len(entries)} skipped files, cleared {len(cleared)}")
+
+    async def get_outlines(self, blob_ids: Iterable[str]) -> Dict[str, Optional[List[Tuple[int, int]]]]:
+        """
+        Fetch the signature outlines of several blobs, keyed by blob id. Blobs without an outline,
+        e.g. in unsupported languages, map to ``None``; blobs never outlined are omitted.
+        """
+        db = await self._get_db()
+        blob_ids = list(blob_ids)
+        outlines = {}
+        for start in range(0, len(blob_ids), QUERY_CHUNK_SIZE):
+            chunk = blob_ids[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = await db.execute(
+                f"SELECT blob_id, outline FROM outline_cache WHERE version = ? AND blob_id IN ({placeholders})",
+                (CACHE_VERSION, *chunk)
             )
-            await db.commit()
+            for blob_id, outline in await cursor.fetchall():
+                ranges = json.loads(outline)
+                outlines[blob_id] = [tuple(r) for r in ranges] if ranges is not None else None
+        LOGGER.info(f"Outline lookup for {len(blob_ids)} blobs returned {len(outlines)} hits")
+        return outlines
+
+    async def set_outlines(self, entries: Iterable[Tuple[str, Optional[List[Tuple[int, int]]]]]):
+        """Store ``(blob_id, outline)`` entries in a single transaction."""
+        db = await self._get_db()
+        entries = list(entries)
+        if not entries:
+            return
+        await db.executemany(
+            "INSERT OR REPLACE INTO outline_cache (blob_id, outline, version) VALUES (?, ?, ?)",
+            [(blob_id, json.dumps(outline), CACHE_VERSION) for blob_id, outline in entries]
+        )
+        await db.commit()
+        LOGGER.info(f"Outlines set for {len(entries)} blobs")
+
+    async def set_cache(self, file_path: str, mtime: float, size: int, blob_id: str, tags: list[dict[str, Any]]):
+        await self.set_many([(file_path, mtime, size, blob_id, tags)])
         LOGGER.info(f"Cache set for {file_path}")
 
+    async def set_many(self, entries: Iterable[Tuple[str, float, int, str, list[dict[str, Any]]]]):
+        """
+        Store ``(file_path, mtime, size, blob_id, tags)`` entries in a single transaction. Tags are
+        stored once per blob without their path or body, so identical content at any path, branch
+        or checkout shares them.
+        """
+        db = await self._get_db()
+        entries = list(entries)
+        if not entries:
+            return
+        await db.executemany(
+            "INSERT OR REPLACE INTO file_cache (file_path, mtime, size, blob_id, version) VALUES (?, ?, ?, ?, ?)",
+            [(file_path, mtime, size, blob_id, CACHE_VERSION) for file_path, mtime, size, blob_id, _ in entries]
+        )
+        now = time.time()
+        await db.executemany(
+            "INSERT OR REPLACE INTO blob_cache (blob_id, tags, version, last_used) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    blob_id,
+                    json.dumps([{k: v for k, v in tag.items() if k not in UNCACHED_TAG_FIELDS} for tag in tags]),
+                    CACHE_VERSION,
+                    now
+                )
+                for _, _, _, blob_id, tags in entries
+            ]
+        )
+        await self._write_usage(db)
+        await db.executemany("DELETE FROM symbols WHERE file_path = ?", [(entry[0],) for entry in entries])
+        await db.executemany(
+            "INSERT INTO symbols (name, kind, file_path, start_line, end_line) VALUES (?, ?, ?, ?, ?)",
+            [
+                (tag['name'], tag['kind'], file_path, tag['start_line'], tag['end_line'])
+                for file_path, _, _, _, tags in entries
+                for tag in tags
+            ]
+        )
+        await db.commit()
+        LOGGER.info(f"Cache set for {len(entries)} files")
+
     async def clear_cache(self):
-        await self._create_table()
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM file_cache")
-            await db.commit()
+        db = await self._get_db()
+        await db.execute("DELETE FROM file_cache")
+        await db.execute("DELETE FROM blob_cache")
+        await db.execute("DELETE FROM symbols")
+        await db.execute("DELETE FROM outline_cache")
+        await db.execute("DELETE FROM skipped_files")
+        await db.commit()
+        self._used_blobs.clear()
         LOGGER.info("Cache cleared")
 
-    async def query_symbol(self, symbol: str) -> List[Dict[str, Any]]:
-        await self._create_table()
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "SELECT file_path, tags FROM file_cache WHERE tags LIKE ?",
-                (f'%{symbol}%',)
-            )
-            rows = await cursor.fetchall()
-
-        tags = []
-        for row in rows:
-            file_path, tags_json = row
-            tags_data = json.loads(tags_json)
-            for tag_data in tags_data:
-                if tag_data['name'] == symbol:
-                    tags.append(tag_data)
+    def count_lookups(self, lookups: int, hits: int):
+        """Count ``lookups`` files needing tags, ``hits`` of which were served from the cache."""
+        self.lookups += lookups
+        self.hits += hits
+
+    def _record_usage(self, hit_blob_ids: Iterable[str]):
+        now = time.time()
+        for blob_id in hit_blob_ids:
+            self._used_blobs[blob_id] = now
+
+    async def _write_usage(self, db: aiosqlite.Connection):
+        """Persist the last use of blobs read since the previous write; the caller commits."""
+        if not self._used_blobs:
+            return
+        used, self._used_blobs = self._used_blobs, {}
+        await db.executemany("UPDATE blob_cache SET last_used = ? WHERE blob_id = ?",
+                             [(last_used, blob_id) for blob_id, last_used in used.items()])
+
+    def size_on_disk(self) -> int:
+        """Bytes used by the database file and its write-ahead log."""
+        size = 0
+        for suffix in ("", "-wal"):
+            try:
+                size += os.path.getsize(f"{self.db_path}{suffix}")
+            except OSError:
+                pass
+        return size
+
+    async def stats(self) -> Dict[str, Any]:
+        """Row counts per table, bytes on disk and the hit rate of lookups since the cache was opened."""
+        db = await self._get_db()
+        rows = {}
+        for table in ("file_cache", "blob_cache", "symbols", "outline_cache", "skipped_files"):
+            cursor = await db.execute(f"SELECT COUNT(*) FROM {table}")
+            rows[table] = (await cursor.fetchone())[0]
+        cursor = await db.execute("SELECT value FROM cache_meta WHERE key = 'last_gc'")
+        last_gc = await cursor.fetchone()
+        return {
+            'rows': rows,
+            'bytes': self.size_on_disk(),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'last_gc': float(last_gc[0]) if last_gc else None,
+        }
+
+    async def maybe_collect_garbage(self, tracked_paths: Iterable[str], interval_hours: float,
+                                    max_bytes: int = 0) -> Optional[Dict[str, int]]:
+        """Run collect_garbage unless it already ran in the last ``interval_hours``; None when skipped."""
+        db = await self._get_db()
+        cursor = await db.execute("SELECT value FROM cache_meta WHERE key = 'last_gc'")
+        last_gc = await cursor.fetchone()
+        if last_gc and time.time() - float(last_gc[0]) < interval_hours * 3600:
+            LOGGER.info(f"Cache garbage collection skipped, last run at {last_gc[0]}")
+            return None
+        return await self.collect_garbage(tracked_paths, max_bytes)
+
+    async def collect_garbage(self, tracked_paths: Iterable[str], max_bytes: int = 0) -> Dict[str, int]:
+        """
+        Drop rows of paths that are no longer tracked and rows written by other cache versions, then
+        evict blobs until the database fits in ``max_bytes`` (0 disables the cap): blobs no path
+        refers to go first, then the least recently used ones. Outlines of dropped blobs go with
+        them. The database is then vacuumed and analyzed. Returns the number of rows deleted per table.
+        """
+        db = await self._get_db()
+        await self._write_usage(db)
+        deleted = {}
+
+        async def delete(table: str, condition: str, params: Iterable = ()):
+            cursor = await db.execute(f"DELETE FROM {table} WHERE {condition}", tuple(params))
+            deleted[table] = deleted.get(table, 0) + max(cursor.rowcount, 0)
+
+        for table in ("file_cache", "blob_cache", "outline_cache", "skipped_files"):
+            await delete(table, "version IS NOT ?", (CACHE_VERSION,))
+        await db.execute("CREATE TEMP TABLE IF NOT EXISTS tracked_paths (file_path TEXT PRIMARY KEY)")
+        await db.execute("DELETE FROM temp.tracked_paths")
+        await db.executemany("INSERT OR IGNORE INTO temp.tracked_paths (file_path) VALUES (?)",
+                             [(path,) for path in tracked_paths])
+        for table in ("file_cache", "skipped_files", "symbols"):
+            await delete(table, "file_path NOT IN (SELECT file_path FROM temp.tracked_paths)")
+        await db.execute("DROP TABLE temp.tracked_paths")
+
+        await db.commit()
+        if max_bytes:
+            await self._evict(db, max_bytes, delete)
+        await delete("outline_cache", "blob_id NOT IN (SELECT blob_id FROM blob_cache)")
+        await db.execute("INSERT OR REPLACE INTO cache_meta (key, value) VALUES ('last_gc', ?)", (str(time.time()),))
+        await db.commit()
+        await db.execute("VACUUM")
+        await db.execute("ANALYZE")
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        LOGGER.info(f"Cache garbage collected: {deleted}, {self.size_on_disk()} bytes on disk")
+        return deleted
+
+    async def _evict(self, db: aiosqlite.Connection, max_bytes: int, delete):
+        # Rows shrink the file only once vacuumed, so the excess is estimated from the share of
+        # pages the tags payload takes.
+        cursor = await db.execute("PRAGMA page_count")
+        page_count = (await cursor.fetchone())[0]
+        cursor = await db.execute("PRAGMA freelist_count")
+        page_count -= (await cursor.fetchone())[0]
+        cursor = await db.execute("PRAGMA page_size")
+        used_bytes = page_count * (await cursor.fetchone())[0]
+        if used_bytes <= max_bytes:
+            return
+        cursor = await db.execute("SELECT COALESCE(SUM(LENGTH(tags)), 0) FROM blob_cache")
+        payload = (await cursor.fetchone())[0]
+        excess = payload * (used_bytes - max_bytes) / used_bytes
+        cursor = await db.execute(
+            "SELECT b.blob_id, LENGTH(b.tags), EXISTS(SELECT 1 FROM file_cache f WHERE f.blob_id = b.blob_id) AS used "
+            "FROM blob_cache b ORDER BY used, b.last_used"
+        )
+        evicted = []
+        async for blob_id, length, _ in cursor:
+            if excess <= 0:
+                break
+            evicted.append(blob_id)
+            excess -= length or 0
+        await cursor.close()
+        for start in range(0, len(evicted), QUERY_CHUNK_SIZE):
+            chunk = evicted[start:start + QUERY_CHUNK_SIZE]
+            await delete("blob_cache", f"blob_id IN ({','.join('?' * len(chunk))})", chunk)
+        await db.commit()
+        LOGGER.info(f"Evicted {len(evicted)} blobs to fit the cache in {max_bytes} bytes")
+
+    async def query_symbol(self, symbol: str, kind: Optional[str] = None, prefix: bool = False) -> List[Dict[str, Any]]:
+        """
+        Look up tags by symbol name through the indexed symbols table. With ``prefix`` the
+        name is matched as a prefix using a range scan, which keeps the lookup an index seek.
+        """
+        db = await self._get_db()
+        if prefix:
+            if not symbol:
+                return []
+            conditions = ["name >= ?", "name < ?"]
+            params = [symbol, symbol[:-1] + chr(ord(symbol[-1]) + 1)]
+        else:
+            conditions = ["name = ?"]
+            params = [symbol]
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        cursor = await db.execute(
+            f"SELECT file_path, start_line, end_line, name, kind FROM symbols WHERE {' AND '.join(conditions)} "
+            "ORDER BY file_path, start_line",
+            params
+        )
+        rows = await cursor.fetchall()
+
+        tags = [
+            {'path': file_path, 'start_line': start_line, 'end_line': end_line, 'name': name, 'kind': tag_kind}
+            for file_path, start_line, end_line, name, tag_kind in rows
+        ]
         LOGGER.info(f"Query for symbol '{symbol}' returned {len(tags)} results")
         return tags
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import pygit2
+
+from zap.git_analyzer.logger import LOGGER
+
+REMOTE_URL_PREFIXES = ("http://", "https://", "ssh://", "git://", "file://", "git@")
+
+
+def is_remote_url(path: str) -> bool:
+    return path.startswith(REMOTE_URL_PREFIXES)
+
+
+class CloneCache:
+    """
+    Clones of remote repositories kept across analyzers, one directory per URL holding the
+    worktree (``repo``) next to, not inside, anything else cached for it. A cached clone is
+    brought up to date with a shallow fetch and a hard reset of its branch instead of being
+    cloned again, so unchanged files keep their mtimes and stay cache hits.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root) if root else Path.home() / ".zap" / "clones"
+
+    def entry(self, url: str) -> Path:
+        """Directory of the clone of ``url``: a readable name plus a digest of the full URL."""
+        name = re.sub(r'[^A-Za-z0-9._-]+', '-', url.rstrip('/').rsplit('/', 1)[-1].removesuffix('.git'))
+        return self.root / f"{name or 'repo'}-{hashlib.sha1(url.encode()).hexdigest()[:12]}"
+
+    def checkout(self, url: str, depth: int = 1) -> str:
+        """Path of an up to date worktree of ``url``, cloning it on first use."""
+        worktree = self.entry(url) / "repo"
+        repo = None
+        if worktree.exists():
+            repo = self._open(worktree)
+            if repo is None:
+                LOGGER.warning(f"Replacing broken clone of {url} at {worktree}")
+                shutil.rmtree(worktree)
+        if repo is None:
+            self._clone(url, worktree, depth)
+            return str(worktree)
+        try:
+            self._update(repo, depth)
+        except (pygit2.GitError, KeyError) as e:
+            # An unreachable remote leaves the clone as it was.
+            LOGGER.warning(f"Could not update the clone of {url}, using it as is: {e}")
+        return str(worktree)
+
+    @staticmethod
+    def _open(worktree: Path) -> Optional[pygit2.Repository]:
+        # Never search upwards: a half-written clone must not resolve to a repository containing the cache.
+        try:
+            repo = pygit2.Repository(str(worktree), flags=pygit2.enums.RepositoryOpenFlag.NO_SEARCH)
+        except pygit2.GitError:
+            return None
+        if repo.workdir is None or os.path.realpath(repo.workdir) != os.path.realpath(worktree):
+            return None
+        return repo
+
+    @staticmethod
+    def _clone(url: str, worktree: Path, depth: int):
+        worktree.parent.mkdir(parents=True, exist_ok=True)
+        # Clone next to the final path and move it in place, so an interrupted clone is never reused.
+        staging = tempfile.mkdtemp(prefix="clone-", dir=worktree.parent)
+        try:
+            try:
+                pygit2.clone_repository(url, staging, depth=depth)
+            except pygit2.GitError as e:
+                # libgit2's local transport cannot fetch shallowly; a full local clone is cheap anyway.
+                if "shallow" not in str(e):
+                    raise
+                shutil.rmtree(staging)
+                pygit2.clone_repository(url, staging)
+            os.replace(staging, worktree)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        LOGGER.info(f"Repository {url} cloned to {worktree}")
+
+    @staticmethod
+    def _update(repo: pygit2.Repository, depth: int):
+        remote = repo.remotes["origin"]
+        try:
+            remote.fetch(depth=depth)
+        except pygit2.GitError as e:
+            if "shallow" not in str(e):
+                raise
+            remote.fetch()
+        branch = repo.head.shorthand
+        target = repo.references[f"refs/remotes/origin/{branch}"].target
+        if target != repo.head.target:
+            repo.reset(target, pygit2.enums.ResetMode.HARD)
+            LOGGER.info(f"Clone at {repo.workdir} updated to {target}")
@@ -1,109 +1,521 @@
+import asyncio
 import os
 from pathlib import Path
-import asyncio
-import tempfile
-import shutil
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
 import pygit2
 
+from zap.git_analyzer.repo_map.blob_resolver import BlobIdResolver
+from zap.git_analyzer.repo_map.clone_cache import CloneCache
 from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.extraction_pool import TagExtractionPool
+from zap.git_analyzer.repo_map.file_guard import FileGuard
+from zap.git_analyzer.repo_map.incremental import IncrementalTagger
 from zap.git_analyzer.repo_map.models import FileInfo, GraphNode, Tag
+from zap.git_analyzer.repo_map.outline import OutlineExtractor
+from zap.git_analyzer.repo_map.pipeline import IndexPipeline, ProgressCallback
+from zap.git_analyzer.repo_map.snippets import SnippetReader, slice_body
 from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+from zap.git_analyzer.repo_map.tag_store import TagStore, TagView
 from zap.git_analyzer.repo_map.cache_manager import CacheManager
 from zap.git_analyzer.logger import LOGGER
 
 
+@dataclass
+class _PendingFile:
+    """A file on its way through the indexing pipeline; ``file_info`` is set once it is indexed."""
+    path: str
+    rel_path: str
+    abs_path: Path
+    stat: Optional[os.stat_result] = None
+    entry: Optional[dict] = None
+    blob_id: Optional[str] = None
+    tags_data: Optional[list[dict]] = None
+    content: Optional[str] = None
+    file_info: Optional[FileInfo] = None
+    cache_update: Optional[tuple] = None
+
+
 class CodeAnalyzer:
     def __init__(self, config: CodeAnalyzerConfig):
         self.config = config
-        self.temp_dir = None
         self._clone_repo_if_needed()
-        self.tag_extractor = TagExtractor(self.config.root_path, config.encoding)
+        self.tag_extractor = TagExtractor(self.config.root_path, config.encoding, include_body=not config.compact)
         self.cache_manager = CacheManager(str(os.path.join(self.config.root_path, config.cache_dir)))
+        self.incremental_tagger = IncrementalTagger(self.tag_extractor, config.hot_files)
+        self.outline_extractor = OutlineExtractor(self.tag_extractor)
+        self.file_guard = FileGuard(self.config, self.tag_extractor.registry)
+        # Files left out of the index, with the reason.
+        self.skipped: dict[str, str] = {}
+        self.symbol_index: dict[str, set[str]] = {}
+        self.reference_index: dict[str, set[str]] = {}
+        self.tag_store: Optional[TagStore] = None
+        self.graph: dict[str, GraphNode] = {}
+        # Tools and the file watcher may re-index concurrently; patches must not interleave.
+        self._update_lock = asyncio.Lock()
+        self.extraction_pool: Optional[TagExtractionPool] = None
+        if config.extraction_workers > 0:
+            self.extraction_pool = TagExtractionPool(self.config.root_path, config.encoding,
+                                                     max_workers=config.extraction_workers,
+                                                     batch_size=config.extraction_batch_size,
+                                                     include_body=not config.compact)
+        self.snippet_reader = SnippetReader(self.config.root_path, config.encoding)
         LOGGER.info(f"CodeAnalyzer initialized for {self.config.root_path}")
 
     def _clone_repo_if_needed(self):
         if self.config.repo_url:
-            self.temp_dir = str(tempfile.mkdtemp())
-            pygit2.clone_repository(self.config.repo_url, self.temp_dir, depth=1)
-            self.config.update_root_path(str(self.temp_dir))
-            LOGGER.info(f"Repository cloned to temporary directory {self.temp_dir}")
+            clone_cache = CloneCache(self.config.clone_cache_dir)
+            self.config.update_root_path(clone_cache.checkout(self.config.repo_url, self.config.clone_depth))
+            # The tag cache outlives the worktree's files, so it is kept next to the clone.
+            self.config.cache_dir = str(clone_cache.entry(self.config.repo_url) / self.config.cache_dir)
 
-    async def analyze_files(self, file_paths: list[str]) -> dict[str, FileInfo]:
-        file_infos = {}
+    async def analyze_files(self, file_paths: list[str],
+                            on_progress: Optional[ProgressCallback] = None) -> dict[str, FileInfo]:
+        """
+        Index files through a staged pipeline: stat, cache lookup, read, parse and persist. Every
+        stage has its own bounded number of workers and blocking file access runs off the event
+        loop, so memory and open files stay flat on large repos. ``on_progress`` receives an
+        IndexProgress event whenever a stage handled a batch.
+        """
+        self.file_guard.refresh()
         root_path = Path(self.config.root_path)
-        tasks = []
-
-        for path in file_paths:
-            tasks.append(self._analyze_file(root_path, path))
+        pending = {
+            path: _PendingFile(path, os.path.relpath(root_path / path, self.config.root_path), root_path / path)
+            for path in file_paths
+        }
+        run = _IndexRun(self, len(pending))
+        pipeline = IndexPipeline(self.config.pipeline_queue_size, on_progress)
+        pipeline.add_stage("stat", run.stat, workers=self.config.stat_workers)
+        pipeline.add_stage("lookup", run.lookup, batch_size=self.config.lookup_batch_size)
+        pipeline.add_stage("read", run.read, workers=self.config.read_workers)
+        pipeline.add_stage("parse", run.parse, batch_size=self.config.extraction_batch_size)
+        pipeline.add_stage("persist", run.persist, batch_size=self.config.persist_batch_size)
+        await pipeline.run(pending.values(), len(pending))
+        await run.flush()
 
-        results = await asyncio.gather(*tasks)
-
-        for path, file_info in results:
-            if file_info:
-                file_infos[path] = file_info
-
-        LOGGER.info(f"Analyzed {len(file_infos)} files")
+        file_infos = {path: run.file_infos[path] for path in pending if path in run.file_infos}
+        skipped_count = sum(path in self.skipped for path in pending)
+        LOGGER.info(f"Analyzed {len(file_infos)} files, skipped {skipped_count}")
         return file_infos
 
-    async def _analyze_file(self, root_path, path):
-        abs_path = root_path / path
-        rel_path = os.path.relpath(abs_path, self.config.root_path)
-        mtime = os.path.getmtime(abs_path)
+    @staticmethod
+    def _is_skip_current(skipped: Optional[dict], stat: os.stat_result) -> bool:
+        return bool(skipped) and skipped['mtime'] == stat.st_mtime and skipped['size'] == stat.st_size
 
-        cached_data = await self.cache_manager.get_cache(rel_path)
-        if cached_data and cached_data['mtime'] == mtime:
-            with open(abs_path, 'r', encoding=self.config.encoding) as f:
-                content = f.read()
-            file_info = FileInfo(
-                path=path,
-                mtime=mtime,
-                content=content,
-                tags=[Tag(**tag) for tag in cached_data['tags']]
-            )
-            LOGGER.info(f"Loaded file '{path}' from cache")
-            return path, file_info
+    @staticmethod
+    def _is_cache_current(entry: Optional[dict], blob_id: str) -> bool:
+        return bool(entry) and entry['blob_id'] == blob_id and entry['tags'] is not None
+
+    @staticmethod
+    def _is_stat_current(entry: Optional[dict], stat: os.stat_result, blob_id: str) -> bool:
+        return (CodeAnalyzer._is_cache_current(entry, blob_id) and entry['mtime'] == stat.st_mtime
+                and entry['size'] == stat.st_size)
 
+    def _read_file(self, abs_path: Path) -> Optional[str]:
         try:
             with open(abs_path, 'r', encoding=self.config.encoding) as f:
-                content = f.read()
-            tags = self.tag_extractor.extract_tags(str(abs_path), content)
-            file_info = FileInfo(path, mtime, content, tags)
-            await self.cache_manager.set_cache(rel_path, mtime, [tag.to_dict() for tag in tags])
-            LOGGER.info(f"File '{path}' analyzed and cached")
-            return path, file_info
+                return f.read()
         except Exception as e:
             LOGGER.error(f"Error analyzing file {abs_path}: {str(e)}")
-            return path, None
+            return None
+
+    async def _extract_tags(self, root_path: Path, contents: dict[str, str]) -> dict[str, list[Tag] | Exception]:
+        files = [(str(root_path / path), content) for path, content in contents.items()]
+        if self.extraction_pool and len(files) > 1:
+            by_fname = await self.extraction_pool.extract_many(files)
+        else:
+            by_fname = {}
+            for fname, content in files:
+                try:
+                    by_fname[fname] = self.tag_extractor.extract_tags(fname, content)
+                except Exception as e:
+                    by_fname[fname] = e
+        return {path: by_fname[fname] for path, (fname, _) in zip(contents, files)}
+
+    @staticmethod
+    def build_symbol_index(tag_store: TagStore, kind: str = "def") -> dict[str, set[str]]:
+        """Map every symbol name to the set of files with a tag of ``kind`` for it (by default, defining it)."""
+        index = defaultdict(set)
+        for file_path, name, tag_kind in tag_store.iter_names():
+            if tag_kind == kind:
+                index[name].add(file_path)
+        return dict(index)
 
     async def build_graph(self, file_infos: dict[str, FileInfo]) -> dict[str, GraphNode]:
-        graph = {}
+        """
+        Store the tags of ``file_infos`` and build the graph over them. Once stored, the tag lists of
+        ``file_infos`` are released; files whose list is empty keep the tags of the current store, so
+        file infos from before can be passed again, e.g. by ``extend``.
+        """
+        tag_store = TagStore()
         for file_path, file_info in file_infos.items():
-            references = set()
-            definitions = set()
-            for tag in file_info.tags:
-                if tag.kind == "def":
-                    definitions.add(tag.name)
-                elif tag.kind == "ref":
-                    references.add(tag.name)
-            graph[file_path] = GraphNode(file_path, references, definitions)
+            if file_info.tags or self.tag_store is None:
+                tag_store.add_file(file_path, file_info.tags)
+            else:
+                tag_store.copy_file(self.tag_store, file_path)
 
-        for file_path, file_info in file_infos.items():
-            for tag in file_info.tags:
-                if tag.kind == "ref":
-                    for def_file_path, def_file_info in file_infos.items():
-                        if tag.name in [d.name for d in def_file_info.tags if d.kind == "def"]:
-                            if file_path != def_file_path:
-                                graph[file_path].references.add(def_file_path)
-                                graph[def_file_path].references.add(file_path)
+        graph = {file_path: GraphNode(file_path, set(), set()) for file_path in file_infos}
+        ref_names = defaultdict(set)
+        for file_path, name, kind in tag_store.iter_names():
+            if kind == "def":
+                graph[file_path].definitions.add(name)
+            elif kind == "ref":
+                graph[file_path].references.add(name)
+                ref_names[file_path].add(name)
+
+        self.symbol_index = self.build_symbol_index(tag_store)
+        self.reference_index = self.build_symbol_index(tag_store, kind="ref")
+        self.tag_store = tag_store
+        self.graph = graph
+        for file_info in file_infos.values():
+            file_info.tags = []
+
+        # Resolve each distinct referenced name once through the index instead of
+        # scanning the definitions of every other file.
+        for file_path, names in ref_names.items():
+            for name in names:
+                for def_file_path in self.symbol_index.get(name, ()):
+                    if file_path != def_file_path:
+                        graph[file_path].references.add(def_file_path)
+                        graph[def_file_path].references.add(file_path)
         LOGGER.info(f"Graph built with {len(graph)} nodes")
         return graph
 
-    async def query_symbol(self, symbol: str) -> list[Tag]:
-        tag_data = await self.cache_manager.query_symbol(symbol)
-        LOGGER.info(f"Symbol '{symbol}' queried with {len(tag_data)} results")
-        return [Tag(**tag) for tag in tag_data]
+    async def update_file(self, path: str, content: Optional[str] = None) -> Optional[FileInfo]:
+        """
+        Re-index a single file after it was edited. Hot files are reparsed incrementally from their
+        previous tree; the cache entry is rewritten and, once a graph is built, the symbol indexes,
+        tag store and graph are patched in place, and the tags are then only kept in the store.
+        Returns None when the file could not be indexed.
+        """
+        async with self._update_lock:
+            return await self._update_file(path, content)
+
+    async def _update_file(self, path: str, content: Optional[str]) -> Optional[FileInfo]:
+        abs_path = Path(self.config.root_path) / path
+        rel_path = os.path.relpath(abs_path, self.config.root_path)
+        self.file_guard.refresh()
+        try:
+            reason = self.file_guard.check(rel_path, os.stat(abs_path).st_size) or self.file_guard.sniff(str(abs_path))
+        except OSError as e:
+            LOGGER.error(f"Error updating file {abs_path}: {str(e)}")
+            return None
+        if reason is not None:
+            LOGGER.info(f"Skipping update of '{path}': {reason}")
+            self.skipped[path] = reason
+            self.incremental_tagger.forget(str(abs_path))
+            self._drop_from_graph(path)
+            return None
+        self.skipped.pop(path, None)
+        if content is None:
+            content = self._read_file(abs_path)
+            if content is None:
+                return None
+        try:
+            tags = self.incremental_tagger.update(str(abs_path), content)
+            stat = os.stat(abs_path)
+        except Exception as e:
+            LOGGER.error(f"Error updating file {abs_path}: {str(e)}")
+            self.incremental_tagger.forget(str(abs_path))
+            return None
+        blob_id = str(pygit2.hash(content.encode(self.config.encoding)))
+        await self.cache_manager.set_many([
+            (rel_path, stat.st_mtime, stat.st_size, blob_id, [tag.to_dict() for tag in tags])
+        ])
+        file_info = FileInfo(path, stat.st_mtime, "" if self.config.compact else content, tags, content_hash=blob_id)
+        if self.tag_store is not None:
+            self._patch_graph(path, tags)
+            file_info.tags = []
+        LOGGER.info(f"File '{path}' updated with {len(tags)} tags")
+        return file_info
+
+    async def update_files(self, paths: Iterable[str]) -> tuple[dict[str, FileInfo], set[str]]:
+        """
+        Re-index a batch of changed files, e.g. after a branch switch. Files that still exist go
+        through analyze_files, so blobs seen before come from the cache and misses are extracted
+        together; the indexes and graph are then patched once for the whole batch. When the ignore
+        file changed, indexed files it now excludes are part of the batch. Returns the new file
+        infos and the paths dropped from the index, because they no longer exist or are skipped now.
+        """
+        async with self._update_lock:
+            root_path = Path(self.config.root_path)
+            paths = set(paths)
+            if self.file_guard.refresh():
+                paths.update(path for path in self.graph if self.file_guard.is_ignored(path))
+            paths = sorted(paths)
+            existing = [path for path in paths if (root_path / path).is_file()]
+            removed = set(paths) - set(existing)
+            for path in paths:
+                self.incremental_tagger.forget(str(root_path / path))
+            file_infos = await self.analyze_files(existing)
+            removed.update(path for path in existing if path not in file_infos and path in self.skipped)
+            if self.tag_store is not None:
+                for path in removed:
+                    self._drop_from_graph(path)
+                for path, file_info in file_infos.items():
+                    self._patch_graph(path, file_info.tags)
+                    file_info.tags = []
+            LOGGER.info(f"Batch update: {len(file_infos)} files re-indexed, {len(removed)} removed")
+            return file_infos, removed
+
+    async def extend(self, paths: Iterable[str],
+                     file_infos: dict[str, FileInfo]) -> tuple[dict[str, FileInfo], dict[str, GraphNode]]:
+        """
+        Index files not yet part of the graph, e.g. in the background after a partial start, and
+        rebuild the indexes and graph over them and ``file_infos``. ``file_infos`` is read once the
+        new files are analyzed, so concurrent updates to it are kept. Returns the merged file infos
+        and the new graph.
+        """
+        async with self._update_lock:
+            added = await self.analyze_files(list(paths))
+            merged = {**file_infos, **added}
+            graph = await self.build_graph(merged)
+            return merged, graph
+
+    async def remove_file(self, path: str):
+        """Forget a deleted file: its tags, index entries and graph node and edges."""
+        async with self._update_lock:
+            self.incremental_tagger.forget(str(Path(self.config.root_path) / path))
+            self._drop_from_graph(path)
+            LOGGER.info(f"File '{path}' removed")
+
+    def _drop_from_graph(self, path: str):
+        if self.tag_store is not None and path in self.graph:
+            self._patch_graph(path, [])
+            self.tag_store.remove_file(path)
+            del self.graph[path]
+
+    def _patch_graph(self, path: str, tags: list[Tag]):
+        definitions = {tag.name for tag in tags if tag.kind == "def"}
+        ref_names = {tag.name for tag in tags if tag.kind == "ref"}
+        old_definitions = {tag.name for tag in self.tag_store.select(path=path, kind="def")}
+        old_ref_names = {tag.name for tag in self.tag_store.select(path=path, kind="ref")}
+        for index, old_names, names in ((self.symbol_index, old_definitions, definitions),
+                                        (self.reference_index, old_ref_names, ref_names)):
+            for name in old_names - names:
+                index[name].discard(path)
+                if not index[name]:
+                    del index[name]
+            for name in names - old_names:
+                index.setdefault(name, set()).add(path)
+        self.tag_store.replace_file(path, tags)
+        if self.tag_store.needs_compaction:
+            self.tag_store = self.tag_store.compacted()
+
+        old_node = self.graph.get(path)
+        for other in old_node.references if old_node else ():
+            if other != path and other in self.graph:
+                self.graph[other].references.discard(path)
+        related = {file for name in ref_names for file in self.symbol_index.get(name, ())}
+        related.update(file for name in definitions for file in self.reference_index.get(name, ()))
+        related.discard(path)
+        self.graph[path] = GraphNode(path, ref_names | related, definitions)
+        for other in related:
+            self.graph[other].references.add(path)
+
+    async def query_symbol(self, symbol: str, kind: Optional[str] = None, prefix: bool = False) -> TagView:
+        """
+        Look up tags by name. Once a graph is built the in-memory tag store answers directly;
+        before that the indexed symbols table of the cache is used.
+        """
+        if self.tag_store is not None:
+            if prefix and not symbol:
+                return self.tag_store.view([])
+            tags = self.tag_store.select(name=symbol, kind=kind, prefix=prefix)
+        else:
+            tag_data = await self.cache_manager.query_symbol(symbol, kind=kind, prefix=prefix)
+            store = TagStore.from_dicts(tag_data)
+            tags = store.view(range(len(store)))
+        LOGGER.info(f"Symbol '{symbol}' queried with {len(tags)} results")
+        return tags
+
+    async def get_outline(self, path: str) -> Optional[list[tuple[int, int]]]:
+        """
+        Signature outline of ``path`` as 1-based line ranges (see OutlineExtractor), cached by blob
+        id so unchanged content is parsed once. None when the file has no outline.
+        """
+        abs_path = Path(self.config.root_path) / path
+        try:
+            blob_id = self.snippet_reader.content_hash(path)
+            cached = await self.cache_manager.get_outlines([blob_id])
+            if blob_id in cached:
+                return cached[blob_id]
+            source = await asyncio.to_thread(abs_path.read_bytes)
+            outline = self.outline_extractor.outline(str(abs_path), source)
+        except Exception as e:
+            LOGGER.error(f"Error outlining file {abs_path}: {str(e)}")
+            return None
+        await self.cache_manager.set_outlines([(blob_id, outline)])
+        return outline
+
+    async def collect_garbage(self, tracked_paths: Iterable[str], force: bool = False) -> Optional[dict[str, int]]:
+        """
+        Drop cache rows of untracked paths and old cache versions and cap the cache size, at most
+        once per ``cache_gc_interval_hours`` unless ``force`` is set. Returns the rows deleted per
+        table, or None when it was not due.
+        """
+        if force:
+            return await self.cache_manager.collect_garbage(tracked_paths, self.config.cache_max_bytes)
+        return await self.cache_manager.maybe_collect_garbage(tracked_paths, self.config.cache_gc_interval_hours,
+                                                              self.config.cache_max_bytes)
+
+    def read_body(self, tag: Tag, file_info: Optional[FileInfo] = None) -> str:
+        """Body of ``tag``, sliced from disk when it was not kept in memory."""
+        return self.snippet_reader.body(tag, file_info.content_hash if file_info else None)
 
     async def close(self):
-        if self.temp_dir:
-            shutil.rmtree(self.temp_dir)
-            LOGGER.info(f"Temporary directory {self.temp_dir} removed")
+        await self.cache_manager.close()
+        self.snippet_reader.close()
+        if self.extraction_pool:
+            self.extraction_pool.close()
+
+
+class _IndexRun:
+    """State of one analyze_files call, with a handler per pipeline stage."""
+
+    def __init__(self, analyzer: CodeAnalyzer, file_count: Optional[int] = None):
+        self.analyzer = analyzer
+        self.config = analyzer.config
+        self.cache_manager = analyzer.cache_manager
+        self.blob_resolver = BlobIdResolver(self.config.root_path, file_count)
+        self.file_infos: dict[str, FileInfo] = {}
+        self.cache_updates: list[tuple] = []
+        self.skip_updates: list[tuple] = []
+        self.unskipped: list[str] = []
+
+    def _index(self, pending: _PendingFile, content: str, tags: list[Tag]):
+        pending.file_info = FileInfo(pending.path, pending.stat.st_mtime, content, tags,
+                                     content_hash=pending.blob_id)
+        if not CodeAnalyzer._is_stat_current(pending.entry, pending.stat, pending.blob_id):
+            pending.cache_update = (pending.rel_path, pending.stat.st_mtime, pending.stat.st_size, pending.blob_id,
+                                    pending.tags_data)
+
+    async def stat(self, batch: list[_PendingFile]) -> list[_PendingFile]:
+        passed = []
+        for pending in batch:
+            try:
+                pending.stat = await asyncio.to_thread(os.stat, pending.abs_path)
+            except Exception as e:
+                LOGGER.error(f"Error analyzing file {pending.abs_path}: {str(e)}")
+                continue
+            reason = self.analyzer.file_guard.check(pending.rel_path, pending.stat.st_size)
+            if reason is not None:
+                self.analyzer.skipped[pending.path] = reason
+                continue
+            passed.append(pending)
+        return passed
+
+    def _resolve(self, pending: _PendingFile, skipped: Optional[dict]) -> Optional[str]:
+        """Sniff files that changed since they were last indexed and resolve the blob id; returns a skip reason."""
+        entry, stat = pending.entry, pending.stat
+        if not CodeAnalyzer._is_stat_current(entry, stat, entry and entry['blob_id']):
+            if CodeAnalyzer._is_skip_current(skipped, stat):
+                return skipped['reason']
+            reason = self.analyzer.file_guard.sniff(str(pending.abs_path))
+            if reason is not None:
+                self.skip_updates.append((pending.rel_path, stat.st_mtime, stat.st_size, reason))
+                return reason
+            if skipped:
+                self.unskipped.append(pending.rel_path)
+        # mtime + size is the fast pre-check; only changed files need their blob id resolved.
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            pending.blob_id = entry['blob_id']
+        else:
+            pending.blob_id = self.blob_resolver.blob_id(pending.rel_path, str(pending.abs_path))
+        return None
+
+    def _resolve_batch(self, batch: list[_PendingFile], skipped: dict) -> list[_PendingFile]:
+        resolved = []
+        for pending in batch:
+            try:
+                reason = self._resolve(pending, skipped.get(pending.rel_path))
+            except Exception as e:
+                LOGGER.error(f"Error analyzing file {pending.abs_path}: {str(e)}")
+                continue
+            if reason is not None:
+                self.analyzer.skipped[pending.path] = reason
+                continue
+            self.analyzer.skipped.pop(pending.path, None)
+            resolved.append(pending)
+        return resolved
+
+    async def lookup(self, batch: list[_PendingFile]) -> list[_PendingFile]:
+        rel_paths = [pending.rel_path for pending in batch]
+        cached = await self.cache_manager.get_many(rel_paths)
+        skipped = await self.cache_manager.get_skipped(rel_paths)
+        for pending in batch:
+            pending.entry = cached.get(pending.rel_path)
+        resolved = await asyncio.to_thread(self._resolve_batch, batch, skipped)
+
+        current = {
+            pending.rel_path for pending in resolved if CodeAnalyzer._is_cache_current(pending.entry, pending.blob_id)
+        }
+        blobs = await self.cache_manager.get_blobs(
+            {pending.blob_id for pending in resolved if pending.rel_path not in current}
+        )
+        for pending in resolved:
+            if pending.rel_path in current:
+                pending.tags_data = pending.entry['tags']
+            elif pending.blob_id in blobs:
+                pending.tags_data = self.cache_manager.tags_with_path(pending.rel_path, blobs[pending.blob_id])
+            if pending.tags_data is not None and self.config.compact:
+                # Cached tags carry offsets only, so compact mode never reads the file.
+                self._index(pending, "", [Tag(**tag) for tag in pending.tags_data])
+                LOGGER.info(f"Loaded file '{pending.path}' from cache")
+        # A file is one lookup however many tables it took to find its tags.
+        self.cache_manager.count_lookups(len(resolved), sum(pending.tags_data is not None for pending in resolved))
+        return resolved
+
+    async def read(self, batch: list[_PendingFile]) -> list[_PendingFile]:
+        passed = []
+        for pending in batch:
+            if pending.file_info is None:
+                content = await asyncio.to_thread(self.analyzer._read_file, pending.abs_path)
+                if content is None:
+                    continue
+                if pending.tags_data is None:
+                    pending.content = content
+                else:
+                    source = content.encode(self.config.encoding)
+                    tags = [Tag(**tag) for tag in pending.tags_data]
+                    for tag in tags:
+                        tag.body = slice_body(source, tag, self.config.encoding)
+                    self._index(pending, content, tags)
+                    LOGGER.info(f"Loaded file '{pending.path}' from cache")
+            passed.append(pending)
+        return passed
+
+    async def parse(self, batch: list[_PendingFile]) -> list[_PendingFile]:
+        to_parse = {pending.path: pending for pending in batch if pending.file_info is None}
+        root_path = Path(self.config.root_path)
+        extracted = await self.analyzer._extract_tags(
+            root_path, {path: pending.content for path, pending in to_parse.items()}
+        )
+        for path, tags in extracted.items():
+            pending = to_parse[path]
+            if isinstance(tags, Exception):
+                LOGGER.error(f"Error analyzing file {root_path / path}: {str(tags)}")
+                continue
+            pending.tags_data = [tag.to_dict() for tag in tags]
+            self._index(pending, "" if self.config.compact else pending.content, tags)
+            pending.content = None
+            LOGGER.info(f"File '{path}' analyzed")
+        return [pending for pending in batch if pending.file_info is not None]
+
+    async def persist(self, batch: list[_PendingFile]) -> list[_PendingFile]:
+        for pending in batch:
+            self.file_infos[pending.path] = pending.file_info
+            if pending.cache_update is not None:
+                self.cache_updates.append(pending.cache_update)
+        if len(self.cache_updates) >= self.config.persist_batch_size:
+            await self.flush()
+        return batch
+
+    async def flush(self):
+        updates, self.cache_updates = sorted(self.cache_updates, key=lambda update: update[0]), []
+        await self.cache_manager.set_many(updates)
+        skip_updates, unskipped = self.skip_updates, self.unskipped
+        self.skip_updates, self.unskipped = [], []
+        await self.cache_manager.set_skipped(skip_updates, unskipped)
@@ -7,7 +7,34 @@ class CodeAnalyzerConfig:
     root_path: str
     cache_dir: str = '.zap_cache'
     encoding: str = 'utf-8'
-    repo_url: Optional[str] = None  # Add this line
+    repo_url: Optional[str] = None
+    # Clones of repo_url are kept and updated here (default ~/.zap/clones), fetching this many commits.
+    clone_cache_dir: Optional[str] = None
+    clone_depth: int = 1
+    # Worker processes for tag extraction; 0 extracts in-process on the event loop.
+    extraction_workers: int = 0
+    extraction_batch_size: int = 64
+    # Keep neither file contents nor tag bodies in memory; bodies are read from disk when rendered.
+    compact: bool = False
+    # Edited files whose tree-sitter tree is kept for incremental reparsing.
+    hot_files: int = 32
+    # Indexing pipeline: workers per blocking stage, files per cache lookup and write, and the
+    # bound of the queues between stages.
+    stat_workers: int = 8
+    read_workers: int = 8
+    lookup_batch_size: int = 256
+    persist_batch_size: int = 512
+    pipeline_queue_size: int = 256
+    # Files larger than this many bytes are not indexed; 0 disables the cap.
+    max_file_size: int = 1024 * 1024
+    # Leading bytes sniffed for NUL bytes (binary) and lines longer than max_line_length (minified).
+    sniff_bytes: int = 8000
+    max_line_length: int = 1000
+    # Gitignore-style patterns, relative to the root, of paths that are never indexed.
+    ignore_file: str = '.zapignore'
+    # Cache garbage collection runs at most this often and evicts least recently used blobs above the cap.
+    cache_gc_interval_hours: float = 24.0
+    cache_max_bytes: int = 256 * 1024 * 1024
 
     def update_root_path(self, new_root_path: str):
         self.root_path = new_root_path
@@ -1,28 +1,22 @@
-from flask import Flask, jsonify, send_from_directory, request
-import networkx as nx
-from pathlib import Path
+from flask import Flask, Response, jsonify, send_from_directory, request
 import asyncio
-from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
-from zap.git_analyzer.repo_map.repo_map import RepoMap
-from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.d3js_visualizer.lod import GROUP_DIRECTORY, stream_json
+from zap.git_analyzer.repo_map.d3js_visualizer.service import RepoMapService, RepoMapServices
 from zap.git_analyzer.logger import LOGGER
 
 app = Flask(__name__)
 
-code_analyzer = None
+services = RepoMapServices()
 
 
-def get_code_analyzer(repo_path=None):
-    global code_analyzer
-    if code_analyzer is None or repo_path:
-        config = CodeAnalyzerConfig(repo_path,
-                                    repo_url=repo_path if repo_path and repo_path.startswith(("http://", "https://")) else None)
-        if config.root_path or config.repo_url:
-            code_analyzer = CodeAnalyzer(config)
-            LOGGER.info(f"RepoAnalyzer initialized for {repo_path}")
-        else:
-            LOGGER.error("No repository URL or file path provided")
-    return code_analyzer
+def get_service() -> RepoMapService | None:
+    return services.current
+
+
+def conditional_json(payload: bytes, etag: str) -> Response:
+    response = Response(payload, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route('/analyze')
@@ -32,22 +26,10 @@ async def analyze_repo():
         LOGGER.error("No repository URL or file path provided")
         return jsonify({'error': 'No repository URL or file path provided'}), 400
 
-    repo_analyzer = get_code_analyzer(repo_path)
     try:
-        focus_files = []
-        other_files = [str(p) for p in Path(repo_analyzer.config.root_path).rglob("*.py") if p not in focus_files]
-        all_files = focus_files + other_files
-        if not all_files:
-            all_files = [str(p) for p in Path(repo_analyzer.config.root_path).rglob("*.py")]
-
-        file_infos = await repo_analyzer.analyze_files(all_files)
-        graph = await repo_analyzer.build_graph(file_infos)
-        repo_map = RepoMap(graph, file_infos)
-
+        service = await services.open(repo_path)
         LOGGER.info(f"Repository {repo_path} analyzed successfully")
-        return jsonify({
-            'focus_files': [str(p) for p in Path(repo_analyzer.config.root_path).rglob("*.py")]
-        })
+        return jsonify({'focus_files': await services.run(service.files())})
     except ValueError as e:
         LOGGER.error(f"ValueError: {str(e)}")
         return jsonify({'error': str(e)}), 400
@@ -63,28 +45,58 @@ async def get_graph():
     mentioned_identifiers = request.args.get('mentioned_identifiers', '')
     mentioned_idents = set(mentioned_identifiers.split(',')) if mentioned_identifiers else set()
 
-    if not focus_files:
-        LOGGER.error("No focus files provided")
-        return jsonify({'error': 'No focus files provided'}), 400
+    service = get_service()
+    if not service:
+        LOGGER.error("No repository URL or file path provided")
+        return jsonify({'error': 'No repository URL or file path provided'}), 400
 
-    repo_analyzer = get_code_analyzer()
-    repo_path = repo_analyzer.config.root_path
-    other_files = [str(p) for p in Path(repo_path).rglob("*.py") if p not in focus_files]
+    # The graph of a version does not change, so a client holding it is answered without ranking. The
+    # tag is taken before ranking, so a payload is never labelled with a newer version than it shows.
+    etag = service.etag
+    if etag in request.if_none_match:
+        return conditional_json(b'', etag)
+    try:
+        payload = await services.run(service.graph_payload(focus_files, mentioned_idents))
+        LOGGER.info("Graph data generated successfully")
+        return conditional_json(payload, etag)
+    except ValueError as e:
+        LOGGER.error(f"ValueError: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        LOGGER.error(f"RuntimeError: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-    all_files = focus_files + other_files
-    if not all_files:
-        all_files = [str(p) for p in Path(repo_path).rglob("*.py")]
 
-    try:
-        file_infos = await repo_analyzer.analyze_files(all_files)
-        graph = await repo_analyzer.build_graph(file_infos)
+@app.route('/graph/lod')
+async def get_graph_lod():
+    focus_file = request.args.get('focus_file', '')
+    focus_files = focus_file.split(',') if focus_file else []
+    mentioned_identifiers = request.args.get('mentioned_identifiers', '')
+    mentioned_idents = set(mentioned_identifiers.split(',')) if mentioned_identifiers else set()
 
-        repo_map = RepoMap(graph, file_infos)
-        repo_map.get_ranked_tags_map(focus_files, mentioned_idents, max_files=20, max_tags_per_file=50)
+    service = get_service()
+    if not service:
+        LOGGER.error("No repository URL or file path provided")
+        return jsonify({'error': 'No repository URL or file path provided'}), 400
 
-        data = nx.node_link_data(repo_map.nx_graph)
-        LOGGER.info("Graph data generated successfully")
-        return jsonify(data)
+    etag = service.etag
+    if etag in request.if_none_match:
+        return conditional_json(b'', etag)
+    try:
+        meta, nodes, links = await services.run(service.level_of_detail(
+            focus_files,
+            mentioned_idents,
+            group=request.args.get('group', GROUP_DIRECTORY),
+            level=int(request.args.get('level', 1)),
+            resolution=float(request.args.get('resolution', 1.0)),
+            top_k=int(request.args.get('top_k', 50)),
+            neighbors=int(request.args.get('neighbors', 10)),
+            max_links=int(request.args.get('max_links', 2000)),
+        ))
+        LOGGER.info(f"Level of detail graph generated with {len(nodes)} nodes and {len(links)} links")
+        response = Response(stream_json(meta, nodes, links), mimetype='application/json')
+        response.set_etag(etag)
+        return response
     except ValueError as e:
         LOGGER.error(f"ValueError: {str(e)}")
         return jsonify({'error': str(e)}), 400
@@ -95,14 +107,16 @@ async def get_graph():
 
 @app.route('/focus_files')
 async def get_focus_files():
-    repo_analyzer = get_code_analyzer()
-    if not repo_analyzer:
+    service = get_service()
+    if not service:
         LOGGER.error("No repository URL or file path provided")
         return jsonify({'error': 'No repository URL or file path provided'}), 400
-    repo_path = repo_analyzer.config.root_path
-    all_files = [str(p) for p in Path(repo_path).rglob("*.py")]
+    etag = service.etag
+    if etag in request.if_none_match:
+        return conditional_json(b'', etag)
+    files = await services.run(service.files())
     LOGGER.info("Focus files fetched")
-    return jsonify(all_files)
+    return conditional_json(app.json.dumps(files).encode(), etag)
 
 
 @app.route('/')
@@ -0,0 +1,134 @@
+import heapq
+import json
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import networkx as nx
+
+from zap.git_analyzer.utils.constants import SEPARATOR
+
+GROUP_DIRECTORY = "directory"
+GROUP_COMMUNITY = "community"
+# Nodes and links per chunk of a streamed response.
+STREAM_CHUNK_SIZE = 500
+
+FileEdges = Dict[Tuple[str, str], int]
+
+
+def collapse_edges(ident_edges: Iterable[Tuple[str, str, str]]) -> FileEdges:
+    """Referencer-to-definer file edges weighted by the number of identifiers they share, without self loops."""
+    edges = Counter()
+    for referencer, definer, _ in ident_edges:
+        if referencer != definer:
+            edges[(referencer, definer)] += 1
+    return dict(edges)
+
+
+def directory_groups(paths: Iterable[str], level: int) -> Dict[str, str]:
+    """
+    Group files by their directory ``level`` components deep: files nested deeper are collapsed
+    into that directory (with a trailing separator), files higher up stay on their own.
+    """
+    groups = {}
+    for path in paths:
+        parts = path.split(SEPARATOR)
+        groups[path] = SEPARATOR.join(parts[:level]) + SEPARATOR if len(parts) > level else path
+    return groups
+
+
+def community_groups(paths: Iterable[str], edges: FileEdges, resolution: float = 1.0) -> Dict[str, str]:
+    """Group files into Louvain communities of the undirected weighted file graph, named by their common directory."""
+    graph = nx.Graph()
+    graph.add_nodes_from(paths)
+    for (referencer, definer), weight in edges.items():
+        if graph.has_edge(referencer, definer):
+            graph[referencer][definer]['weight'] += weight
+        else:
+            graph.add_edge(referencer, definer, weight=weight)
+    groups = {}
+    communities = nx.community.louvain_communities(graph, weight='weight', resolution=resolution, seed=0)
+    for index, members in enumerate(sorted(communities, key=lambda c: (-len(c), min(c)))):
+        if len(members) == 1:
+            (path,) = members
+            groups[path] = path
+            continue
+        prefix = SEPARATOR.join(_common_prefix([path.split(SEPARATOR)[:-1] for path in members]))
+        name = f"community {index}: {prefix + SEPARATOR if prefix else '.'}"
+        groups.update((path, name) for path in members)
+    return groups
+
+
+def _common_prefix(parts: List[List[str]]) -> List[str]:
+    prefix = []
+    for components in zip(*parts):
+        if len(set(components)) != 1:
+            break
+        prefix.append(components[0])
+    return prefix
+
+
+@dataclass
+class GroupedGraph:
+    """The file graph collapsed onto groups: files per group and weighted edges between groups."""
+    groups: Dict[str, str]
+    sizes: Counter
+    edges: FileEdges
+
+    @classmethod
+    def build(cls, groups: Dict[str, str], file_edges: FileEdges) -> 'GroupedGraph':
+        edges = Counter()
+        for (referencer, definer), weight in file_edges.items():
+            source, target = groups.get(referencer), groups.get(definer)
+            if source is not None and target is not None and source != target:
+                edges[(source, target)] += weight
+        return cls(groups, Counter(groups.values()), dict(edges))
+
+    def level_of_detail(self, ranks: Dict[str, float], top_k: int, neighbors: int,
+                        max_links: int = 0) -> Tuple[List[dict], List[dict]]:
+        """
+        The ``top_k`` groups by summed PageRank, each with up to ``neighbors`` groups it shares the
+        heaviest edges with, and the links among all of them, or the ``max_links`` heaviest ones.
+        """
+        group_ranks = defaultdict(float)
+        for path, group in self.groups.items():
+            group_ranks[group] += ranks.get(path, 0.0)
+        top = heapq.nlargest(top_k, self.sizes, key=lambda group: (group_ranks[group], group))
+
+        adjacent = defaultdict(Counter)
+        top_set = set(top)
+        for (source, target), weight in self.edges.items():
+            if source in top_set:
+                adjacent[source][target] += weight
+            if target in top_set:
+                adjacent[target][source] += weight
+        selected = dict.fromkeys(top)
+        for group in top:
+            selected.update(dict.fromkeys(other for other, _ in adjacent[group].most_common(neighbors)))
+
+        nodes = [
+            {
+                'id': group,
+                'files': self.sizes[group],
+                'group': self.sizes[group] > 1 or group.endswith(SEPARATOR),
+                'pagerank': group_ranks[group],
+                'top': group in top_set,
+            }
+            for group in selected
+        ]
+        links = [(edge, weight) for edge, weight in self.edges.items() if edge[0] in selected and edge[1] in selected]
+        if max_links and len(links) > max_links:
+            links = heapq.nlargest(max_links, links, key=lambda link: link[1])
+        return nodes, [{'source': source, 'target': target, 'weight': weight} for (source, target), weight in links]
+
+
+def stream_json(meta: dict, nodes: List[dict], links: List[dict]) -> Iterator[str]:
+    """Encode ``{**meta, "nodes": nodes, "links": links}`` in chunks, so large graphs are sent as they are encoded."""
+    yield json.dumps(meta)[:-1] + (', ' if meta else '')
+    for key, items in (('nodes', nodes), ('links', links)):
+        yield f'"{key}": ['
+        for start in range(0, len(items), STREAM_CHUNK_SIZE):
+            chunk = ', '.join(json.dumps(item) for item in items[start:start + STREAM_CHUNK_SIZE])
+            yield (', ' if start else '') + chunk
+        yield '], ' if key == 'nodes' else ']'
+    yield '}'
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Awaitable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+import networkx as nx
+
+from zap.git_analyzer.git_repo import GitRepo
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.repo_map.d3js_visualizer.lod import (GROUP_COMMUNITY, GROUP_DIRECTORY, GroupedGraph,
+                                                           collapse_edges, community_groups, directory_groups)
+from zap.git_analyzer.repo_map.clone_cache import is_remote_url
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.ranking import RankingCache
+from zap.git_analyzer.repo_map.reindex import ReindexQueue
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+from zap.git_analyzer.watcher import RepoWatcher
+
+T = TypeVar("T")
+
+
+class RepoMapService:
+    """
+    A warm analyzer, graph and :class:`RepoMap` for one repository. The tracked files are analyzed
+    once; afterwards a :class:`RepoWatcher` feeds edits and branch switches into a
+    :class:`ReindexQueue`, which patches the map in place and bumps its version. Graph payloads are
+    serialized once per focus set and graph version.
+    """
+
+    def __init__(self, repo_path: str, payload_cache_size: int = 64, watch: bool = True):
+        self.repo_path = repo_path
+        self.watch = watch
+        # Distinguishes versions of this service from those of a previous one in ETags.
+        self.token = uuid.uuid4().hex[:8]
+        self.payloads = RankingCache(payload_cache_size)
+        self.code_analyzer: Optional[CodeAnalyzer] = None
+        self.git_repo: Optional[GitRepo] = None
+        self.repo_map: Optional[RepoMap] = None
+        self.reindex_queue: Optional[ReindexQueue] = None
+        self.watcher: Optional[RepoWatcher] = None
+        # Collapsed file edges and grouped graphs of the current graph version.
+        self._grouped_version = -1
+        self._file_edges = {}
+        self._grouped: Dict[Tuple, GroupedGraph] = {}
+
+    async def start(self):
+        config = CodeAnalyzerConfig(self.repo_path, repo_url=self.repo_path if is_remote_url(self.repo_path) else None)
+        self.code_analyzer = CodeAnalyzer(config)
+        self.git_repo = GitRepo(self.code_analyzer.config.root_path)
+        file_infos = await self.code_analyzer.analyze_files(sorted(await self.git_repo.get_tracked_files()))
+        graph = await self.code_analyzer.build_graph(file_infos)
+        self.repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.code_analyzer.tag_store)
+        self.reindex_queue = ReindexQueue(self.code_analyzer, self.repo_map)
+        self.reindex_queue.start()
+        if self.watch:
+            self.watcher = RepoWatcher(self.git_repo, self.reindex_queue.push,
+                                       on_branch_switch=self.reindex_queue.push_batch)
+            await self.watcher.start()
+        LOGGER.info(f"RepoMapService started for {self.repo_path} with {len(file_infos)} files")
+
+    async def stop(self):
+        if self.watcher is not None:
+            await self.watcher.stop()
+        if self.reindex_queue is not None:
+            await self.reindex_queue.stop()
+        if self.code_analyzer is not None:
+            await self.code_analyzer.close()
+
+    @property
+    def etag(self) -> str:
+        return f"{self.token}-{self.repo_map.version}"
+
+    # The map is patched on the service loop, so it is only read there too.
+    async def files(self) -> List[str]:
+        return sorted(self.repo_map.file_infos)
+
+    async def graph_payload(self, focus_files: List[str], mentioned_idents: Iterable[str]) -> bytes:
+        """
+        ``node_link_data`` of the graph as JSON, with PageRank personalized to ``focus_files`` or,
+        without focus files, to the whole repository.
+        """
+        mentioned_idents = set(mentioned_idents)
+        key = RankingCache.make_key(focus_files, mentioned_idents, self.repo_map.version)
+        payload = self.payloads.get_result(key)
+        if payload is None:
+            self.repo_map.calculate_pagerank(focus_files or list(self.repo_map.graph), mentioned_idents)
+            data = nx.node_link_data(self.repo_map.nx_graph)
+            # networkx 3.4 renamed "links" to "edges"; the page reads "links".
+            if "edges" in data:
+                data["links"] = data.pop("edges")
+            payload = json.dumps(data).encode()
+            self.payloads.put_result(key, payload)
+        return payload
+
+    def _grouped_graph(self, group: str, level: int, resolution: float) -> GroupedGraph:
+        if self._grouped_version != self.repo_map.version:
+            self._grouped_version = self.repo_map.version
+            self._file_edges = collapse_edges(self.repo_map.ident_edges)
+            self._grouped.clear()
+        key = (group, level) if group == GROUP_DIRECTORY else (group, resolution)
+        grouped = self._grouped.get(key)
+        if grouped is None:
+            if group == GROUP_DIRECTORY:
+                groups = directory_groups(self.repo_map.graph, level)
+            elif group == GROUP_COMMUNITY:
+                groups = community_groups(self.repo_map.graph, self._file_edges, resolution)
+            else:
+                raise ValueError(f"Unknown grouping '{group}', expected '{GROUP_DIRECTORY}' or '{GROUP_COMMUNITY}'")
+            grouped = self._grouped[key] = GroupedGraph.build(groups, self._file_edges)
+        return grouped
+
+    async def level_of_detail(self, focus_files: List[str], mentioned_idents: Iterable[str],
+                              group: str = GROUP_DIRECTORY, level: int = 1, resolution: float = 1.0,
+                              top_k: int = 50, neighbors: int = 10,
+                              max_links: int = 2000) -> Tuple[dict, List[dict], List[dict]]:
+        """
+        The graph at a zoom level: files grouped by directory ``level`` deep or into communities,
+        weighted group-to-group edges, and only the ``top_k`` groups by PageRank with their
+        ``neighbors`` closest groups. Returns the response metadata, nodes and links.
+        """
+        mentioned_idents = set(mentioned_idents)
+        key = (group, level, resolution, top_k, neighbors, max_links)
+        key += RankingCache.make_key(focus_files, mentioned_idents, self.repo_map.version)
+        result = self.payloads.get_result(key)
+        if result is None:
+            grouped = self._grouped_graph(group, level, resolution)
+            self.repo_map.calculate_pagerank(focus_files or list(self.repo_map.graph), mentioned_idents)
+            nodes, links = grouped.level_of_detail(self.repo_map.ranks, top_k, neighbors, max_links)
+            meta = {'version': self.repo_map.version, 'group': group, 'level': level, 'files': len(grouped.groups),
+                    'groups': len(grouped.sizes)}
+            result = (meta, nodes, links)
+            self.payloads.put_result(key, result)
+        return result
+
+
+class RepoMapServices:
+    """
+    Hosts one :class:`RepoMapService` per repository on a dedicated event loop thread. The
+    analyzers' database connections, locks and watchers stay on that loop, while web requests,
+    which may each run on their own loop, hand work to it through ``submit``.
+    """
+
+    def __init__(self, watch: bool = True):
+        self.watch = watch
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="repo-map-services", daemon=True)
+        self._thread.start()
+        self.services: Dict[str, RepoMapService] = {}
+        self.current: Optional[RepoMapService] = None
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro: Awaitable[T]) -> T:
+        """Await ``coro`` on the service loop from any other event loop."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    async def _open(self, repo_path: str) -> RepoMapService:
+        key = repo_path if is_remote_url(repo_path) else os.path.abspath(repo_path)
+        service = self.services.get(key)
+        if service is None:
+            service = RepoMapService(repo_path, watch=self.watch)
+            await service.start()
+            self.services[key] = service
+        self.current = service
+        return service
+
+    async def open(self, repo_path: str) -> RepoMapService:
+        """The warm service of ``repo_path``, analyzing the repository on first use."""
+        return await self.run(self._open(repo_path))
+
+    async def _close(self):
+        for service in self.services.values():
+            await service.stop()
+        self.services.clear()
+        self.current = None
+
+    def close(self):
+        self.submit(self._close()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.repo_map.models import Tag
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+
+# (name, kind, start_line, end_line, body, start_byte, end_byte) - plain tuples pickle far smaller and
+# faster than Tag objects.
+TagRecord = tuple[str, str, int, int, str, int, int]
+
+_worker_extractor: Optional[TagExtractor] = None
+
+
+def _init_worker(root_path: str, encoding: str, include_body: bool):
+    global _worker_extractor
+    _worker_extractor = TagExtractor(root_path, encoding, include_body=include_body)
+
+
+def _extract_batch(batch: list[tuple[str, str]]) -> list[tuple[str, Optional[list[TagRecord]], Optional[str]]]:
+    results = []
+    for fname, content in batch:
+        try:
+            tags = _worker_extractor.extract_tags(fname, content)
+            records = [(tag.name, tag.kind, tag.start_line, tag.end_line, tag.body, tag.start_byte, tag.end_byte)
+                       for tag in tags]
+            results.append((fname, records, None))
+        except Exception as e:
+            results.append((fname, None, str(e)))
+    return results
+
+
+class TagExtractionPool:
+    """
+    Runs tree-sitter tag extraction in a pool of worker processes. Each worker keeps its own
+    TagExtractor (and with it the parser and query caches), files are sent in batches to
+    amortize IPC, and tags come back as compact tuples.
+    """
+
+    def __init__(self, root_path: str, encoding: str = 'utf-8', max_workers: Optional[int] = None,
+                 batch_size: int = 64, include_body: bool = True):
+        self.root_path = root_path
+        self.encoding = encoding
+        self.include_body = include_body
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.root_path, self.encoding, self.include_body),
+            )
+            LOGGER.info(f"Tag extraction pool started with {self.max_workers} workers")
+        return self._executor
+
+    async def extract_many(self, files: list[tuple[str, str]]) -> dict[str, list[Tag] | Exception]:
+        """
+        Extract tags for ``(fname, content)`` pairs. Returns the tags of each file, or the
+        exception raised while extracting it.
+        """
+        if not files:
+            return {}
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Spread small inputs over every worker instead of filling one batch.
+        batch_size = max(1, min(self.batch_size, -(-len(files) // self.max_workers)))
+        batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+        batch_results = await asyncio.gather(
+            *(loop.run_in_executor(executor, _extract_batch, batch) for batch in batches)
+        )
+
+        results = {}
+        for batch_result in batch_results:
+            for fname, records, error in batch_result:
+                if error is not None:
+                    results[fname] = RuntimeError(error)
+                    continue
+                path = os.path.relpath(fname, self.root_path)
+                results[fname] = [
+                    Tag(path=path, name=name, kind=kind, start_line=start_line, end_line=end_line, body=body,
+                        start_byte=start_byte, end_byte=end_byte)
+                    for name, kind, start_line, end_line, body, start_byte, end_byte in records
+                ]
+        LOGGER.info(f"Extracted tags for {len(files)} files in {len(batches)} batches")
+        return results
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            LOGGER.info("Tag extraction pool stopped")
@@ -0,0 +1,134 @@
+import os
+import re
+from typing import List, Optional, Pattern, Tuple
+
+from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
+from zap.git_analyzer.repo_map.constants import filename_to_lang
+from zap.git_analyzer.repo_map.language_registry import LanguageRegistry, get_registry
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.utils.constants import SEPARATOR
+
+# Reasons a file is not indexed.
+SKIP_IGNORED = "ignored"
+SKIP_UNSUPPORTED = "unsupported language"
+SKIP_TOO_LARGE = "too large"
+SKIP_BINARY = "binary"
+SKIP_MINIFIED = "minified"
+# Reasons that are only known after reading the file; these are recorded until the file changes.
+SNIFFED_REASONS = (SKIP_BINARY, SKIP_MINIFIED)
+
+
+def _translate_pattern(pattern: str) -> str:
+    """Regex for one gitignore-style pattern, matched against a repo-relative path."""
+    anchored = SEPARATOR in pattern.rstrip(SEPARATOR)
+    directory_only = pattern.endswith(SEPARATOR)
+    pattern = pattern.strip(SEPARATOR)
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    # Unanchored patterns match at any depth; a match on a directory covers everything below it.
+    return ("" if anchored else "(?:.*/)?") + regex + ("/.*" if directory_only else "(?:/.*)?")
+
+
+def compile_ignore_patterns(lines: List[str]) -> List[Tuple[Pattern, bool]]:
+    """Compile gitignore-style lines into ``(regex, negated)`` rules, in file order."""
+    rules = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        rules.append((re.compile(_translate_pattern(line)), negated))
+    return rules
+
+
+class FileGuard:
+    """
+    Decides which files are not worth indexing: paths matched by ``.zapignore``, languages without
+    a tags query, files above the size cap, and binary or minified content detected from the first
+    bytes. The ignore file is compiled once and again by :meth:`refresh` whenever it changed.
+    """
+
+    def __init__(self, config: CodeAnalyzerConfig, registry: Optional[LanguageRegistry] = None):
+        self.config = config
+        self.registry = registry or get_registry()
+        self.rules: List[Tuple[Pattern, bool]] = []
+        # mtime and size of the ignore file the rules were compiled from; None when there is none.
+        self._rules_key: Optional[Tuple[int, int]] = None
+        self.refresh()
+
+    def _ignore_file_key(self) -> Optional[Tuple[int, int]]:
+        if not self.config.ignore_file:
+            return None
+        try:
+            stat = os.stat(os.path.join(self.config.root_path, self.config.ignore_file))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> bool:
+        """Recompile the ignore rules if the ignore file changed since they were read; True when it did."""
+        key = self._ignore_file_key()
+        if key == self._rules_key:
+            return False
+        self._rules_key = key
+        self.rules = self._load_rules() if key is not None else []
+        return True
+
+    def _load_rules(self) -> List[Tuple[Pattern, bool]]:
+        ignore_path = os.path.join(self.config.root_path, self.config.ignore_file)
+        try:
+            with open(ignore_path, "r", encoding="utf-8") as f:
+                rules = compile_ignore_patterns(f.read().splitlines())
+        except FileNotFoundError:
+            return []
+        LOGGER.info(f"Loaded {len(rules)} ignore rules from {ignore_path}")
+        return rules
+
+    def is_ignored(self, rel_path: str) -> bool:
+        ignored = False
+        # The last matching rule wins, as in .gitignore.
+        for regex, negated in self.rules:
+            if regex.fullmatch(rel_path):
+                ignored = not negated
+        return ignored
+
+    def check(self, rel_path: str, size: int) -> Optional[str]:
+        """Reason to skip a file based on its path and size alone, or None."""
+        if self.is_ignored(rel_path):
+            return SKIP_IGNORED
+        lang = filename_to_lang(rel_path)
+        if not lang or not self.registry.get_tags_query(lang):
+            return SKIP_UNSUPPORTED
+        if self.config.max_file_size and size > self.config.max_file_size:
+            return SKIP_TOO_LARGE
+        return None
+
+    def sniff(self, abs_path: str) -> Optional[str]:
+        """Reason to skip a file based on its first bytes, or None."""
+        with open(abs_path, "rb") as f:
+            head = f.read(self.config.sniff_bytes)
+        if b"\0" in head:
+            return SKIP_BINARY
+        if self.config.max_line_length:
+            # Generated bundles put kilobytes on a line; a cut-off last line still counts as long.
+            if max(map(len, head.split(b"\n")), default=0) > self.config.max_line_length:
+                return SKIP_MINIFIED
+        return None
@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
+
+from tree_sitter import Tree
+
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.repo_map.models import Tag
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+
+
+@dataclass
+class SourceEdit:
+    """A single contiguous replacement turning the old source into the new one, in bytes and points."""
+    start_byte: int
+    old_end_byte: int
+    new_end_byte: int
+    start_point: Tuple[int, int]
+    old_end_point: Tuple[int, int]
+    new_end_point: Tuple[int, int]
+
+    @property
+    def byte_delta(self) -> int:
+        return self.new_end_byte - self.old_end_byte
+
+    @property
+    def line_delta(self) -> int:
+        return self.new_end_point[0] - self.old_end_point[0]
+
+    @staticmethod
+    def _point(source: bytes, offset: int) -> Tuple[int, int]:
+        row = source.count(b"\n", 0, offset)
+        return row, offset - (source.rfind(b"\n", 0, offset) + 1)
+
+    @staticmethod
+    def _common_length(matches, limit: int) -> int:
+        # Bisect over slice comparisons, which run in C, instead of stepping byte by byte.
+        lo, hi = 0, limit
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if matches(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    @classmethod
+    def diff(cls, old: bytes, new: bytes) -> Optional['SourceEdit']:
+        """The edit covering everything between the common prefix and suffix, or None if equal."""
+        if old == new:
+            return None
+        limit = min(len(old), len(new))
+        start = cls._common_length(lambda n: old[:n] == new[:n], limit)
+        suffix = cls._common_length(lambda n: old[len(old) - n:] == new[len(new) - n:], limit - start)
+        old_end, new_end = len(old) - suffix, len(new) - suffix
+        return cls(start, old_end, new_end, cls._point(old, start), cls._point(old, old_end),
+                   cls._point(new, new_end))
+
+
+@dataclass
+class HotFile:
+    source: bytes
+    tree: Tree
+    tags: List[Tag]
+
+
+class IncrementalTagger:
+    """
+    Keeps the tree-sitter tree of recently edited files so a new version of one of them is
+    reparsed incrementally. Tags are only re-queried for the top-level statements touched by the
+    edit or by tree-sitter's changed ranges; every other tag is kept with its offsets shifted.
+    """
+
+    def __init__(self, tag_extractor: TagExtractor, max_files: int = 32):
+        self.tag_extractor = tag_extractor
+        self.max_files = max_files
+        self._files: OrderedDict[str, HotFile] = OrderedDict()
+
+    def __contains__(self, fname: str) -> bool:
+        return fname in self._files
+
+    def forget(self, fname: str):
+        self._files.pop(fname, None)
+
+    def _remember(self, fname: str, hot_file: HotFile):
+        self._files[fname] = hot_file
+        self._files.move_to_end(fname)
+        while len(self._files) > self.max_files:
+            self._files.popitem(last=False)
+
+    def update(self, fname: str, content: str) -> List[Tag]:
+        """Tags of ``fname`` with its new ``content``."""
+        source = bytes(content, self.tag_extractor.encoding)
+        hot_file = self._files.get(fname)
+        if hot_file is None:
+            tree = self.tag_extractor.parse(fname, source)
+            if tree is None:
+                return []
+            tags = self.tag_extractor.tags_from_tree(fname, source, tree)
+            self._remember(fname, HotFile(source, tree, tags))
+            LOGGER.info(f"Parsed {fname} from scratch with {len(tags)} tags")
+            return tags
+
+        edit = SourceEdit.diff(hot_file.source, source)
+        if edit is None:
+            self._files.move_to_end(fname)
+            return hot_file.tags
+        old_tree = hot_file.tree
+        old_tree.edit(edit.start_byte, edit.old_end_byte, edit.new_end_byte, edit.start_point, edit.old_end_point,
+                      edit.new_end_point)
+        tree = self.tag_extractor.parse(fname, source, old_tree)
+        changed = [(r.start_byte, r.end_byte) for r in old_tree.changed_ranges(tree)]
+        changed.append((edit.start_byte, edit.new_end_byte))
+        regions = self._regions(tree, changed)
+
+        region_starts = [start for start, _ in regions]
+        kept = [
+            self._shift(tag, edit) for tag in hot_file.tags if not self._touched(tag, edit, regions, region_starts)
+        ]
+        fresh = [
+            tag for start, end in regions
+            for tag in self.tag_extractor.tags_from_tree(fname, source, tree, start, end)
+        ]
+        tags = sorted(kept + fresh, key=lambda tag: (tag.start_line, tag.start_byte))
+        self._remember(fname, HotFile(source, tree, tags))
+        LOGGER.info(f"Reparsed {fname} incrementally: {len(fresh)} tags re-queried in {len(regions)} regions, "
+                    f"{len(kept)} kept")
+        return tags
+
+    @staticmethod
+    def _regions(tree: Tree, changed: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Byte ranges of the top-level statements intersecting any changed range, runs merged."""
+        regions = []
+        previous_touched = False
+        for child in tree.root_node.children:
+            touched = any(start <= child.end_byte and child.start_byte <= end for start, end in changed)
+            if touched and previous_touched:
+                regions[-1] = (regions[-1][0], max(regions[-1][1], child.end_byte))
+            elif touched:
+                regions.append((child.start_byte, child.end_byte))
+            previous_touched = touched
+        return regions
+
+    @staticmethod
+    def _new_offset(offset: int, edit: SourceEdit) -> int:
+        if offset <= edit.start_byte:
+            return offset
+        if offset >= edit.old_end_byte:
+            return offset + edit.byte_delta
+        return edit.new_end_byte
+
+    @classmethod
+    def _touched(cls, tag: Tag, edit: SourceEdit, regions: List[Tuple[int, int]], region_starts: List[int]) -> bool:
+        if tag.start_byte < edit.old_end_byte and edit.start_byte < tag.end_byte:
+            return True
+        start, end = cls._new_offset(tag.start_byte, edit), cls._new_offset(tag.end_byte, edit)
+        # Regions are sorted and disjoint, so only the last one starting before ``end`` can overlap.
+        index = bisect_left(region_starts, end) - 1
+        return index >= 0 and start < regions[index][1]
+
+    @staticmethod
+    def _shift(tag: Tag, edit: SourceEdit) -> Tag:
+        if tag.start_byte < edit.old_end_byte:
+            return tag
+        return replace(tag, start_line=tag.start_line + edit.line_delta, end_line=tag.end_line + edit.line_delta,
+                       start_byte=tag.start_byte + edit.byte_delta, end_byte=tag.end_byte + edit.byte_delta)
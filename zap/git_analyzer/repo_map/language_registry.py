@@ -0,0 +1,55 @@
+import logging
+from pathlib import Path
+from typing import Optional
+
+from tree_sitter import Language, Parser, Query
+from tree_sitter_languages import get_language, get_parser
+
+LOGGER = logging.getLogger("git_analyzer")
+
+QUERIES_DIR = Path(__file__).parent / "queries"
+
+
+class LanguageRegistry:
+    """
+    Loads each tree-sitter language, parser and tags query once per process and hands out the
+    same instances afterwards. Parsers are not thread-safe, so a registry must only be used from
+    one thread at a time.
+    """
+
+    def __init__(self, queries_dir: Path = QUERIES_DIR):
+        self.queries_dir = queries_dir
+        self._languages: dict[str, Language] = {}
+        self._parsers: dict[str, Parser] = {}
+        self._queries: dict[str, Optional[Query]] = {}
+
+    def get_language(self, lang: str) -> Language:
+        if lang not in self._languages:
+            self._languages[lang] = get_language(lang)
+        return self._languages[lang]
+
+    def get_parser(self, lang: str) -> Parser:
+        if lang not in self._parsers:
+            self._parsers[lang] = get_parser(lang)
+        return self._parsers[lang]
+
+    def get_tags_query(self, lang: str) -> Optional[Query]:
+        """Compiled tags query for ``lang``, or None when there is no query file for it."""
+        if lang not in self._queries:
+            query_path = self.queries_dir / f"tree-sitter-{lang}-tags.scm"
+            if query_path.exists():
+                self._queries[lang] = self.get_language(lang).query(query_path.read_text())
+                LOGGER.info(f"Compiled tags query for {lang}")
+            else:
+                self._queries[lang] = None
+        return self._queries[lang]
+
+
+_default_registry: Optional[LanguageRegistry] = None
+
+
+def get_registry() -> LanguageRegistry:
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = LanguageRegistry()
+    return _default_registry
@@ -9,24 +9,26 @@ from zap.git_analyzer.repo_map.codeanalyzerconfig import CodeAnalyzerConfig
 
 async def main(config: CodeAnalyzerConfig, focus_files: list[str], other_files: list[str]):
     analyzer = CodeAnalyzer(config)
-
-    all_files = focus_files + other_files
-    file_infos = await analyzer.analyze_files(all_files)
-    graph = await analyzer.build_graph(file_infos)
-
-    repo_map = RepoMap(graph, file_infos)  # Pass file_infos here
-    ranked_tags = repo_map.get_ranked_tags_map(focus_files, set(), 10, 100)
-
-    print("Ranked tags:")
-    for tag in ranked_tags:
-        print(f"{tag.path}:{tag.start_line} - {tag.name} ({tag.kind})")
-
-    # Example of querying symbol after building the index
-    symbol = "initialize"
-    tags = await analyzer.query_symbol(symbol)
-    print("\nFound tags:")
-    for tag in tags:
-        print(f"Found symbol '{symbol}' in {tag.path} at line {tag.start_line}, {tag.body}")
+    try:
+        all_files = focus_files + other_files
+        file_infos = await analyzer.analyze_files(all_files)
+        graph = await analyzer.build_graph(file_infos)
+
+        repo_map = RepoMap(graph, file_infos, tag_store=lambda: analyzer.tag_store)
+        ranked_tags = repo_map.get_ranked_tags_map(focus_files, set(), 10, 100)
+
+        print("Ranked tags:")
+        for tag in ranked_tags:
+            print(f"{tag.path}:{tag.start_line} - {tag.name} ({tag.kind})")
+
+        # Example of querying symbol after building the index
+        symbol = "initialize"
+        tags = await analyzer.query_symbol(symbol)
+        print("\nFound tags:")
+        for tag in tags:
+            print(f"Found symbol '{symbol}' in {tag.path} at line {tag.start_line}, {analyzer.read_body(tag, file_infos.get(tag.path))}")
+    finally:
+        await analyzer.close()
 
 
 if __name__ == "__main__":
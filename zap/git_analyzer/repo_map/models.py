@@ -10,6 +10,9 @@ class Tag:
     name: str
     kind: str
     body: str = ""
+    # Byte range of the enclosing node, used to slice the body lazily when it is not kept.
+    start_byte: int = -1
+    end_byte: int = -1
 
     def to_dict(self):
         return asdict(self)
@@ -21,13 +24,15 @@ class FileInfo:
     mtime: float
     content: str
     tags: List[Tag]
+    content_hash: str = ""
 
     def to_dict(self):
         return {
             'path': self.path,
             'mtime': self.mtime,
             'content': self.content,
-            'tags': [tag.to_dict() for tag in self.tags]
+            'tags': [tag.to_dict() for tag in self.tags],
+            'content_hash': self.content_hash
         }
 
 
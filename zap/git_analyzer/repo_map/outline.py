@@ -0,0 +1,87 @@
+import logging
+from typing import List, Optional, Set, Tuple
+
+from tree_sitter import Node, Tree
+
+from zap.git_analyzer.repo_map.tag_extractor import TagExtractor
+
+LOGGER = logging.getLogger("git_analyzer")
+
+# Nodes that wrap a definition and carry its decorators or modifiers.
+WRAPPER_NODE_TYPES = {'decorated_definition', 'export_statement'}
+STRING_NODE_TYPES = {'string', 'string_literal', 'template_string'}
+
+
+class OutlineExtractor:
+    """
+    Reduces a file to its signature skeleton: the lines declaring each definition found by the
+    tags query, with their decorators, the first line of their docstring or leading comment, and
+    bodies elided. Outlines are line ranges, so they are rendered from the file like tag ranges.
+    """
+
+    def __init__(self, tag_extractor: TagExtractor):
+        self.tag_extractor = tag_extractor
+
+    def outline(self, fname: str, source: bytes) -> Optional[List[Tuple[int, int]]]:
+        """Merged, 1-based inclusive line ranges of the outline, or None for unsupported files."""
+        tree = self.tag_extractor.parse(fname, source)
+        if tree is None:
+            return None
+        rows: Set[int] = set()
+        for tag in self.tag_extractor.tags_from_tree(fname, source, tree):
+            if tag.kind == "def":
+                rows.update(self._signature_rows(tree, tag.start_byte, tag.end_byte))
+        return self._merge(rows)
+
+    @staticmethod
+    def _signature_rows(tree: Tree, start_byte: int, end_byte: int) -> Set[int]:
+        node = tree.root_node.descendant_for_byte_range(start_byte, end_byte)
+        outer = node
+        while outer.parent is not None and outer.parent.type in WRAPPER_NODE_TYPES:
+            outer = outer.parent
+
+        body = node.child_by_field_name('body')
+        if body is None:
+            last_row = node.start_point[0]
+        elif body.children and body.children[0].type == '{':
+            last_row = body.start_point[0]
+        else:
+            # Indented blocks start on the line after the signature.
+            last_row = max(node.start_point[0], body.start_point[0] - 1)
+        rows = set(range(outer.start_point[0], last_row + 1))
+
+        comment = outer.prev_named_sibling
+        if comment is not None and 'comment' in comment.type and comment.end_point[0] == outer.start_point[0] - 1:
+            rows.update(OutlineExtractor._first_text_rows(comment))
+        docstring = OutlineExtractor._docstring(body)
+        if docstring is not None:
+            rows.update(OutlineExtractor._first_text_rows(docstring))
+        return rows
+
+    @staticmethod
+    def _first_text_rows(node: Node) -> List[int]:
+        """Rows up to the first line with text, so an opening line of only quotes or ``/**`` is not alone."""
+        first_line, _, rest = node.text.partition(b"\n")
+        if rest and not any(c.isalnum() for c in first_line.decode('utf-8', errors='replace')):
+            return [node.start_point[0], node.start_point[0] + 1]
+        return [node.start_point[0]]
+
+    @staticmethod
+    def _docstring(body: Optional[Node]) -> Optional[Node]:
+        if body is None or not body.named_children:
+            return None
+        first = body.named_children[0]
+        if first.type == 'expression_statement' and first.named_children:
+            first = first.named_children[0]
+        return first if first.type in STRING_NODE_TYPES else None
+
+    @staticmethod
+    def _merge(rows: Set[int]) -> List[Tuple[int, int]]:
+        ranges = []
+        for row in sorted(rows):
+            line = row + 1
+            if ranges and ranges[-1][1] == line - 1:
+                ranges[-1] = (ranges[-1][0], line)
+            else:
+                ranges.append((line, line))
+        return ranges
@@ -0,0 +1,109 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from zap.git_analyzer.logger import LOGGER
+
+# Stage name of the progress events counting items that left the pipeline, finished or dropped.
+FINISHED = "indexed"
+
+
+@dataclass
+class IndexProgress:
+    stage: str
+    done: int
+    total: int
+
+
+ProgressCallback = Callable[[IndexProgress], None]
+StageHandler = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+@dataclass
+class _Stage:
+    name: str
+    handler: StageHandler
+    workers: int
+    batch_size: int
+    done: int = 0
+
+
+_END = object()
+
+
+class IndexPipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues. Every stage has its own
+    number of workers, and a full queue blocks the stage feeding it, so a slow stage throttles
+    the ones before it instead of the whole input piling up in memory. A handler receives up to
+    ``batch_size`` queued items and returns the ones to pass on; items it does not return have
+    left the pipeline. Progress is reported per stage and for items that left the pipeline.
+    """
+
+    def __init__(self, queue_size: int = 256, on_progress: Optional[ProgressCallback] = None):
+        self.queue_size = queue_size
+        self.on_progress = on_progress
+        self.stages: List[_Stage] = []
+        self.finished = 0
+        self.total = 0
+
+    def add_stage(self, name: str, handler: StageHandler, workers: int = 1, batch_size: int = 1) -> 'IndexPipeline':
+        self.stages.append(_Stage(name, handler, max(1, workers), max(1, batch_size)))
+        return self
+
+    def _report(self, stage: str, done: int):
+        if self.on_progress is not None:
+            self.on_progress(IndexProgress(stage, done, self.total))
+
+    async def run(self, items: Iterable[Any], total: int):
+        self.total = total
+        queues = [asyncio.Queue(self.queue_size) for _ in self.stages]
+        tasks = [asyncio.create_task(self._feed(items, queues[0]))]
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            running = [stage.workers]
+            tasks.extend(
+                asyncio.create_task(self._work(stage, queues[index], outbox, running)) for _ in range(stage.workers)
+            )
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        LOGGER.info(" ".join(f"{stage.name}={stage.done}" for stage in self.stages))
+
+    @staticmethod
+    async def _feed(items: Iterable[Any], inbox: asyncio.Queue):
+        for item in items:
+            await inbox.put(item)
+        await inbox.put(_END)
+
+    async def _work(self, stage: _Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], running: List[int]):
+        ended = False
+        while not ended:
+            batch = []
+            item = await inbox.get()
+            while item is not _END:
+                batch.append(item)
+                if len(batch) >= stage.batch_size or inbox.empty():
+                    break
+                item = inbox.get_nowait()
+            if item is _END:
+                ended = True
+                # Sibling workers of this stage stop on the same marker.
+                await inbox.put(_END)
+            if not batch:
+                continue
+            passed = await stage.handler(batch)
+            stage.done += len(batch)
+            self._report(stage.name, stage.done)
+            for item in passed:
+                if outbox is not None:
+                    await outbox.put(item)
+            left = len(batch) - len(passed) if outbox is not None else len(batch)
+            if left:
+                self.finished += left
+                self._report(FINISHED, self.finished)
+        running[0] -= 1
+        if running[0] == 0 and outbox is not None:
+            await outbox.put(_END)
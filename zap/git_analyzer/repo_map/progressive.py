@@ -0,0 +1,92 @@
+import asyncio
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.pipeline import ProgressCallback
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+
+
+def prioritize(file_paths: Iterable[str], first: Iterable[str] = (),
+               change_count: Optional[Dict[str, int]] = None) -> List[str]:
+    """``file_paths`` in indexing order: those in ``first``, then by descending change count, then by path."""
+    paths = set(file_paths)
+    change_count = change_count or {}
+    head = [path for path in dict.fromkeys(first) if path in paths]
+    rest = sorted(paths.difference(head), key=lambda path: (-change_count.get(path, 0), path))
+    return head + rest
+
+
+def mentioned_files(texts: Iterable[Optional[str]], file_paths: Iterable[str]) -> Set[str]:
+    """Paths of ``file_paths`` that appear verbatim in ``texts``, e.g. the messages of a resumed context."""
+    paths = set(file_paths)
+    # A path ending a sentence keeps its full stop, so it is tried without it too.
+    words = {word.rstrip('.') for text in texts if text for word in re.findall(r'[\w./-]+', text)}
+    return words & paths
+
+
+class ProgressiveIndexer:
+    """
+    Builds a :class:`RepoMap` from the files that matter most first and indexes the rest in the
+    background. ``start`` analyzes the ``first`` files (e.g. those in context and in git status)
+    and the ``foreground_files`` most changed ones, and returns a map over them right away. The
+    remaining files follow in batches that double in size, so rebuilding the graph after each
+    batch stays linear in the size of the repo overall. Until they are done the map reports
+    ``partial`` rankings.
+    """
+
+    def __init__(self, code_analyzer: CodeAnalyzer, foreground_files: int = 200, batch_size: int = 1000):
+        self.code_analyzer = code_analyzer
+        self.foreground_files = foreground_files
+        self.batch_size = batch_size
+        self.repo_map: Optional[RepoMap] = None
+        self._pending: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def start(self, file_paths: Iterable[str], first: Iterable[str] = (),
+                    change_count: Optional[Dict[str, int]] = None,
+                    on_progress: Optional[ProgressCallback] = None) -> RepoMap:
+        first = list(first)
+        ordered = prioritize(file_paths, first, change_count)
+        split = len(set(first).intersection(ordered)) + self.foreground_files
+        foreground, self._pending = ordered[:split], ordered[split:]
+
+        file_infos = await self.code_analyzer.analyze_files(foreground, on_progress)
+        graph = await self.code_analyzer.build_graph(file_infos)
+        self.repo_map = RepoMap(graph, file_infos, tag_store=lambda: self.code_analyzer.tag_store)
+        self.repo_map.pending_files = len(self._pending)
+        LOGGER.info(f"Indexed {len(file_infos)} priority files, {len(self._pending)} left for the background")
+        if self._pending:
+            self._task = asyncio.create_task(self._run())
+        return self.repo_map
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def join(self):
+        """Wait until every file has been indexed."""
+        if self._task is not None:
+            await self._task
+
+    async def _run(self):
+        batch_size = self.batch_size
+        while self._pending:
+            batch, self._pending = self._pending[:batch_size], self._pending[batch_size:]
+            try:
+                file_infos, graph = await self.code_analyzer.extend(batch, self.repo_map.file_infos)
+                self.repo_map.update_graph(graph, file_infos)
+            except Exception as e:
+                LOGGER.error(f"Error indexing {len(batch)} files in the background: {str(e)}")
+            self.repo_map.pending_files = len(self._pending)
+            batch_size *= 2
+        LOGGER.info(f"Background indexing done, {len(self.repo_map.file_infos)} files indexed")
@@ -0,0 +1,290 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+LOGGER = logging.getLogger("git_analyzer")
+
+MENTIONED_IDENT_WEIGHT = 10.0
+PRIVATE_IDENT_WEIGHT = 0.1
+
+PUSH_BATCH_SIZE = 64
+
+RankingKey = Tuple[FrozenSet[str], FrozenSet[str], int]
+
+
+class PageRankEngine:
+    """
+    Personalized PageRank over the weighted file reference graph.
+
+    The graph is kept as parallel NumPy edge arrays and turned into a CSR transition
+    matrix per call, so the cost of a ranking is O(edges * iterations). Files that are
+    not reachable from the focus set keep a non-zero rank through a uniform share of the
+    teleport vector (``smoothing``) rather than through explicit all-pairs edges.
+    """
+
+    def __init__(self, nodes: Iterable[str], edges: Iterable[Tuple[str, str, str]], alpha: float = 0.85,
+                 smoothing: float = 0.05, tol: float = 1e-6, max_iter: int = 1000):
+        self.nodes: List[str] = list(nodes)
+        self.node_index: Dict[str, int] = {node: i for i, node in enumerate(self.nodes)}
+        self.alpha = alpha
+        self.smoothing = smoothing
+        self.tol = tol
+        self.max_iter = max_iter
+
+        self.ident_index: Dict[str, int] = {}
+        src, dst, ident_ids = [], [], []
+        for referencer, definer, ident in edges:
+            if referencer == definer:
+                continue
+            src.append(self.node_index[referencer])
+            dst.append(self.node_index[definer])
+            ident_ids.append(self.ident_index.setdefault(ident, len(self.ident_index)))
+
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.edge_idents = np.asarray(ident_ids, dtype=np.int64)
+        private = np.fromiter((ident.startswith("_") for ident in self.ident_index), dtype=bool,
+                              count=len(self.ident_index))
+        self.base_weights = np.where(private, PRIVATE_IDENT_WEIGHT, 1.0)[self.edge_idents]
+        LOGGER.info(f"PageRankEngine initialized with {len(self.nodes)} nodes and {len(self.src)} edges")
+
+    def edge_weights(self, mentioned_idents: Set[str]) -> np.ndarray:
+        weights = self.base_weights.copy()
+        mentioned = [self.ident_index[ident] for ident in mentioned_idents if ident in self.ident_index]
+        if mentioned:
+            weights[np.isin(self.edge_idents, mentioned)] = MENTIONED_IDENT_WEIGHT
+        return weights
+
+    def transition_matrix(self, weights: np.ndarray) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """Column-stochastic CSR matrix (``M[definer, referencer]``) and the dangling node mask."""
+        n = len(self.nodes)
+        out_weight = np.bincount(self.src, weights=weights, minlength=n)
+        matrix = sparse.csr_matrix((weights / out_weight[self.src], (self.dst, self.src)), shape=(n, n))
+        return matrix, out_weight == 0
+
+    def teleport_vector(self, personalization: Dict[str, float]) -> np.ndarray:
+        n = len(self.nodes)
+        p = np.zeros(n)
+        for node, value in personalization.items():
+            index = self.node_index.get(node)
+            if index is not None:
+                p[index] += value
+        total = p.sum()
+        if total <= 0:
+            LOGGER.warning("Personalization does not cover any graph node, falling back to uniform teleport")
+            return np.full(n, 1.0 / n)
+        return (1 - self.smoothing) * (p / total) + self.smoothing / n
+
+    def rank(self, personalization: Dict[str, float], mentioned_idents: Set[str],
+             start: Optional[np.ndarray] = None) -> np.ndarray:
+        n = len(self.nodes)
+        if n == 0:
+            return np.zeros(0)
+
+        matrix, dangling = self.transition_matrix(self.edge_weights(mentioned_idents))
+        teleport = self.teleport_vector(personalization)
+        x = teleport.copy() if start is None else start / start.sum()
+
+        for _ in range(self.max_iter):
+            previous = x
+            x = self.alpha * (matrix @ previous + previous[dangling].sum() * teleport) + (1 - self.alpha) * teleport
+            if np.abs(x - previous).sum() < n * self.tol:
+                break
+        else:
+            LOGGER.warning(f"PageRank did not converge within {self.max_iter} iterations")
+        return x
+
+    def rank_dict(self, personalization: Dict[str, float], mentioned_idents: Set[str]) -> Dict[str, float]:
+        return dict(zip(self.nodes, self.rank(personalization, mentioned_idents).tolist()))
+
+
+class ApproximatePageRank:
+    """
+    Approximate personalized PageRank assembled from per-file forward-push vectors.
+
+    PageRank with dangling mass returned to the teleport vector is a normalized linear
+    function of that vector, so the ranking for a focus set is the normalized, weighted
+    sum of the push vectors of its files plus a shared uniform (smoothing) component.
+    Push vectors are memoized per file and per set of mentioned identifiers, so once a
+    file has been seen its contribution costs a sparse vector add. Only the ``max_ident_sets``
+    most recently used sets of mentioned identifiers keep their matrix and vectors. ``epsilon``
+    is the residual threshold of the push: smaller values are more accurate but touch more nodes.
+    """
+
+    def __init__(self, engine: PageRankEngine, epsilon: float = 1e-4, max_ident_sets: int = 8):
+        self.engine = engine
+        self.epsilon = epsilon
+        self.max_ident_sets = max_ident_sets
+        self._matrices: OrderedDict[FrozenSet[int], sparse.csr_matrix] = OrderedDict()
+        self._push_vectors: Dict[FrozenSet[int], Dict[int, Tuple[np.ndarray, np.ndarray]]] = {}
+        self._uniform: Dict[FrozenSet[int], np.ndarray] = {}
+
+    def _mentioned_key(self, mentioned_idents: Set[str]) -> FrozenSet[int]:
+        return frozenset(self.engine.ident_index[ident] for ident in mentioned_idents
+                         if ident in self.engine.ident_index)
+
+    def _get_matrix(self, key: FrozenSet[int], mentioned_idents: Set[str]) -> sparse.csr_matrix:
+        """Transition matrix of ``key``; the least recently used set is dropped with its vectors past the limit."""
+        if key in self._matrices:
+            self._matrices.move_to_end(key)
+            return self._matrices[key]
+        self._matrices[key], _ = self.engine.transition_matrix(self.engine.edge_weights(mentioned_idents))
+        while len(self._matrices) > self.max_ident_sets:
+            evicted, _ = self._matrices.popitem(last=False)
+            self._push_vectors.pop(evicted, None)
+            self._uniform.pop(evicted, None)
+        return self._matrices[key]
+
+    def _push(self, sources: List[int], matrix: sparse.csr_matrix) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Forward push from a batch of sources at once. Every round pushes all residuals above
+        ``epsilon`` through one sparse matrix product; mass reaching dangling files leaks.
+        """
+        alpha = self.engine.alpha
+        n = len(self.engine.nodes)
+        estimate = np.zeros((n, len(sources)))
+        residual = np.zeros((n, len(sources)))
+        residual[sources, np.arange(len(sources))] = 1.0
+        while True:
+            pushed = np.where(residual > self.epsilon, residual, 0.0)
+            if not pushed.any():
+                break
+            estimate += (1 - alpha) * pushed
+            residual += alpha * (matrix @ pushed) - pushed
+        vectors = []
+        for column in estimate.T:
+            indices = np.flatnonzero(column)
+            vectors.append((indices, column[indices]))
+        return vectors
+
+    def _push_vectors_for(self, sources: Iterable[int], key: FrozenSet[int],
+                          mentioned_idents: Set[str]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        sources = list(sources)
+        matrix = self._get_matrix(key, mentioned_idents)
+        vectors = self._push_vectors.setdefault(key, {})
+        missing = [source for source in sources if source not in vectors]
+        for start in range(0, len(missing), PUSH_BATCH_SIZE):
+            batch = missing[start:start + PUSH_BATCH_SIZE]
+            vectors.update(zip(batch, self._push(batch, matrix)))
+        return {source: vectors[source] for source in sources}
+
+    def _uniform_vector(self, key: FrozenSet[int], mentioned_idents: Set[str]) -> np.ndarray:
+        """Unnormalized PageRank of the uniform teleport vector, solved once by power iteration."""
+        matrix = self._get_matrix(key, mentioned_idents)
+        if key not in self._uniform:
+            engine = self.engine
+            n = len(engine.nodes)
+            base = np.full(n, (1 - engine.alpha) / n)
+            y = base.copy()
+            for _ in range(engine.max_iter):
+                previous = y
+                y = engine.alpha * (matrix @ previous) + base
+                if np.abs(y - previous).sum() < n * engine.tol:
+                    break
+            self._uniform[key] = y
+        return self._uniform[key]
+
+    def precompute(self, mentioned_idents: Set[str] = frozenset()):
+        """Compute push vectors for every file up front instead of on first use."""
+        key = self._mentioned_key(mentioned_idents)
+        self._push_vectors_for(range(len(self.engine.nodes)), key, mentioned_idents)
+        self._uniform_vector(key, mentioned_idents)
+
+    def rank(self, personalization: Dict[str, float], mentioned_idents: Set[str]) -> np.ndarray:
+        engine = self.engine
+        n = len(engine.nodes)
+        if n == 0:
+            return np.zeros(0)
+
+        key = self._mentioned_key(mentioned_idents)
+        focus = {}
+        for node, value in personalization.items():
+            index = engine.node_index.get(node)
+            if index is not None and value > 0:
+                focus[index] = focus.get(index, 0.0) + value
+        total = sum(focus.values())
+
+        uniform = self._uniform_vector(key, mentioned_idents)
+        if total <= 0:
+            LOGGER.warning("Personalization does not cover any graph node, falling back to uniform teleport")
+            return uniform / uniform.sum()
+
+        y = engine.smoothing * uniform
+        push_vectors = self._push_vectors_for(focus, key, mentioned_idents)
+        for index, value in focus.items():
+            indices, values = push_vectors[index]
+            y[indices] += (1 - engine.smoothing) * (value / total) * values
+        return y / y.sum()
+
+
+class RankingCache:
+    """
+    LRU cache of ranking vectors and derived results keyed by
+    ``(frozenset(focus_files), frozenset(mentioned_idents), graph_version)``.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._vectors: OrderedDict[RankingKey, np.ndarray] = OrderedDict()
+        self._results: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(focus_files: Iterable[str], mentioned_idents: Iterable[str], version: int) -> RankingKey:
+        return frozenset(focus_files), frozenset(mentioned_idents), version
+
+    def _get(self, store: OrderedDict, key: Hashable):
+        value = store.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        store.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _put(self, store: OrderedDict, key: Hashable, value: Any):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > self.max_size:
+            store.popitem(last=False)
+
+    def get_vector(self, key: RankingKey) -> Optional[np.ndarray]:
+        return self._get(self._vectors, key)
+
+    def put_vector(self, key: RankingKey, vector: np.ndarray):
+        self._put(self._vectors, key, vector)
+
+    def get_result(self, key: Hashable) -> Any:
+        return self._get(self._results, key)
+
+    def put_result(self, key: Hashable, result: Any):
+        self._put(self._results, key, result)
+
+    def nearest_vector(self, key: RankingKey) -> Optional[np.ndarray]:
+        """Cached vector of the same graph version whose focus and mentioned sets overlap ``key`` the most."""
+        focus, mentioned, version = key
+        best, best_score = None, 0.0
+        for (other_focus, other_mentioned, other_version), vector in self._vectors.items():
+            if other_version != version:
+                continue
+            score = _jaccard(focus, other_focus) + _jaccard(mentioned, other_mentioned)
+            if best is None or score > best_score:
+                best, best_score = vector, score
+        return best
+
+    def clear(self):
+        self._vectors.clear()
+        self._results.clear()
+
+    def __len__(self):
+        return len(self._vectors)
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,108 @@
+import asyncio
+import os
+from typing import Iterable, Optional
+
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.repo_map.code_analyzer import CodeAnalyzer
+from zap.git_analyzer.repo_map.repo_map import RepoMap
+
+
+class ReindexQueue:
+    """
+    Re-indexes dirty files in the background, one at a time, through the incremental update APIs
+    of a :class:`CodeAnalyzer` and its :class:`RepoMap`. Paths pushed again while still pending
+    are coalesced, so the work done scales with the number of distinct changed files. Batches,
+    such as the files changed by a branch switch, are applied together in one update.
+    """
+
+    def __init__(self, code_analyzer: CodeAnalyzer, repo_map: Optional[RepoMap] = None):
+        self.code_analyzer = code_analyzer
+        self.repo_map = repo_map
+        self._pending: dict[str, None] = {}
+        self._batch: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+        self.processed = 0
+
+    def push(self, paths: Iterable[str]):
+        for path in paths:
+            self._pending[path] = None
+        if self._pending:
+            self._idle.clear()
+            self._wakeup.set()
+
+    def push_batch(self, paths: Iterable[str]):
+        self._batch.update(paths)
+        for path in self._batch:
+            self._pending.pop(path, None)
+        if self._batch:
+            self._idle.clear()
+            self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def join(self):
+        """Wait until every pushed path has been processed."""
+        await self._idle.wait()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._batch or self._pending:
+                if self._batch:
+                    batch, self._batch = self._batch, set()
+                    await self.reindex_many(batch)
+                    continue
+                path = next(iter(self._pending))
+                del self._pending[path]
+                await self.reindex(path)
+            self._idle.set()
+
+    async def reindex_many(self, paths: set[str]):
+        try:
+            file_infos, removed = await self.code_analyzer.update_files(paths)
+            if self.repo_map is not None:
+                nodes = {path: self.code_analyzer.graph[path] for path in file_infos}
+                self.repo_map.update_files(file_infos, nodes, removed)
+            self.processed += len(paths)
+        except Exception as e:
+            LOGGER.error(f"Error re-indexing {len(paths)} files: {str(e)}")
+
+    async def reindex(self, path: str):
+        if path == self.code_analyzer.config.ignore_file:
+            # New ignore rules can exclude any indexed file, which the batch update sweeps for.
+            await self.reindex_many({path})
+            return
+        try:
+            if os.path.exists(os.path.join(self.code_analyzer.config.root_path, path)):
+                file_info = await self.code_analyzer.update_file(path)
+                if self.repo_map is not None:
+                    if file_info is not None:
+                        self.repo_map.update_file(file_info, self.code_analyzer.graph[path])
+                    elif path in self.repo_map.file_infos and path not in self.code_analyzer.graph:
+                        # The file is skipped now, e.g. ignored or minified, and left the analyzer's graph.
+                        self.repo_map.remove_file(path)
+            else:
+                await self.code_analyzer.remove_file(path)
+                if self.repo_map is not None:
+                    self.repo_map.remove_file(path)
+            self.processed += 1
+        except Exception as e:
+            LOGGER.error(f"Error re-indexing {path}: {str(e)}")
@@ -1,26 +1,195 @@
-from typing import List, Dict, Set
-from zap.git_analyzer.repo_map.models import GraphNode, Tag, FileInfo
+from collections import defaultdict
+from typing import Callable, Iterable, List, Dict, Optional, Set, Tuple
+from zap.git_analyzer.repo_map.models import GraphNode, FileInfo
+from zap.git_analyzer.repo_map.ranking import ApproximatePageRank, PageRankEngine, RankingCache
+from zap.git_analyzer.repo_map.tag_store import TagStore, TagView
 import networkx as nx
+import numpy as np
 import logging
 
 LOGGER = logging.getLogger("git_analyzer")
 
 
 class RepoMap:
-    def __init__(self, graph: Dict[str, GraphNode], file_infos: Dict[str, FileInfo]):
+    """
+    Ranks the files of ``graph`` and their tags. ``tag_store`` returns the store of the analyzer that
+    built the graph, which patches it and releases the tag lists of ``file_infos``; the map then reads
+    that store instead of keeping its own. Without it the map stores the tags of ``file_infos`` itself.
+    """
+
+    def __init__(self, graph: Dict[str, GraphNode], file_infos: Dict[str, FileInfo], cache_size: int = 32,
+                 warm_start: bool = False, approximate: bool = False, push_epsilon: float = 1e-4,
+                 tag_store: Optional[Callable[[], TagStore]] = None):
+        self.version = 0
+        self.ranking_cache = RankingCache(cache_size)
+        self.warm_start = warm_start
+        self.approximate = approximate
+        self.push_epsilon = push_epsilon
+        self.ranks: Dict[str, float] = {}
+        # Files still waiting to be indexed; while there are any, rankings cover a partial graph.
+        self.pending_files = 0
+        self._symbol_names: Tuple[int, Set[str]] = (-1, set())
+        self._shared_store = tag_store
+        self._own_store: Optional[TagStore] = None
+        self._build(graph, file_infos)
+        LOGGER.info("RepoMap initialized")
+
+    def _build(self, graph: Dict[str, GraphNode], file_infos: Dict[str, FileInfo]):
         self.graph = graph
         self.file_infos = file_infos
+        if self._shared_store is None:
+            self._own_store = TagStore.from_file_infos(file_infos)
+        self.definers, self.referencers = self._build_ident_index()
+        self.idents = set(self.definers).intersection(self.referencers)
+        self.ident_edges = self._build_ident_edges()
         self.nx_graph = self._create_nx_graph()
-        LOGGER.info("RepoMap initialized")
+        self.ranker = PageRankEngine(self.graph, self.ident_edges)
+        self.approximate_ranker = ApproximatePageRank(self.ranker, self.push_epsilon)
+
+    @property
+    def tag_store(self) -> TagStore:
+        # The analyzer swaps in a compacted store now and then, so the shared one is looked up every time.
+        return self._shared_store() if self._shared_store is not None else self._own_store
+
+    @property
+    def partial(self) -> bool:
+        return self.pending_files > 0
+
+    def symbol_names(self) -> Set[str]:
+        """Lowercased names of all stored tags, collected once per graph version."""
+        version, names = self._symbol_names
+        if version != self.version:
+            cols = self.tag_store.columns()
+            name_ids = np.unique(cols['name'][cols['live'] == 1]).tolist()
+            names = {self.tag_store.names[name_id].lower() for name_id in name_ids}
+            self._symbol_names = (self.version, names)
+        return names
+
+    def update_graph(self, graph: Dict[str, GraphNode], file_infos: Dict[str, FileInfo]):
+        """Replace the underlying graph, bump the graph version and drop cached rankings."""
+        self._build(graph, file_infos)
+        self.version += 1
+        self.ranking_cache.clear()
+        self.ranks = {}
+        LOGGER.info(f"RepoMap graph updated to version {self.version}")
+
+    def _build_ident_index(self) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+        definers = defaultdict(set)
+        referencers = defaultdict(set)
+        # The graph may be patched in place by its owner, so remember what each node held.
+        self._node_idents = {
+            file: (frozenset(node.definitions), frozenset(node.references)) for file, node in self.graph.items()
+        }
+        for file, node in self.graph.items():
+            for ident in node.definitions:
+                definers[ident].add(file)
+            for ident in node.references:
+                referencers[ident].add(file)
+        return dict(definers), dict(referencers)
+
+    def _build_ident_edges(self) -> List[Tuple[str, str, str]]:
+        """(referencer, definer, ident) triples shared by the display and ranking graphs."""
+        edges = []
+        for ident in self.idents:
+            for referencer in self.referencers[ident]:
+                for definer in self.definers[ident]:
+                    edges.append((referencer, definer, ident))
+        return edges
+
+    def update_file(self, file_info: FileInfo, node: GraphNode):
+        """
+        Patch the map after a single file changed: only the identifiers it defined or referenced
+        before or after the change get their edges rebuilt. Cached rankings are dropped.
+        """
+        self.update_files({file_info.path: file_info}, {file_info.path: node})
+
+    def remove_file(self, path: str):
+        """Drop a deleted file and every edge through it. Cached rankings are dropped."""
+        self.update_files({}, {}, [path])
+
+    def update_files(self, file_infos: Dict[str, FileInfo], nodes: Dict[str, GraphNode], removed: Iterable[str] = ()):
+        """
+        Patch several changed and deleted files at once. The ranking engine is rebuilt and the
+        ranking cache invalidated a single time for the whole batch.
+        """
+        new_edge_count = removed_count = 0
+        for path in removed:
+            if path not in self._node_idents:
+                continue
+            new_edges = self._patch_idents(path, frozenset(), frozenset())
+            del self._node_idents[path]
+            self.graph.pop(path, None)
+            self.file_infos.pop(path, None)
+            if self._own_store is not None:
+                self._own_store.remove_file(path)
+            if path in self.nx_graph:
+                self.nx_graph.remove_node(path)
+            # The edges of every affected identifier were dropped; those between remaining files come back.
+            for referencer, definer, ident in new_edges:
+                self.nx_graph.add_edge(referencer, definer, ident=ident)
+            new_edge_count += len(new_edges)
+            removed_count += 1
+        for path, file_info in file_infos.items():
+            node = nodes[path]
+            new_edges = self._patch_idents(path, frozenset(node.definitions), frozenset(node.references))
+            self.graph[path] = node
+            self.file_infos[path] = file_info
+            if self._own_store is not None:
+                self._own_store.replace_file(path, file_info.tags)
+            self.nx_graph.add_node(path)
+            for referencer, definer, ident in new_edges:
+                self.nx_graph.add_edge(referencer, definer, ident=ident)
+            new_edge_count += len(new_edges)
+        if self._own_store is not None and self._own_store.needs_compaction:
+            self._own_store = self._own_store.compacted()
+        self._refresh_ranker()
+        LOGGER.info(f"RepoMap patched for {len(file_infos)} changed and {removed_count} removed files "
+                    f"with {new_edge_count} new edges")
+
+    def _patch_idents(self, path: str, definitions: frozenset, references: frozenset) -> List[Tuple[str, str, str]]:
+        """Move ``path`` to its new identifiers and rebuild the edges of every affected one."""
+        old_definitions, old_references = self._node_idents.get(path, (frozenset(), frozenset()))
+        affected = old_definitions | old_references | definitions | references
+
+        old_referencers = {file for ident in affected & self.idents for file in self.referencers[ident]}
+        self.nx_graph.remove_edges_from([
+            (referencer, definer, key)
+            for referencer, definer, key, ident in self.nx_graph.out_edges(old_referencers, keys=True, data='ident')
+            if ident in affected
+        ])
+        for index, old_idents, idents in ((self.definers, old_definitions, definitions),
+                                          (self.referencers, old_references, references)):
+            for ident in old_idents - idents:
+                index[ident].discard(path)
+                if not index[ident]:
+                    del index[ident]
+            for ident in idents - old_idents:
+                index.setdefault(ident, set()).add(path)
+        self._node_idents[path] = (definitions, references)
+
+        new_edges = []
+        for ident in affected:
+            if ident in self.definers and ident in self.referencers:
+                self.idents.add(ident)
+                new_edges.extend((referencer, definer, ident)
+                                 for referencer in self.referencers[ident] for definer in self.definers[ident])
+            else:
+                self.idents.discard(ident)
+        self.ident_edges = [edge for edge in self.ident_edges if edge[2] not in affected] + new_edges
+        return new_edges
+
+    def _refresh_ranker(self):
+        self.ranker = PageRankEngine(self.graph, self.ident_edges)
+        self.approximate_ranker = ApproximatePageRank(self.ranker, self.push_epsilon)
+        self.version += 1
+        self.ranking_cache.clear()
+        self.ranks = {}
 
     def _create_nx_graph(self) -> nx.MultiDiGraph:
         G = nx.MultiDiGraph()
-        for file, node in self.graph.items():
-            G.add_node(file)
-            for ref in node.references:
-                for def_file, def_node in self.graph.items():
-                    if ref in def_node.definitions:
-                        G.add_edge(file, def_file, ident=ref)
+        G.add_nodes_from(self.graph)
+        for referencer, definer, ident in self.ident_edges:
+            G.add_edge(referencer, definer, ident=ident)
         LOGGER.info(f"NetworkX graph created with {len(G.nodes)} nodes and {len(G.edges)} edges")
         return G
 
@@ -29,58 +198,42 @@ class RepoMap:
             LOGGER.error("Focus files list is empty")
             raise ValueError("Focus files list is empty.")
 
-        personalization = {file: 1.0 / len(focus_files) for file in focus_files}
-
-        idents = set(ref for node in self.graph.values() for ref in node.references).intersection(
-            set(d for node in self.graph.values() for d in node.definitions)
-        )
-
-        G = nx.MultiDiGraph()
-        for ident in idents:
-            definers = {file for file, node in self.graph.items() if ident in node.definitions}
-            referencers = {file for file, node in self.graph.items() if ident in node.references}
-            for definer in definers:
-                for referencer in referencers:
-                    if definer != referencer:
-                        weight = 1.0
-                        if ident in mentioned_idents:
-                            weight *= 10
-                        elif ident.startswith("_"):
-                            weight *= 0.1
-
-                        G.add_edge(referencer, definer, weight=weight, ident=ident)
-
-        for file in self.graph:
-            if file not in G.nodes:
-                G.add_node(file)
-
-        delta = 1 / len(G.nodes)
-        for node in G.nodes:
-            for other_node in G.nodes:
-                if node != other_node:
-                    G.add_edge(node, other_node, weight=delta)
-
-        try:
-            ranked = nx.pagerank(G, personalization=personalization, alpha=0.85, max_iter=1000)
-        except ZeroDivisionError as e:
-            LOGGER.error(f"Error in PageRank calculation: {str(e)}")
-            raise RuntimeError("Error in PageRank calculation: likely due to insufficient data.") from e
+        key = RankingCache.make_key(focus_files, mentioned_idents, self.version)
+        vector = self.ranking_cache.get_vector(key)
+        if vector is None:
+            personalization = {file: 1.0 / len(focus_files) for file in focus_files}
+            if self.approximate:
+                vector = self.approximate_ranker.rank(personalization, mentioned_idents)
+            else:
+                start = self.ranking_cache.nearest_vector(key) if self.warm_start else None
+                vector = self.ranker.rank(personalization, mentioned_idents, start=start)
+            self.ranking_cache.put_vector(key, vector)
+        else:
+            LOGGER.info("PageRank loaded from ranking cache")
+
+        ranked = dict(zip(self.ranker.nodes, vector.tolist()))
+        self.ranks = ranked
 
         for node in self.nx_graph.nodes:
             self.nx_graph.nodes[node]['pagerank'] = ranked.get(node, 0)
         LOGGER.info("PageRank calculation completed")
 
     def get_ranked_tags_map(self, focus_files: List[str], mentioned_idents: Set[str], max_files: int,
-                            max_tags_per_file: int = 50) -> List[Tag]:
+                            max_tags_per_file: int = 50) -> TagView:
         self.calculate_pagerank(focus_files, mentioned_idents)
 
-        ranked = nx.get_node_attributes(self.nx_graph, 'pagerank')
-        sorted_files = sorted(ranked.items(), key=lambda x: x[1], reverse=True)[:max_files]
-
-        ranked_tags = []
-        for file, _ in sorted_files:
-            if file in self.file_infos:
-                ranked_tags.extend(self.file_infos[file].tags[:max_tags_per_file])
-
-        LOGGER.info(f"Ranked tags map generated with {len(ranked_tags)} tags")
-        return ranked_tags[:max_files * max_tags_per_file]
+        key = RankingCache.make_key(focus_files, mentioned_idents, self.version) + (max_files, max_tags_per_file)
+        cached_tags = self.ranking_cache.get_result(key)
+        if cached_tags is not None:
+            return cached_tags
+
+        sorted_files = sorted(self.ranks.items(), key=lambda x: x[1], reverse=True)[:max_files]
+
+        # Views are immutable, so the cached result is handed out as is.
+        ranked_tags = TagView.concat(self.tag_store, (
+            self.tag_store.view(self.tag_store.file_rows(file)[:max_tags_per_file]) for file, _ in sorted_files
+        ))[:max_files * max_tags_per_file]
+        self.ranking_cache.put_result(key, ranked_tags)
+        LOGGER.info(f"Ranked tags map generated with {len(ranked_tags)} tags"
+                    + (f", {self.pending_files} files not indexed yet" if self.partial else ""))
+        return ranked_tags
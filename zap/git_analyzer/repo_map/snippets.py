@@ -0,0 +1,92 @@
+import mmap
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import pygit2
+
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.repo_map.models import Tag
+
+
+def slice_body(source: bytes, tag: Tag, encoding: str = 'utf-8') -> str:
+    """Body of ``tag`` sliced from the raw bytes of its file."""
+    if tag.start_byte < 0:
+        return ""
+    return source[tag.start_byte:tag.end_byte].decode(encoding, errors='replace')
+
+
+class SnippetReader:
+    """
+    Slices tag bodies out of the files on disk when a snippet is rendered, so compact file infos
+    never hold source text. Recently used files stay memory-mapped; a file is remapped when its
+    size or mtime changes.
+    """
+
+    def __init__(self, root_path: str, encoding: str = 'utf-8', max_open: int = 64):
+        self.root_path = root_path
+        self.encoding = encoding
+        self.max_open = max_open
+        self._maps: OrderedDict[str, tuple[tuple[int, int], Optional[mmap.mmap]]] = OrderedDict()
+        self._hashes: dict[str, tuple[tuple[int, int], str]] = {}
+
+    def _map(self, path: str) -> Optional[mmap.mmap]:
+        abs_path = os.path.join(self.root_path, path)
+        stat = os.stat(abs_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._maps.get(path)
+        if cached is not None and cached[0] == key:
+            self._maps.move_to_end(path)
+            return cached[1]
+        self._unmap(path)
+        mapped = None
+        if stat.st_size:
+            with open(abs_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[path] = (key, mapped)
+        while len(self._maps) > self.max_open:
+            self._unmap(next(iter(self._maps)))
+        return mapped
+
+    def _unmap(self, path: str):
+        _, mapped = self._maps.pop(path, (None, None))
+        if mapped is not None:
+            mapped.close()
+
+    def content_hash(self, path: str) -> str:
+        """Git blob id of the file as it is on disk now, hashed once per mtime and size."""
+        abs_path = os.path.join(self.root_path, path)
+        stat = os.stat(abs_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != key:
+            cached = (key, str(pygit2.hashfile(abs_path)))
+            self._hashes[path] = cached
+        return cached[1]
+
+    def body(self, tag: Tag, content_hash: Optional[str] = None) -> str:
+        """
+        Body of ``tag``. Tags that still carry their body return it as is. When ``content_hash``
+        is given and the file no longer matches it, the offsets are stale and an empty body is
+        returned.
+        """
+        # Refs of the tag store never carry a body.
+        body = getattr(tag, 'body', "")
+        if body or tag.start_byte < 0:
+            return body
+        try:
+            if content_hash and self.content_hash(tag.path) != content_hash:
+                LOGGER.warning(f"File '{tag.path}' changed since it was indexed, skipping body of {tag.name}")
+                return ""
+            mapped = self._map(tag.path)
+        except OSError as e:
+            LOGGER.error(f"Error reading snippet from {tag.path}: {str(e)}")
+            return ""
+        if mapped is None:
+            return ""
+        return mapped[tag.start_byte:tag.end_byte].decode(self.encoding, errors='replace')
+
+    def close(self):
+        for path in list(self._maps):
+            self._unmap(path)
+        self._hashes.clear()
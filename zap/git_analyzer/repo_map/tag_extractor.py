@@ -1,61 +1,79 @@
 import os
-from typing import List
-from pathlib import Path
-from tree_sitter_languages import get_language, get_parser
+from typing import List, Optional
+
+from tree_sitter import Tree
 
 from zap.git_analyzer.repo_map.constants import filename_to_lang
+from zap.git_analyzer.repo_map.language_registry import LanguageRegistry, get_registry
 from zap.git_analyzer.repo_map.models import Tag
 import logging
 
 LOGGER = logging.getLogger("git_analyzer")
 
 class TagExtractor:
-    def __init__(self, root_path: str, encoding: str = 'utf-8'):
+    def __init__(self, root_path: str, encoding: str = 'utf-8', registry: Optional[LanguageRegistry] = None,
+                 include_body: bool = True):
         self.root_path = root_path
         self.encoding = encoding
+        self.registry = registry or get_registry()
+        self.include_body = include_body
 
-    def _get_query_scm(self, lang):
-        query_path = Path(__file__).parent / "queries" / f"tree-sitter-{lang}-tags.scm"
-        if not query_path.exists():
+    def parse(self, fname: str, source: bytes, old_tree: Optional[Tree] = None) -> Optional[Tree]:
+        """Parse ``source``, reusing the unchanged parts of ``old_tree`` when it has been edited."""
+        lang = filename_to_lang(fname)
+        if not lang:
+            LOGGER.warning(f"Unsupported language for file: {fname}")
+            return None
+        if not self.registry.get_tags_query(lang):
+            LOGGER.warning(f"No query scheme found for language: {lang}")
             return None
-        return query_path.read_text()
+        parser = self.registry.get_parser(lang)
+        return parser.parse(source, old_tree) if old_tree is not None else parser.parse(source)
+
+    def tags_from_tree(self, fname: str, source: bytes, tree: Tree, start_byte: Optional[int] = None,
+                       end_byte: Optional[int] = None) -> List[Tag]:
+        """
+        Run the tags query over ``tree``. With a byte range only names lying inside it are returned;
+        their enclosing nodes may extend past it.
+        """
+        query = self.registry.get_tags_query(filename_to_lang(fname))
+        if start_byte is None:
+            captures = query.captures(tree.root_node)
+        else:
+            captures = query.captures(tree.root_node, start_byte=start_byte, end_byte=end_byte)
+
+        tags = []
+        for node, tag in captures:
+            kind = ""
+            if tag.startswith("name.definition."):
+                kind = "def"
+            elif tag.startswith("name.reference."):
+                kind = "ref"
+            if not kind:
+                continue
+            if start_byte is not None and (node.start_byte < start_byte or node.end_byte > end_byte):
+                continue
+            body_start, body_end = node.parent.start_byte, node.parent.end_byte
+            body = source[body_start:body_end].decode(self.encoding) if self.include_body else ""
+            tags.append(Tag(
+                path=os.path.relpath(fname, self.root_path),
+                name=node.text.decode(self.encoding),
+                kind=kind,
+                start_line=node.start_point[0] + 1,
+                end_line=node.end_point[0] + 1,
+                body=body,
+                start_byte=body_start,
+                end_byte=body_end
+            ))
+        return tags
 
     def extract_tags(self, fname: str, content: str) -> List[Tag]:
         try:
-            lang = filename_to_lang(fname)
-            if not lang:
-                LOGGER.warning(f"Unsupported language for file: {fname}")
+            source = bytes(content, self.encoding)
+            tree = self.parse(fname, source)
+            if tree is None:
                 return []
-
-            language = get_language(lang)
-            parser = get_parser(lang)
-            query_scm = self._get_query_scm(lang)
-            if not query_scm:
-                LOGGER.warning(f"No query scheme found for language: {lang}")
-                return []
-
-            tree = parser.parse(bytes(content, self.encoding))
-            query = language.query(query_scm)
-            captures = query.captures(tree.root_node)
-
-            tags = []
-            for node, tag in captures:
-                kind = ""
-                if tag.startswith("name.definition."):
-                    kind = "def"
-                elif tag.startswith("name.reference."):
-                    kind = "ref"
-                if not kind:
-                    continue
-                body = content[node.parent.start_byte:node.parent.end_byte]
-                tags.append(Tag(
-                    path=os.path.relpath(fname, self.root_path),
-                    name=node.text.decode(self.encoding),
-                    kind=kind,
-                    start_line=node.start_point[0] + 1,
-                    end_line=node.end_point[0] + 1,
-                    body=body
-                ))
+            tags = self.tags_from_tree(fname, source, tree)
             LOGGER.info(f"Extracted {len(tags)} tags from {fname}")
             return tags
 
@@ -0,0 +1,366 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from zap.git_analyzer.repo_map.models import FileInfo, Tag
+
+
+class TagStore:
+    """
+    Columnar, append-only storage for tags. Symbol names, paths and kinds are interned once and
+    every tag is a row of integer columns, so thousands of files repeating the same identifiers
+    cost a few bytes per tag instead of a dataclass instance each. Rows of a file are contiguous.
+    Callers read tags through :class:`TagView` and :class:`TagRef` without materializing them.
+    Replacing a file tombstones its old rows, so views taken before keep reading the old tags;
+    once most rows are dead, owners swap the store for its :meth:`compacted` copy.
+    """
+
+    # Compact once this fraction of at least COMPACT_MIN_ROWS rows is dead.
+    COMPACT_DEAD_FRACTION = 0.5
+    COMPACT_MIN_ROWS = 1024
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.paths: List[str] = []
+        self.kinds: List[str] = ['def', 'ref']
+        self._name_ids: Dict[str, int] = {}
+        self._path_ids: Dict[str, int] = {}
+        self._kind_ids: Dict[str, int] = {kind: i for i, kind in enumerate(self.kinds)}
+        self.path_col = array('I')
+        self.name_col = array('I')
+        self.kind_col = array('B')
+        self.start_line_col = array('I')
+        self.end_line_col = array('I')
+        self.start_byte_col = array('q')
+        self.end_byte_col = array('q')
+        self.live_col = array('B')
+        self._dead_rows = 0
+        self._file_rows: Dict[int, tuple[int, int]] = {}
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._name_order: Optional[np.ndarray] = None
+        # Rank of every path id in path order and name ids in name order; both only grow with new values.
+        self._path_rank: Optional[np.ndarray] = None
+        self._sorted_name_ids: Optional[np.ndarray] = None
+        self._sorted_names: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_file_infos(cls, file_infos: Dict[str, FileInfo]) -> 'TagStore':
+        store = cls()
+        for path, file_info in file_infos.items():
+            store.add_file(path, file_info.tags)
+        return store
+
+    @classmethod
+    def from_dicts(cls, tags: Iterable[Dict[str, Any]]) -> 'TagStore':
+        """Build a store from tag dicts, e.g. rows of the sqlite symbols table."""
+        store = cls()
+        by_path: Dict[str, List[Dict[str, Any]]] = {}
+        for tag in tags:
+            by_path.setdefault(tag['path'], []).append(tag)
+        for tag in (tag for path_tags in by_path.values() for tag in path_tags):
+            store._append(tag['path'], tag['name'], tag['kind'], tag['start_line'], tag['end_line'],
+                          tag.get('start_byte', -1), tag.get('end_byte', -1))
+        return store
+
+    def __len__(self) -> int:
+        return len(self.name_col) - self._dead_rows
+
+    @staticmethod
+    def _intern(value: str, values: List[str], ids: Dict[str, int]) -> int:
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(values)
+            values.append(value)
+        return value_id
+
+    def _append(self, path: str, name: str, kind: str, start_line: int, end_line: int, start_byte: int = -1,
+                end_byte: int = -1):
+        # numpy views pin the array buffers, so they are dropped before the columns grow.
+        self._arrays = None
+        self._name_order = None
+        path_id = self._intern(path, self.paths, self._path_ids)
+        row = len(self.name_col)
+        first, end = self._file_rows.get(path_id, (row, row))
+        if end != row:
+            raise ValueError(f"Tags for '{path}' must be stored contiguously")
+        self._file_rows[path_id] = (first, row + 1)
+        self.path_col.append(path_id)
+        self.name_col.append(self._intern(name, self.names, self._name_ids))
+        self.kind_col.append(self._intern(kind, self.kinds, self._kind_ids))
+        self.start_line_col.append(start_line)
+        self.end_line_col.append(end_line)
+        self.start_byte_col.append(start_byte)
+        self.end_byte_col.append(end_byte)
+        self.live_col.append(1)
+
+    def add_file(self, path: str, tags: Iterable[Tag]):
+        if path in self._path_ids and self._path_ids[path] in self._file_rows:
+            raise ValueError(f"Tags for '{path}' are already stored")
+        for tag in tags:
+            self._append(path, tag.name, tag.kind, tag.start_line, tag.end_line, tag.start_byte, tag.end_byte)
+
+    def copy_file(self, source: 'TagStore', path: str):
+        """Store the live tags ``source`` holds for ``path``."""
+        for row in source.file_rows(path).tolist():
+            self._append(path, source.names[source.name_col[row]], source.kinds[source.kind_col[row]],
+                         source.start_line_col[row], source.end_line_col[row], source.start_byte_col[row],
+                         source.end_byte_col[row])
+
+    def remove_file(self, path: str):
+        path_id = self._path_ids.get(path)
+        if path_id is None or path_id not in self._file_rows:
+            return
+        first, end = self._file_rows.pop(path_id)
+        for row in range(first, end):
+            self.live_col[row] = 0
+        self._dead_rows += end - first
+        self._name_order = None
+
+    def replace_file(self, path: str, tags: Iterable[Tag]):
+        """Swap the tags of ``path`` for ``tags``; the new rows are appended at the end."""
+        self.remove_file(path)
+        self.add_file(path, tags)
+
+    @property
+    def needs_compaction(self) -> bool:
+        rows = len(self.name_col)
+        return rows >= self.COMPACT_MIN_ROWS and self._dead_rows > rows * self.COMPACT_DEAD_FRACTION
+
+    def compacted(self) -> 'TagStore':
+        """
+        A copy holding only the live rows, with names and paths no longer used dropped. The copy is a
+        new store, so views of this one stay valid until they are released.
+        """
+        store = TagStore()
+        store.kinds = list(self.kinds)
+        store._kind_ids = dict(self._kind_ids)
+        live_rows = np.flatnonzero(self.columns()['live'])
+        if not len(live_rows):
+            return store
+        path_ids, new_path_col = np.unique(np.frombuffer(self.path_col, dtype='I')[live_rows], return_inverse=True)
+        name_ids, new_name_col = np.unique(np.frombuffer(self.name_col, dtype='I')[live_rows], return_inverse=True)
+        store.paths = [self.paths[i] for i in path_ids.tolist()]
+        store.names = [self.names[i] for i in name_ids.tolist()]
+        store._path_ids = {path: i for i, path in enumerate(store.paths)}
+        store._name_ids = {name: i for i, name in enumerate(store.names)}
+        for col, values in ((store.path_col, new_path_col), (store.name_col, new_name_col),
+                            (store.kind_col, self.kind_col), (store.start_line_col, self.start_line_col),
+                            (store.end_line_col, self.end_line_col), (store.start_byte_col, self.start_byte_col),
+                            (store.end_byte_col, self.end_byte_col)):
+            if not isinstance(values, np.ndarray):
+                values = np.frombuffer(values, dtype=values.typecode)[live_rows]
+            col.frombytes(values.astype(col.typecode).tobytes())
+        store.live_col.frombytes(np.ones(len(live_rows), dtype=np.uint8).tobytes())
+        # A file's live rows stay contiguous, so its new range starts where its first row landed.
+        for path_id, (first, end) in self._file_rows.items():
+            new_first = int(np.searchsorted(live_rows, first))
+            store._file_rows[store._path_ids[self.paths[path_id]]] = (new_first, new_first + end - first)
+        return store
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Zero-copy numpy views of the columns."""
+        if self._arrays is None:
+            self._arrays = {
+                name: np.frombuffer(col, dtype=col.typecode) if len(col) else np.zeros(0, dtype=col.typecode)
+                for name, col in (
+                    ('path', self.path_col), ('name', self.name_col), ('kind', self.kind_col),
+                    ('start_line', self.start_line_col), ('end_line', self.end_line_col), ('live', self.live_col),
+                )
+            }
+        return self._arrays
+
+    def iter_names(self) -> Iterator[tuple[str, str, str]]:
+        """(path, name, kind) of every live row, in storage order."""
+        for path_id, name_id, kind_id, live in zip(self.path_col, self.name_col, self.kind_col, self.live_col):
+            if live:
+                yield self.paths[path_id], self.names[name_id], self.kinds[kind_id]
+
+    def file_rows(self, path: str) -> np.ndarray:
+        path_id = self._path_ids.get(path)
+        if path_id is None or path_id not in self._file_rows:
+            return np.zeros(0, dtype=np.int64)
+        return np.arange(*self._file_rows[path_id], dtype=np.int64)
+
+    def _prefix_name_ids(self, prefix: str) -> np.ndarray:
+        """Ids of the names starting with ``prefix``, found by bisecting the names in sorted order."""
+        if self._sorted_name_ids is None or len(self._sorted_name_ids) != len(self.names):
+            names = np.array(self.names, dtype=object)
+            self._sorted_name_ids = np.argsort(names, kind='stable')
+            self._sorted_names = names[self._sorted_name_ids]
+        sorted_names = self._sorted_names
+        lo = np.searchsorted(sorted_names, prefix, side='left')
+        if prefix[-1] == chr(0x10FFFF):
+            hi = len(sorted_names)
+        else:
+            # The first string after every one starting with the prefix.
+            hi = np.searchsorted(sorted_names, prefix[:-1] + chr(ord(prefix[-1]) + 1), side='left')
+        return self._sorted_name_ids[lo:hi]
+
+    def _name_rows(self, name: str, prefix: bool) -> np.ndarray:
+        cols = self.columns()
+        names = cols['name']
+        if prefix and name:
+            name_ids = self._prefix_name_ids(name)
+        elif prefix:
+            name_ids = np.arange(len(self.names))
+        else:
+            name_id = self._name_ids.get(name)
+            if name_id is None:
+                return np.zeros(0, dtype=np.int64)
+            name_ids = np.array([name_id])
+        if self._name_order is None:
+            live_rows = np.flatnonzero(cols['live'])
+            self._name_order = live_rows[np.argsort(names[live_rows], kind='stable')]
+        sorted_names = names[self._name_order]
+        los = np.searchsorted(sorted_names, name_ids, side='left')
+        his = np.searchsorted(sorted_names, name_ids, side='right')
+        if len(name_ids) == 1:
+            return np.sort(self._name_order[los[0]:his[0]])
+        return np.sort(np.concatenate([self._name_order[lo:hi] for lo, hi in zip(los.tolist(), his.tolist())]
+                                      or [np.zeros(0, dtype=np.int64)]))
+
+    def _path_ranks(self) -> np.ndarray:
+        if self._path_rank is None or len(self._path_rank) != len(self.paths):
+            self._path_rank = np.empty(len(self.paths), dtype=np.int64)
+            self._path_rank[np.argsort(np.array(self.paths, dtype=object), kind='stable')] = np.arange(len(self.paths))
+        return self._path_rank
+
+    def select(self, path: Optional[str] = None, kind: Optional[str] = None, name: Optional[str] = None,
+               prefix: bool = False) -> 'TagView':
+        """Rows matching every given filter, ordered by path and start line."""
+        if kind is not None and kind not in self._kind_ids:
+            return TagView(self, np.zeros(0, dtype=np.int64))
+        cols = self.columns()
+        if path is not None:
+            rows = self.file_rows(path)
+            if name is not None:
+                rows = np.intersect1d(rows, self._name_rows(name, prefix), assume_unique=True)
+        elif name is not None:
+            rows = self._name_rows(name, prefix)
+        else:
+            rows = np.flatnonzero(cols['live'])
+        if kind is not None:
+            rows = rows[cols['kind'][rows] == self._kind_ids[kind]]
+
+        if path is not None:
+            # All rows are of one file.
+            order = np.argsort(cols['start_line'][rows], kind='stable')
+        else:
+            order = np.lexsort((cols['start_line'][rows], self._path_ranks()[cols['path'][rows]]))
+        return TagView(self, rows[order])
+
+    def view(self, rows: Union[np.ndarray, List[int]]) -> 'TagView':
+        return TagView(self, np.asarray(rows, dtype=np.int64))
+
+
+class TagRef:
+    """
+    A read-only row of a :class:`TagStore` exposing the attributes of a :class:`Tag` but its body,
+    which is never stored; it is sliced from the file on demand (see SnippetReader).
+    """
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: TagStore, row: int):
+        self.store = store
+        self.row = int(row)
+
+    @property
+    def path(self) -> str:
+        return self.store.paths[self.store.path_col[self.row]]
+
+    @property
+    def name(self) -> str:
+        return self.store.names[self.store.name_col[self.row]]
+
+    @property
+    def kind(self) -> str:
+        return self.store.kinds[self.store.kind_col[self.row]]
+
+    @property
+    def start_line(self) -> int:
+        return self.store.start_line_col[self.row]
+
+    @property
+    def end_line(self) -> int:
+        return self.store.end_line_col[self.row]
+
+    @property
+    def start_byte(self) -> int:
+        return self.store.start_byte_col[self.row]
+
+    @property
+    def end_byte(self) -> int:
+        return self.store.end_byte_col[self.row]
+
+    def _key(self) -> tuple:
+        return self.path, self.start_line, self.end_line, self.name, self.kind
+
+    def __eq__(self, other):
+        if isinstance(other, (TagRef, Tag)):
+            return self._key() == (other.path, other.start_line, other.end_line, other.name, other.kind)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"TagRef(path={self.path!r}, start_line={self.start_line}, name={self.name!r}, kind={self.kind!r})"
+
+    def to_tag(self) -> Tag:
+        return Tag(path=self.path, start_line=self.start_line, end_line=self.end_line, name=self.name,
+                   kind=self.kind, start_byte=self.start_byte, end_byte=self.end_byte)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.to_tag().to_dict()
+
+
+class TagView:
+    """An immutable selection of rows of a :class:`TagStore`, usable wherever a list of tags is read."""
+
+    __slots__ = ('store', 'rows')
+
+    def __init__(self, store: TagStore, rows: np.ndarray):
+        self.store = store
+        self.rows = rows
+        self.rows.flags.writeable = False
+
+    @classmethod
+    def concat(cls, store: TagStore, views: Iterable['TagView']) -> 'TagView':
+        rows = [view.rows for view in views]
+        return cls(store, np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[TagRef]:
+        for row in self.rows.tolist():
+            yield TagRef(self.store, row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TagView(self.store, self.rows[index])
+        return TagRef(self.store, self.rows[index])
+
+    def __eq__(self, other):
+        if isinstance(other, TagView) and other.store is self.store:
+            return np.array_equal(self.rows, other.rows)
+        if isinstance(other, (TagView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TagView({len(self)} tags)"
+
+    def paths(self) -> List[str]:
+        """Distinct paths in the view, in order of first appearance."""
+        path_ids = self.store.columns()['path'][self.rows]
+        _, first = np.unique(path_ids, return_index=True)
+        return [self.store.paths[path_ids[i]] for i in sorted(first.tolist())]
+
+    def to_tags(self) -> List[Tag]:
+        return [ref.to_tag() for ref in self]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [ref.to_dict() for ref in self]
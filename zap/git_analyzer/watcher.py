@@ -0,0 +1,258 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from zap.git_analyzer.git_repo import GitRepo
+from zap.git_analyzer.logger import LOGGER
+from zap.git_analyzer.utils.constants import SEPARATOR
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+# Called with repo-relative paths that changed, or with None when changes may have been lost.
+ChangeCallback = Callable[[Optional[Set[str]]], None]
+
+
+class InotifyWatcher:
+    """
+    Watches directories with Linux inotify through libc, without extra dependencies. Events are
+    read on the event loop via ``add_reader``; only the given directories are watched.
+    """
+
+    def __init__(self, root: str, on_change: ChangeCallback):
+        self.root = root
+        self.on_change = on_change
+        self._libc = None
+        self._fd = -1
+        self._dirs: Dict[int, str] = {}
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def start(self, directories: Iterable[str]):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        for directory in directories:
+            self.watch(directory)
+        asyncio.get_running_loop().add_reader(self._fd, self._read)
+        LOGGER.info(f"Watching {len(self._dirs)} directories with inotify")
+
+    def watch(self, directory: str):
+        abs_dir = os.path.join(self.root, directory)
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(abs_dir), WATCH_MASK)
+        if wd < 0:
+            LOGGER.warning(f"Could not watch {abs_dir}: {os.strerror(ctypes.get_errno())}")
+            return
+        self._dirs[wd] = directory
+
+    def _read(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                LOGGER.warning("inotify queue overflowed, changes may have been missed")
+                self.on_change(None)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name or mask & IN_ISDIR:
+                continue
+            name = os.fsdecode(name)
+            changed.add(f"{directory}{SEPARATOR}{name}" if directory else name)
+        if changed:
+            self.on_change(changed)
+
+    def stop(self):
+        if self._fd >= 0:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = -1
+            self._dirs.clear()
+
+
+class PollingWatcher:
+    """Detects changes by comparing ``(mtime_ns, size)`` snapshots of the tracked files."""
+
+    def __init__(self, root: str, on_change: ChangeCallback, interval: float = 2.0):
+        self.root = root
+        self.on_change = on_change
+        self.interval = interval
+        self._paths: Callable[[], Iterable[str]] = lambda: ()
+        self._snapshot: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(os.path.join(self.root, path))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _take_snapshot(self, paths: Iterable[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+        return {path: self._stat(path) for path in paths}
+
+    async def prime(self, paths: Callable[[], Iterable[str]]):
+        self._paths = paths
+        self._snapshot = await asyncio.to_thread(self._take_snapshot, list(paths()))
+
+    async def scan(self) -> Set[str]:
+        """Paths whose stat changed since the previous scan."""
+        snapshot = await asyncio.to_thread(self._take_snapshot, list(self._paths()))
+        changed = {path for path, stat in snapshot.items() if self._snapshot.get(path, stat) != stat}
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    async def start(self, paths: Callable[[], Iterable[str]]):
+        await self.prime(paths)
+        self._task = asyncio.create_task(self._run())
+        LOGGER.info(f"Polling {len(self._snapshot)} files every {self.interval}s")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            changed = await self.scan()
+            if changed:
+                self.on_change(changed)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class RepoWatcher:
+    """
+    Watches the working tree of a :class:`GitRepo` while a session runs. Raw change events are
+    debounced, filtered down to tracked files through the repo's file trie and handed to
+    ``on_dirty`` (typically ``ReindexQueue.push``). When HEAD moved in the meantime, e.g. on a
+    branch switch, the paths of the tree-to-tree diff are handed to ``on_branch_switch`` as one
+    batch instead. inotify is used where available, with stat polling as the fallback and to
+    recover from inotify queue overflows.
+    """
+
+    def __init__(self, git_repo: GitRepo, on_dirty: Callable[[Set[str]], None], debounce: float = 0.2,
+                 poll_interval: float = 2.0, use_inotify: bool = True,
+                 on_branch_switch: Optional[Callable[[Set[str]], None]] = None):
+        self.git_repo = git_repo
+        self.root = git_repo.root
+        self.on_dirty = on_dirty
+        self.on_branch_switch = on_branch_switch
+        self.debounce = debounce
+        self._pending: Set[str] = set()
+        self._rescan = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._rescan_task: Optional[asyncio.Task] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self.poller = PollingWatcher(self.root, self._on_change, poll_interval)
+        self.inotify: Optional[InotifyWatcher] = None
+        if use_inotify and InotifyWatcher.available():
+            self.inotify = InotifyWatcher(self.root, self._on_change)
+
+    def _tracked_files(self) -> Iterable[str]:
+        return self.git_repo.file_trie.keys()
+
+    def _tracked_dirs(self) -> Set[str]:
+        return {path.rpartition(SEPARATOR)[0] for path in self._tracked_files()}
+
+    async def start(self):
+        if self.inotify is not None:
+            try:
+                self.inotify.start(self._tracked_dirs())
+                # The poller only keeps a snapshot to recover from overflows; it does not poll.
+                await self.poller.prime(self._tracked_files)
+                return
+            except OSError as e:
+                LOGGER.warning(f"inotify unavailable, falling back to polling: {str(e)}")
+                self.inotify = None
+        await self.poller.start(self._tracked_files)
+
+    async def stop(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for task in (self._rescan_task, self._dispatch_task):
+            if task is not None:
+                task.cancel()
+        if self.inotify is not None:
+            self.inotify.stop()
+        await self.poller.stop()
+
+    def _on_change(self, paths: Optional[Set[str]]):
+        if paths is None:
+            self._rescan = True
+        else:
+            self._pending.update(paths)
+        # Every new event pushes the flush back, so a burst of saves is handled once.
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(self.debounce, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        if self._rescan:
+            self._rescan = False
+            self._rescan_task = asyncio.create_task(self._recover())
+        paths, self._pending = self._pending, set()
+        if self.on_branch_switch is None:
+            self._dispatch(paths)
+        elif paths:
+            previous = self._dispatch_task
+            self._dispatch_task = asyncio.create_task(self._check_head_and_dispatch(paths, previous))
+
+    def _dispatch(self, paths: Set[str]):
+        dirty = {path for path in paths if path in self.git_repo.file_trie}
+        if dirty:
+            LOGGER.info(f"{len(dirty)} tracked files changed")
+            self.on_dirty(dirty)
+
+    async def _check_head_and_dispatch(self, paths: Set[str], previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.shield(previous)
+        change = await self.git_repo.check_head()
+        if change is None:
+            self._dispatch(paths)
+            return
+        old_head, new_head = change
+        changed = await self.git_repo.get_changed_paths(old_head, new_head)
+        # The new branch may track other files.
+        await self.git_repo.refresh()
+        batch = changed | {path for path in paths if path in self.git_repo.file_trie}
+        LOGGER.info(f"HEAD moved from {old_head} to {new_head}, re-indexing {len(batch)} changed files")
+        self.on_branch_switch(batch)
+
+    async def _recover(self):
+        changed = await self.poller.scan()
+        if changed:
+            self._on_change(changed)
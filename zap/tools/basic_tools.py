@@ -4,10 +4,27 @@ from typing import Annotated, Optional
 
 from zap.app_state import AppState
 from zap.cliux import UIInterface
+from zap.logger import LOGGER
 from zap.tools.tool import Tool
 from zap.tools.tool_manager import ToolManager
 
 
+async def reindex_file(app_state: AppState, filename: str):
+    """Refresh the tags and repo map edges of an edited file. Indexing problems never fail the edit."""
+    if app_state.code_analyzer is None:
+        return
+    try:
+        file_info = await app_state.code_analyzer.update_file(filename)
+        repo_map = app_state.repo_map
+        if file_info is not None and repo_map is not None:
+            repo_map.update_file(file_info, app_state.code_analyzer.graph[filename])
+        elif repo_map is not None and filename in repo_map.file_infos and filename not in app_state.code_analyzer.graph:
+            # The edit made the file skipped, e.g. minified, so it leaves the map.
+            repo_map.remove_file(filename)
+    except Exception as e:
+        LOGGER.error(f"Error re-indexing {filename}: {str(e)}")
+
+
 class ShellCommandTool(Tool):
     def __init__(self, name: str, description: str, app_state: AppState):
         super().__init__(name, description)
@@ -74,6 +91,7 @@ class WriteFileTool(Tool):
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
         with open(full_path, "w", encoding="utf-8") as file:
             file.write(content)
+        await reindex_file(self.app_state, filename)
         return {
             "status": "success",
             "message": f"File {filename} written successfully.",
@@ -267,6 +285,7 @@ class EditFileTool(Tool):
 
         with open(full_path, "w", encoding="utf-8") as file:
             file.writelines(lines)
+        await reindex_file(self.app_state, filename)
 
         return {
             "status": "success" if abs(end_line - start_line) < 20 else "warning",
@@ -293,6 +312,7 @@ class ReplaceBlockTool(Tool):
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
             with open(full_path, "w", encoding="utf-8") as file:
                 file.write(replace_block)
+            await reindex_file(self.app_state, filename)
             return {
                 "status": "success",
                 "message": f"File {filename} created successfully.",
@@ -311,6 +331,7 @@ class ReplaceBlockTool(Tool):
 
         with open(full_path, "w", encoding="utf-8") as file:
             file.write(updated_content)
+        await reindex_file(self.app_state, filename)
 
         return {
             "status": "success",
@@ -324,13 +345,20 @@ class SearchTagTool(Tool):
         self.app_state = app_state
 
     async def execute(self, symbol: Annotated[str, "Symbol to search for"],
-                      kind: Optional[Annotated[str, "Filter by kind (def or ref)"]] = None):
-        tag_data = await self.app_state.code_analyzer.query_symbol(symbol)
-        if kind:
-            tag_data = [tag for tag in tag_data if tag.kind == kind]
+                      kind: Optional[Annotated[str, "Filter by kind (def or ref)"]] = None,
+                      match: Optional[Annotated[str, "Match mode (exact or prefix)"]] = None):
+        code_analyzer = self.app_state.code_analyzer
+        tag_data = await code_analyzer.query_symbol(symbol, kind=kind, prefix=match == "prefix")
+        file_infos = self.app_state.repo_map.file_infos if self.app_state.repo_map is not None else {}
+        tags = []
+        for tag in tag_data:
+            # The tag store keeps only locations, so bodies are sliced from the files on demand.
+            tag_dict = tag.to_dict()
+            tag_dict["body"] = code_analyzer.read_body(tag, file_infos.get(tag.path))
+            tags.append(tag_dict)
         return {
             "status": "success",
-            "tags": [tag.__dict__ for tag in tag_data],
+            "tags": tags,
             "count": len(tag_data)
         }
 
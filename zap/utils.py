@@ -1,11 +1,16 @@
+import asyncio
 import os
 import platform
 import aiofiles
 import re
-from collections import defaultdict
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
 
 from zap.constants import EXTENSION_TO_COMMENT
 from zap.git_analyzer.repo_map.models import Tag
+from zap.logger import LOGGER
 
 
 async def get_files_content(root, files, prefix_lines=True):
@@ -41,99 +46,239 @@ async def get_file_content(root, file, prefix_lines=True):
         return None
 
 
-async def get_files_content_from_tags(root: str, tags: list[Tag], prepend_line_numbers: bool = False,
-                                      exclude_files: set[str] = None, limit: int = 5000) -> str:
-    files_content = {}
-    if exclude_files is None:
-        exclude_files = set()
+def merge_tag_ranges(tags: Iterable[Tag]) -> list[list[int]]:
+    """Line ranges covered by ``tags``, sorted and with adjacent or overlapping ranges merged."""
+    merged_ranges = []
+    merged_range = []
+    for tag in sorted(tags, key=lambda x: x.start_line):
+        if not merged_range:
+            merged_range = [tag.start_line, tag.end_line]
+        else:
+            if tag.start_line <= merged_range[1] + 1:
+                merged_range[1] = max(merged_range[1], tag.end_line)
+            else:
+                merged_ranges.append(merged_range)
+                merged_range = [tag.start_line, tag.end_line]
 
-    # Collect unique file paths
-    file_paths = set(tag.path for tag in tags if tag.path not in exclude_files)
+    if merged_range:
+        merged_ranges.append(merged_range)
+    return merged_ranges
 
-    # Read each file's content
-    for file_path in file_paths:
-        p = os.path.join(root, file_path)
-        async with aiofiles.open(p, 'r', encoding='utf-8') as f:
-            files_content[file_path] = await f.readlines()
 
-    # Preprocess and merge tags ranges
-    merged_ranges = defaultdict(list)
+def format_file_snippet(file_path: str, lines: list[str], ranges: list[list[int]],
+                        prepend_line_numbers: bool = False) -> str:
+    """Render the given line ranges of a file as a markdown code block, eliding the rest."""
+    ext = os.path.splitext(file_path)[1].lstrip(".").lower()
+    comment_start = EXTENSION_TO_COMMENT.get(ext, "#")
+    file_content = []
+
+    # Always include the first line
+    first_line = lines[0]
+    if prepend_line_numbers:
+        first_line = f"001| {first_line}"
+    file_content.append(first_line)
+    # Set of emitted lines for the last-line check below, instead of scanning the list.
+    emitted = {first_line}
+
+    current_line = 1
+    for start_line, end_line in ranges:
+        if current_line < start_line - 1:
+            file_content.append("...\n")
+            emitted.add("...\n")
+        for i in range(start_line - 1, end_line):
+            line = lines[i]
+            if prepend_line_numbers:
+                line = f"{i + 1:03d}| {line}"
+            file_content.append(line)
+            emitted.add(line)
+        current_line = end_line
 
-    for file_path in file_paths:
-        tags_in_file = sorted([tag for tag in tags if tag.path == file_path], key=lambda x: x.start_line)
-        merged_range = []
+    if current_line < len(lines):
+        file_content.append("...\n")
+        emitted.add("...\n")
 
-        for tag in tags_in_file:
-            if not merged_range:
-                merged_range = [tag.start_line, tag.end_line]
-            else:
-                if tag.start_line <= merged_range[1] + 1:
-                    merged_range[1] = max(merged_range[1], tag.end_line)
-                else:
-                    merged_ranges[file_path].append(merged_range)
-                    merged_range = [tag.start_line, tag.end_line]
+    # Always include the last line
+    last_line = lines[-1]
+    if prepend_line_numbers:
+        last_line = f"{len(lines):03d}| {last_line}"
+    if lines[-1] not in emitted:
+        file_content.append(last_line)
 
-        if merged_range:
-            merged_ranges[file_path].append(merged_range)
+    return f"```{ext}\n{comment_start} filename: {file_path}\n" + ''.join(file_content) + "\n```"
 
-    # Collect content based on merged ranges and format it as markdown
-    final_content = []
-    total_length = 0
 
-    # Track processed files to avoid duplicates
-    processed_files = set()
+# Returns the signature outline of a file as 1-based line ranges, or None to fall back to tag ranges.
+OutlineProvider = Callable[[str], Awaitable[Optional[list[tuple[int, int]]]]]
+
+
+def outline_ranges(outline: list[tuple[int, int]]) -> list[list[int]]:
+    """Outline ranges in the form format_file_snippet takes; the first line is always rendered already."""
+    return [[max(start, 2), end] for start, end in outline if end >= 2]
+
+
+async def _read_lines(root: str, file_path: str) -> list[str]:
+    async with aiofiles.open(os.path.join(root, file_path), 'r', encoding='utf-8') as f:
+        return await f.readlines()
+
+
+async def _read_snippet_source(root: str, file_path: str, tags: list[Tag],
+                               outline: Optional[OutlineProvider]) -> tuple[list[str], list[list[int]]]:
+    lines = await _read_lines(root, file_path)
+    ranges = await outline(file_path) if outline is not None else None
+    return lines, outline_ranges(ranges) if ranges is not None else merge_tag_ranges(tags)
+
 
+async def iter_files_content_from_tags(root: str, tags: Iterable[Tag], prepend_line_numbers: bool = False,
+                                       exclude_files: set[str] = None, max_concurrency: int = 8,
+                                       outline: Optional[OutlineProvider] = None) -> AsyncIterator[str]:
+    """
+    Yield one formatted snippet per file, in order of the files' first tag. Tags are grouped by
+    path in a single pass and files are read concurrently, at most ``max_concurrency`` ahead of
+    the consumer, so a consumer that stops early never reads the remaining files. With
+    ``outline`` each file is rendered as its signature outline instead of its tag ranges.
+    """
+    if exclude_files is None:
+        exclude_files = set()
+
+    tags_by_file: dict[str, list[Tag]] = {}
     for tag in tags:
-        file_path = tag.path
-        if file_path in exclude_files or file_path in processed_files:
-            continue
-
-        lines = files_content[file_path]
-        ext = os.path.splitext(file_path)[1].lstrip(".").lower()
-        comment_start = EXTENSION_TO_COMMENT.get(ext, "#")
-        file_content = []
-
-        # Always include the first line
-        first_line = lines[0]
-        if prepend_line_numbers:
-            first_line = f"001| {first_line}"
-        file_content.append(first_line)
-
-        current_line = 1
-        for start_line, end_line in merged_ranges[file_path]:
-            if current_line < start_line - 1:
-                file_content.append("...\n")
-            for i in range(start_line - 1, end_line):
-                line = lines[i]
-                if prepend_line_numbers:
-                    line = f"{i + 1:03d}| {line}"
-                file_content.append(line)
-            current_line = end_line
-
-        if current_line < len(lines):
-            file_content.append("...\n")
+        if tag.path not in exclude_files:
+            tags_by_file.setdefault(tag.path, []).append(tag)
 
-        # Always include the last line
-        last_line = lines[-1]
-        if prepend_line_numbers:
-            last_line = f"{len(lines):03d}| {last_line}"
-        if lines[-1] not in file_content:
-            file_content.append(last_line)
+    def read(file_path: str) -> asyncio.Task:
+        return asyncio.create_task(_read_snippet_source(root, file_path, tags_by_file[file_path], outline))
 
-        formatted_content = (
-            f"```{ext}\n{comment_start} filename: {file_path}\n" + ''.join(file_content) + "\n```"
-        )
+    file_paths = iter(tags_by_file)
+    reads = deque((file_path, read(file_path)) for file_path in islice(file_paths, max_concurrency))
+    try:
+        while reads:
+            file_path, source = reads.popleft()
+            next_path = next(file_paths, None)
+            if next_path is not None:
+                reads.append((next_path, read(next_path)))
+            lines, ranges = await source
+            yield format_file_snippet(file_path, lines, ranges, prepend_line_numbers)
+    finally:
+        for _, read in reads:
+            read.cancel()
+        await asyncio.gather(*(read for _, read in reads), return_exceptions=True)
 
-        if total_length + len(formatted_content) > limit:
-            break
 
-        final_content.append(formatted_content)
-        total_length += len(formatted_content)
-        processed_files.add(file_path)
+async def get_files_content_from_tags(root: str, tags: list[Tag], prepend_line_numbers: bool = False,
+                                      exclude_files: set[str] = None, limit: int = 5000,
+                                      outline: Optional[OutlineProvider] = None) -> str:
+    final_content = []
+    total_length = 0
+
+    snippets = iter_files_content_from_tags(root, tags, prepend_line_numbers, exclude_files, outline=outline)
+    async with aclosing(snippets):
+        async for formatted_content in snippets:
+            if total_length + len(formatted_content) > limit:
+                break
+
+            final_content.append(formatted_content)
+            total_length += len(formatted_content)
 
     return '\n'.join(final_content)
 
 
+def approximate_token_count(text: str) -> int:
+    """Rough token count for models without a local tokenizer, at about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+class RepoMapRenderer:
+    """
+    Renders ranked tags as file snippets that fit a token budget. Files are taken in rank order
+    and read only until the budget is full; the first file that does not fit whole is cut down to
+    the longest prefix of its ranked tags (or outline entries, when rendering outlines) that still
+    fits, found by binary search. Token counts are cached per snippet, keyed by file version and
+    rendered line ranges, so rendering the map again on the next turn only tokenizes snippets
+    that changed.
+    """
+
+    def __init__(self, root: str, count_tokens: Optional[Callable[[str], int]] = None, max_cached: int = 4096):
+        self.root = root
+        self.count_tokens = count_tokens or approximate_token_count
+        self.max_cached = max_cached
+        self._token_counts: OrderedDict[tuple, int] = OrderedDict()
+
+    def _snippet_tokens(self, key: tuple, snippet: str) -> int:
+        count = self._token_counts.get(key)
+        if count is None:
+            count = self._token_counts[key] = self.count_tokens(snippet)
+            while len(self._token_counts) > self.max_cached:
+                self._token_counts.popitem(last=False)
+        else:
+            self._token_counts.move_to_end(key)
+        return count
+
+    async def _read_lines(self, file_path: str) -> Optional[tuple[tuple[int, int], list[str]]]:
+        p = os.path.join(self.root, file_path)
+        try:
+            stat = os.stat(p)
+            async with aiofiles.open(p, 'r', encoding='utf-8') as f:
+                lines = await f.readlines()
+        except (OSError, UnicodeDecodeError) as e:
+            LOGGER.warning(f"Skipping {file_path} in repo map: {str(e)}")
+            return None
+        return (stat.st_mtime_ns, stat.st_size), lines
+
+    async def render(self, tags: Iterable[Tag], token_budget: int, prepend_line_numbers: bool = False,
+                     exclude_files: set[str] = None, outline: Optional[OutlineProvider] = None) -> str:
+        if exclude_files is None:
+            exclude_files = set()
+
+        # Group the ranked tags by file in one pass, keeping the rank order of the files.
+        tags_by_file: dict[str, list[Tag]] = {}
+        for tag in tags:
+            if tag.path not in exclude_files:
+                tags_by_file.setdefault(tag.path, []).append(tag)
+
+        final_content = []
+        remaining = token_budget
+        for file_path, file_tags in tags_by_file.items():
+            read = await self._read_lines(file_path)
+            if read is None or not read[1]:
+                continue
+            version, lines = read
+            file_outline = await outline(file_path) if outline is not None else None
+            # Outlines are cut down by entry, tag ranges by ranked tag.
+            units = outline_ranges(file_outline) if file_outline is not None else file_tags
+            # Snippets after the first are joined with a newline.
+            separator = 1 if final_content else 0
+
+            def snippet_for(count: int) -> tuple[str, int]:
+                ranges = units[:count] if file_outline is not None else merge_tag_ranges(file_tags[:count])
+                snippet = format_file_snippet(file_path, lines, ranges, prepend_line_numbers)
+                key = (file_path, version, prepend_line_numbers, tuple(map(tuple, ranges)))
+                return snippet, self._snippet_tokens(key, snippet) + separator
+
+            snippet, tokens = snippet_for(len(units))
+            if tokens <= remaining:
+                final_content.append(snippet)
+                remaining -= tokens
+                continue
+
+            # Longest prefix of this file's ranked tags, or outline entries, that still fits.
+            lo, hi = 0, len(units) - 1
+            best = None
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                snippet, tokens = snippet_for(mid)
+                if tokens <= remaining:
+                    lo, best = mid, (snippet, tokens)
+                else:
+                    hi = mid - 1
+            if best is not None:
+                final_content.append(best[0])
+                remaining -= best[1]
+            break
+
+        LOGGER.info(f"Rendered repo map with {len(final_content)} files in {token_budget - remaining} tokens")
+        return '\n'.join(final_content)
+
+
 async def get_lite_llm_model(provider: str, model: str):
     if provider == "azure":
         return f"azure/{model}"